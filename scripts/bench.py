@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+"""
+Benchmark and regression suite for the retrieval scripts.
+Zero external dependencies — uses only Python stdlib.
+
+Stages (each stage/corpus pair runs in a fresh process, so peak RSS is per stage):
+    chunk     chunk_page over every page                        (items: chunks)
+    prepare   PreparedPage: chunk, dedup and tokenize            (items: chunks)
+    bm25      BM25 model build over prepared term-id streams     (items: chunks)
+    score     BM25 get_scores, one sample per query              (items: queries)
+    filter    filter_passages end to end, first 5 queries        (items: queries)
+    rerank    rerank.run on BM25 top-50 of the largest page,
+              via the fixture server, one request per query      (items: requests)
+    expand    citation_expand.run, 3 arXiv seeds per request,
+              via the fixture server                             (items: requests)
+    index     index_build.build (chunk, tokenize, invert, merge) over the
+              corpus as pages of 25 chunks, once per worker count
+              1, 2, 4, ... up to the CPU count ("index@N/...")   (items: chunks)
+
+Corpora:
+    synthetic-N  one generated page of N chunks (Zipf-distributed vocabulary,
+                 ~5% near-duplicate paragraphs), N from --sizes
+    recorded     saved pages, one per file under --pages (default: RESEARCH/**/*.md)
+Queries are drawn deterministically from each corpus, so outputs are stable
+between runs and a changed output digest means changed results.
+
+HTTP fixtures: S2 and reranker requests go to a local fixture server. With
+--fixtures FILE it replays recorded responses (matched on method, path and
+body hash); anything not in the recording gets a deterministic synthetic
+response (a fixed citation graph, term-overlap rerank scores). `record`
+proxies the same traffic to the live APIs and saves it.
+
+Usage:
+    python scripts/bench.py run [--sizes 10,100,1000,10000] [--stages chunk,filter,...]
+                                [--repeat 5] [--budget 10] [--pages DIR] [--fixtures FILE]
+                                [--latency MS] [--baseline FILE] [--threshold 0.25]
+                                [--save-baseline FILE]
+    python scripts/bench.py record --fixtures FILE [--sizes 100]   (needs network + API keys)
+
+Output: JSON report {"meta", "results": {"<stage>/<corpus>": {...}}, "regressions"}.
+Each result has runs, items, throughput (items/s), p50_ms, p99_ms, peak_rss_mb
+and digest. Exit status 1 when any result is worse than the baseline by more
+than --threshold (p50, throughput or peak RSS) or its digest changed.
+"""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import http.server
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Configuration ---
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+STAGES = ('chunk', 'prepare', 'bm25', 'score', 'filter', 'rerank', 'expand', 'index')
+DEFAULT_REPEAT = 5
+DEFAULT_BUDGET = 10.0      # seconds per stage before repeats are cut short
+DEFAULT_THRESHOLD = 0.25   # relative slowdown / growth counted as a regression
+NOISE_MS = 0.5             # latency deltas below this are never regressions
+NOISE_RSS_MB = 4.0
+QUERIES = 20
+RERANK_CANDIDATES = 50
+FILTER_QUERIES = 5   # end-to-end filtering re-chunks the page per query
+EXPAND_QUERIES = 5
+INDEX_PAGE_CHUNKS = 25  # the index stage splits a synthetic page into pages of this many paragraphs
+RERANK_PROVIDER = 'cohere'
+SYNTHETIC_VOCAB = 5000
+DUP_RATE = 0.05
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PAGES = os.path.join(REPO_ROOT, 'RESEARCH')
+
+_SYLLABLES = ('ka ro mi te su lan ver po dex tri mon sal qui nor bel fa gen hu '
+              'lo za pre vis tor cal mer dun ix op ul sen').split()
+
+
+def _h(*parts):
+    """Stable 64-bit hash (str hashes are salted per process)."""
+    return int.from_bytes(hashlib.blake2b('\0'.join(map(str, parts)).encode(), digest_size=8).digest(), 'big')
+
+
+# --- Corpora ---
+def synthetic_page(n_chunks, seed=0):
+    """
+    One page that chunks into exactly n_chunks passages: paragraphs of 160-300
+    words never share a chunk. Words follow a Zipf distribution over a
+    pseudo-word vocabulary; DUP_RATE of paragraphs are lightly edited copies.
+    """
+    rng = random.Random(seed)
+    vocab = sorted({''.join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+                    for _ in range(SYNTHETIC_VOCAB * 2)})[:SYNTHETIC_VOCAB]
+    rng.shuffle(vocab)
+    cum_weights, total = [], 0.0
+    for rank in range(len(vocab)):
+        total += 1.0 / (rank + 1)
+        cum_weights.append(total)
+    paragraphs = []
+    for _ in range(n_chunks):
+        if paragraphs and rng.random() < DUP_RATE:
+            words = rng.choice(paragraphs).split()
+            for _ in range(3):
+                words[rng.randrange(len(words))] = rng.choice(vocab)
+        else:
+            words = rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(160, 300))
+        paragraphs.append(' '.join(words))
+    return '\n\n'.join(paragraphs)
+
+
+def recorded_pages(root):
+    paths = sorted(glob.glob(os.path.join(root, '**', '*.md'), recursive=True)) if os.path.isdir(root) else []
+    pages = []
+    for path in paths:
+        with open(path, errors='replace') as f:
+            pages.append(f.read())
+    return pages
+
+
+def load_corpus(spec):
+    kind, arg = spec
+    return [synthetic_page(arg)] if kind == 'synthetic' else recorded_pages(arg)
+
+
+def corpus_name(spec):
+    kind, arg = spec
+    return f'synthetic-{arg}' if kind == 'synthetic' else 'recorded'
+
+
+def make_queries(pages, n=QUERIES, seed=1):
+    """n three-term queries drawn from the corpus's own chunks."""
+    from bm25_filter import chunk_page
+    from tokenizer import tokenize
+    rng = random.Random(seed)
+    chunks = [c for page in pages for c in chunk_page(page)]
+    queries = []
+    for _ in range(n if chunks else 0):
+        terms = tokenize(rng.choice(chunks))
+        if terms:
+            queries.append(' '.join(rng.sample(terms, min(3, len(terms)))))
+    return queries
+
+
+# --- Fixture server ---
+class FixtureStore:
+    """Recorded responses keyed by (method, path, body hash); optional live upstreams for recording."""
+
+    def __init__(self, path=None, upstreams=None, latency=0.0):
+        self.path = path
+        self.upstreams = upstreams or {}  # route prefix -> live base URL (record mode)
+        self.latency = latency
+        self.entries = {}
+        self.counts = {'replayed': 0, 'synthetic': 0, 'recorded': 0}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path) and not self.upstreams:
+            with open(path) as f:
+                for entry in json.load(f)['entries']:
+                    self.entries[(entry['method'], entry['path'], entry['body_sha1'])] = entry
+
+    @staticmethod
+    def key(method, path, body):
+        return method, path, hashlib.sha1(body or b'').hexdigest()
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump({'version': 1, 'entries': list(self.entries.values())}, f, indent=1)
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    store = None  # set on the server's subclass
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        out = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def _handle(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+        store = self.store
+        key = store.key(method, self.path, body)
+        if store.latency:
+            time.sleep(store.latency)
+        if store.upstreams:
+            status, payload, ms = self._forward(method, body)
+            with store._lock:
+                store.entries[key] = {'method': method, 'path': self.path, 'body_sha1': key[2],
+                                      'status': status, 'response': payload, 'ms': ms}
+                store.counts['recorded'] += 1
+            return self._send(status, payload)
+        entry = store.entries.get(key)
+        if entry is not None:
+            with store._lock:
+                store.counts['replayed'] += 1
+            return self._send(entry['status'], entry['response'])
+        with store._lock:
+            store.counts['synthetic'] += 1
+        status, payload = synthetic_response(method, self.path, json.loads(body) if body else None)
+        self._send(status, payload)
+
+    def _forward(self, method, body):
+        route, _, rest = self.path.lstrip('/').partition('/')
+        if route == 'rerank':
+            url = self.store.upstreams[f'rerank/{rest}']
+        else:
+            url = self.store.upstreams[route] + '/' + rest
+        headers = {k: v for k, v in self.headers.items()
+                   if k.lower() in ('authorization', 'x-api-key', 'content-type', 'accept')}
+        start = time.perf_counter()
+        try:
+            req = urllib.request.Request(url, data=body, headers=headers, method=method)
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                status, payload = resp.status, json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, {'error': e.reason}
+        except (urllib.error.URLError, OSError) as e:
+            status, payload = 502, {'error': str(e)}
+        return status, payload, round((time.perf_counter() - start) * 1000, 1)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+def _synthetic_paper(pid):
+    h = _h('paper', pid)
+    words = ('retrieval ranking passage evidence neural sparse dense citation corpus '
+             'query model index benchmark survey graph').split()
+    title = ' '.join(words[(h >> (4 * i)) % len(words)] for i in range(5))
+    return {'paperId': pid, 'title': title, 'year': 2010 + h % 16, 'citationCount': (h >> 8) % 5000,
+            'abstract': title if h % 3 else None,
+            'openAccessPdf': {'url': f'https://example.org/{pid}.pdf'} if h % 4 == 0 else None,
+            'url': f'https://www.semanticscholar.org/paper/{pid}'}
+
+
+def synthetic_response(method, path, body):
+    """Deterministic S2 / reranker responses for requests with no recording."""
+    url = urllib.parse.urlsplit(path)
+    if url.path.startswith('/rerank/'):
+        import rerank
+        from tokenizer import tokenize
+        config = rerank.PROVIDERS[url.path.rsplit('/', 1)[1]]
+        query = set(tokenize(body['query']))
+        scored = []
+        for i, doc in enumerate(body['documents']):
+            overlap = len(query & set(tokenize(doc))) / max(1, len(query))
+            scored.append({'index': i, 'relevance_score': overlap * 0.9 + (_h(doc) % 1000) / 10000})
+        scored.sort(key=lambda r: r['relevance_score'], reverse=True)
+        return 200, {config['results_field']: scored[:body.get(config['top_n_field'], len(scored))]}
+    if url.path == '/s2/paper/batch':
+        return 200, [_synthetic_paper('S%d' % (_h(i) % 100000)) for i in body['ids']]
+    match = re.match(r'/s2/paper/([^/]+)/(citations|references)$', url.path)
+    if match:
+        pid, kind = urllib.parse.unquote(match.group(1)), match.group(2)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        offset, limit = int(params.get('offset', 0)), int(params.get('limit', 100))
+        total = 150
+        key = 'citingPaper' if kind == 'citations' else 'citedPaper'
+        data = [{key: _synthetic_paper('P%d' % (_h(pid, kind, i) % 20000)),
+                 'isInfluential': _h(pid, kind, i, 'inf') % 5 == 0}
+                for i in range(offset, min(offset + limit, total))]
+        page = {'offset': offset, 'data': data}
+        if offset + limit < total:
+            page['next'] = offset + limit
+        return 200, page
+    return 404, {'error': 'Not found'}
+
+
+def start_fixture_server(store):
+    handler = type('Handler', (FixtureHandler,), {'store': store})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+# --- Stages ---
+def _rss_mb():
+    """Peak RSS of this process. Linux ru_maxrss keeps the spawning parent's peak, VmHWM does not."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, max(0, math.ceil(q * len(sorted_samples)) - 1))]
+
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _setup_stage(stage, pages, queries, base_url, env):
+    """
+    (ops, items per pass, summarize) for a stage. Every op is timed on its
+    own; summarize maps an op's return value to the part that goes into the
+    output digest.
+    """
+    import bm25_filter
+    from tokenizer import VOCAB, tokenize
+
+    if stage in ('chunk', 'prepare'):
+        n_chunks = sum(len(bm25_filter.chunk_page(page)) for page in pages)
+        if stage == 'chunk':
+            return [lambda page=page: bm25_filter.chunk_page(page) for page in pages], n_chunks, len
+
+        def prepare(page):
+            prepared = bm25_filter.PreparedPage(page, cache=False)
+            prepared.tokens
+            return prepared
+        return [lambda page=page: prepare(page) for page in pages], n_chunks, lambda p: len(p.chunks)
+
+    prepared = [bm25_filter.PreparedPage(page, cache=False) for page in pages]
+    for p in prepared:
+        p.tokens  # interns the corpus terms, so query lookups below can match
+    n_chunks = sum(len(p.chunks) for p in prepared)
+
+    def best(scores):
+        return max(range(len(scores)), key=scores.__getitem__) if len(scores) else -1
+
+    if stage == 'bm25':
+        first = VOCAB.lookup(tokenize(queries[0])) if queries else []
+        return [lambda p=p: bm25_filter.make_bm25(p.tokens, p.backend) for p in prepared], n_chunks, \
+            lambda model: best(model.get_scores(first))
+
+    if stage == 'score':
+        def score(query):
+            ids = VOCAB.lookup(tokenize(query))
+            return [p.bm25.get_scores(ids) for p in prepared]
+
+        score(queries[0] if queries else '')  # build the models outside the timing
+        return [lambda q=q: score(q) for q in queries], len(queries), lambda scores: [best(s) for s in scores]
+
+    if stage == 'filter':
+        def run_filter(query):
+            return [bm25_filter.filter_passages(page, query) for page in pages]
+        return [lambda q=q: run_filter(q) for q in queries[:FILTER_QUERIES]], min(len(queries), FILTER_QUERIES), \
+            lambda results: [[r['index'] for r in page] for page in results]
+
+    if stage == 'rerank':
+        import rerank
+        from http_pool import ConnectionPool
+        pool = ConnectionPool(timeout=30)
+        env = dict(env, RERANKER_PROVIDER=RERANK_PROVIDER,
+                   RERANKER_API_KEY=env.get('RERANKER_API_KEY') or 'bench',
+                   **{f'RERANKER_ENDPOINT_{RERANK_PROVIDER.upper()}': f'{base_url}/rerank/{RERANK_PROVIDER}'})
+        env.pop('RERANKER_PROVIDERS', None)
+        largest = max(prepared, key=lambda p: len(p.chunks))
+        requests = [{'query': q, 'passages': bm25_filter.filter_prepared(largest, q, k=RERANK_CANDIDATES),
+                     'top_n': 20} for q in queries]
+        return [lambda r=r: rerank.run(r, env=env, pool=pool) for r in requests], len(requests), \
+            lambda ranked: [p['index'] for p in ranked]
+
+    if stage == 'index':
+        import index_build
+        records = []
+        for n, page in enumerate(pages):
+            paragraphs = page.split('\n\n') if len(pages) == 1 else [page]
+            for i in range(0, len(paragraphs), INDEX_PAGE_CHUNKS):
+                records.append({'url': f'page-{n}-{i}', 'content': '\n\n'.join(paragraphs[i:i + INDEX_PAGE_CHUNKS])})
+        workers = int(env.get('BENCH_INDEX_WORKERS', 1))
+        built = index_build.build(records, workers=workers)
+        return [lambda: index_build.build(records, workers=workers)], sum(len(d['chunks']) for d in built[0]), \
+            lambda built: [len(built[1]), sum(built[2]), sum(len(ids) for ids, _ in built[1].values())]
+
+    if stage == 'expand':
+        import citation_expand
+        client = citation_expand.S2Client(api_key=env.get('S2_API_KEY') or None, timeout=30,
+                                          rate=float(env.get('BENCH_S2_RPS', 1000)), base=f'{base_url}/s2')
+        requests = [{'urls': [f'https://arxiv.org/abs/2401.{_h(q, i) % 90000 + 10000:05d}' for i in range(3)],
+                     'subquestion': q, 'top_n': 10} for q in queries[:EXPAND_QUERIES]]
+        return [lambda r=r: citation_expand.run(r, client=client) for r in requests], len(requests), \
+            lambda papers: [p['paperId'] for p in papers]
+
+    raise ValueError(f'unknown stage {stage!r}')
+
+
+def run_stage(stage, spec, repeat, budget, base_url, env):
+    """Measure one stage on one corpus (meant to run in its own process)."""
+    import bm25_filter
+    pages = load_corpus(spec)
+    queries = make_queries(pages)
+    samples, outputs = [], []
+    passes = 0
+    with contextlib.redirect_stderr(io.StringIO()):  # the scripts' progress lines
+        ops, items, summarize = _setup_stage(stage, pages, queries, base_url, env)
+        start = time.perf_counter()
+        # Whole passes only, so throughput and the digest always cover every op
+        while passes < repeat and (passes == 0 or time.perf_counter() - start <= budget):
+            for op in ops:
+                t0 = time.perf_counter()
+                value = op()
+                samples.append(time.perf_counter() - t0)
+                if not passes:
+                    outputs.append(summarize(value))
+            passes += 1
+    elapsed = sum(samples)
+    samples.sort()
+    return {
+        'runs': passes,
+        'items': items,
+        'throughput': round(items * passes / elapsed, 1) if elapsed else None,
+        'p50_ms': round(_percentile(samples, 0.50) * 1000, 3),
+        'p99_ms': round(_percentile(samples, 0.99) * 1000, 3),
+        'peak_rss_mb': round(_rss_mb(), 1),
+        'digest': _digest(outputs),
+        'backend': bm25_filter.DEFAULT_BACKEND,
+    }
+
+
+def _isolated_env():
+    """Caches and corpus stats off, so every run measures cold work."""
+    return {'DR_CHUNK_CACHE': 'off', 'DR_HTTP_CACHE': 'off', 'BM25_CORPUS_STATS': ''}
+
+
+def index_worker_counts():
+    """1, 2, 4, ... up to the CPU count (which is always included)."""
+    cpus = os.cpu_count() or 1
+    counts = [1 << i for i in range(cpus.bit_length()) if 1 << i < cpus]
+    return counts + [cpus]
+
+
+def run_suite(specs, stages, repeat, budget, base_url):
+    os.environ.update(_isolated_env())
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for stage in stages:
+        # The network stages do not depend on corpus size beyond passage count: run them once per corpus kind
+        stage_specs = specs if stage in ('chunk', 'prepare', 'bm25', 'score', 'filter', 'rerank', 'index') \
+            else specs[:1]
+        variants = [(f'index@{n}', {'BENCH_INDEX_WORKERS': str(n)}) for n in index_worker_counts()] \
+            if stage == 'index' else [(stage, {})]
+        for spec, (name, extra_env) in itertools.product(stage_specs, variants):
+            key = f'{name}/{corpus_name(spec)}'
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as ex:
+                try:
+                    results[key] = ex.submit(run_stage, stage, spec, repeat, budget, base_url,
+                                             dict(os.environ, **extra_env)).result()
+                except Exception as e:
+                    results[key] = {'error': f'{type(e).__name__}: {e}'}
+            print(f"bench: {key} {json.dumps(results[key])}", file=sys.stderr)
+    return results
+
+
+# --- Baseline comparison ---
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Regressions of results against a baseline report, as readable strings."""
+    regressions = []
+    for key, current in sorted(results.items()):
+        base = baseline.get('results', {}).get(key)
+        if 'error' in current:
+            regressions.append(f'{key}: failed ({current["error"]})')
+            continue
+        if not base or 'error' in base:
+            continue
+        if current['p50_ms'] > base['p50_ms'] * (1 + threshold) and current['p50_ms'] - base['p50_ms'] > NOISE_MS:
+            regressions.append(f'{key}: p50 {base["p50_ms"]} -> {current["p50_ms"]} ms')
+        if base.get('throughput') and current.get('throughput') is not None \
+                and current['throughput'] < base['throughput'] * (1 - threshold) \
+                and current['p50_ms'] - base['p50_ms'] > NOISE_MS:
+            regressions.append(f'{key}: throughput {base["throughput"]} -> {current["throughput"]} items/s')
+        if current['peak_rss_mb'] > base['peak_rss_mb'] * (1 + threshold) \
+                and current['peak_rss_mb'] - base['peak_rss_mb'] > NOISE_RSS_MB:
+            regressions.append(f'{key}: peak RSS {base["peak_rss_mb"]} -> {current["peak_rss_mb"]} MB')
+        if current['digest'] != base['digest'] and current['backend'] == base.get('backend'):
+            regressions.append(f'{key}: output changed (digest {base["digest"]} -> {current["digest"]})')
+    return regressions
+
+
+def _meta(args, store):
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'sizes': args.sizes,
+        'repeat': args.repeat,
+        'fixtures': store.path,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+# --- CLI Interface ---
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark and regression suite for the retrieval scripts')
+    parser.add_argument('command', choices=('run', 'record'))
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Synthetic corpus sizes in chunks (comma-separated)')
+    parser.add_argument('--stages', default=','.join(STAGES), help='Stages to run (comma-separated)')
+    parser.add_argument('--pages', default=DEFAULT_PAGES, help='Directory of recorded pages (*.md); "" to skip')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Passes over each stage')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help='Seconds per stage before stopping early')
+    parser.add_argument('--fixtures', help='Recorded HTTP fixture file (replayed by run, written by record)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Milliseconds added to every fixture response')
+    parser.add_argument('--baseline', help='Baseline report to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Relative regression that fails the run (default: 0.25)')
+    parser.add_argument('--save-baseline', help='Write this run\'s report as a baseline file')
+    args = parser.parse_args()
+
+    stages = [s for s in args.stages.split(',') if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    args.sizes = [int(s) for s in args.sizes.split(',') if s]
+    specs = [('synthetic', n) for n in args.sizes]
+    if args.pages and recorded_pages(args.pages):
+        specs.append(('recorded', args.pages))
+
+    upstreams = None
+    if args.command == 'record':
+        if not args.fixtures:
+            parser.error('record needs --fixtures FILE')
+        import citation_expand
+        import rerank
+        # Live APIs are rate limited; the fixture server is not
+        os.environ['BENCH_S2_RPS'] = str(citation_expand.RATE_TIERS[
+            'api_key' if os.environ.get('S2_API_KEY') else 'unauthenticated'])
+        upstreams = {'s2': citation_expand.S2_BASE,
+                     **{f'rerank/{name}': config['endpoint'] for name, config in rerank.PROVIDERS.items()}}
+        stages = [s for s in stages if s in ('rerank', 'expand')]
+        args.repeat = 1
+    store = FixtureStore(args.fixtures, upstreams=upstreams, latency=args.latency / 1000)
+    server, base_url = start_fixture_server(store)
+    try:
+        results = run_suite(specs, stages, args.repeat, args.budget, base_url)
+    finally:
+        server.shutdown()
+
+    if args.command == 'record':
+        store.save()
+        print(json.dumps({'fixtures': args.fixtures, 'entries': len(store.entries)}))
+        return
+
+    report = {'meta': _meta(args, store), 'fixture_requests': store.counts, 'results': results}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report['regressions'] = regressions
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    if regressions:
+        for line in regressions:
+            print(f"bench: regression: {line}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,15 +6,84 @@ Zero external dependencies — uses only Python stdlib.
 Usage:
     echo '{"query": "...", "content": "..."}' | python bm25_filter.py
     python bm25_filter.py --query "..." --file page.md
-
-Output: JSON array of top-K passages with scores.
+    python bm25_filter.py --batch < pages.jsonl
+    python bm25_filter.py --check-backends [--file page.md]
+
+Output: JSON array of top-K passages with scores:
+    [{"text", "score", "index"}], "index" being the passage's position in
+    chunk_page(content). See below for the extra keys added by dedup.
+
+Scoring backends (env BM25_BACKEND or --backend):
+    postings  pure-Python inverted index (default)
+    array     flat sparse-matrix arrays; vectorized with NumPy when it is
+              installed, stdlib `array` buffers otherwise
+--check-backends verifies both backends agree within a float tolerance.
+
+Near-duplicate chunks within a page (SimHash, see near_dup.py) are collapsed
+into the first copy before scoring. Disable with env BM25_DEDUP=0,
+"dedup": false in the input JSON, or --no-dedup. When copies were collapsed,
+"index" still refers to chunk_page(content); each passage also carries
+"dedup_index" (its position among the kept chunks), and a passage that stands
+in for dropped copies lists their chunk_page positions in "duplicates".
+
+Chunked and tokenized pages are cached on disk by content hash (see
+chunk_cache.py; DR_CHUNK_CACHE=off disables), so a page seen before skips
+straight to query scoring.
+
+Corpus-level IDF: with --corpus-stats PATH ("corpus_stats": PATH in the
+input JSON or batch records, or env BM25_CORPUS_STATS) each page adds its
+chunk document frequencies to running statistics shared by every page of
+the subquestion/project (see corpus_stats.py), and BM25 scores with IDF
+over all of them instead of this page alone.
+
+Multi-query fusion: "query" may also be a list of queries, each a string or
+{"query": "...", "weight": w} (default weight 1), e.g. a subquestion plus its
+HyDE framings. All of them are scored in one walk over the union of their
+terms' postings and fused into a single top-K:
+    rrf       reciprocal-rank fusion, sum of weight / (RRF_K + rank) (default)
+    weighted  sum of weight * score / that query's best score
+Choose with "fusion" in the input JSON or --fusion; on the command line
+repeat --query.
+
+With DR_TRACE set (see instrument.py), chunking, tokenizing, index builds
+and query scoring are traced as spans, with counters for pages, chunks,
+tokens, chunk-cache hits and bypassed pages.
+
+Batch mode reads JSONL, one page per line, and writes one JSONL result per
+(page, query) pair. Each page is chunked and tokenized once and its BM25
+model is reused for every query that targets it:
+
+    {"id": "p1", "content": "...", "queries": ["q1", {"query": "q2", "k": 50}]}
+    {"id": "p1", "query": "q3"}          <- reuses page p1 from an earlier line
+    {"id": "p1", "queries": [{"query": ["q1", {"query": "q2", "weight": 0.5}], "fusion": "rrf"}]}
+                                         <- one fused result for q1 + q2
+
+    -> {"id": "p1", "query": "q1", "passages": [...]}
 """
 
+import copy
+import heapq
+import itertools
 import json
 import math
+import os
+import random
 import sys
+from array import array
+from bisect import bisect_left
 from collections import Counter
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import chunk_cache
+import corpus_stats
+import instrument
+from near_dup import dedup_chunks
+from tokenizer import STOPWORDS, VOCAB, tokenize  # noqa: F401  (re-exported for callers)
+
 # --- Configuration ---
 DEFAULT_K = 10
 BYPASS_THRESHOLD = 15  # Pass all chunks if fewer than this
@@ -23,16 +92,13 @@ MAX_CHUNK_WORDS = 300
 BM25_K1 = 1.2
 BM25_B = 0.75
 LEAD_BONUS = 0.15  # Position bonus as fraction of max score
-
-# Common English stopwords (top 50 — enough for pre-filtering)
-STOPWORDS = frozenset([
-    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from',
-    'has', 'he', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'she',
-    'that', 'the', 'to', 'was', 'were', 'will', 'with', 'you', 'your',
-    'this', 'they', 'but', 'have', 'had', 'what', 'when', 'where',
-    'which', 'who', 'how', 'not', 'no', 'can', 'do', 'does', 'if',
-    'than', 'then', 'so', 'we', 'our'
-])
+DEFAULT_BACKEND = os.environ.get('BM25_BACKEND', 'postings')
+BACKEND_TOLERANCE = 1e-9  # Max score difference allowed between backends
+DEFAULT_DEDUP = os.environ.get('BM25_DEDUP', '1') != '0'
+DEFAULT_CORPUS_STATS = os.environ.get('BM25_CORPUS_STATS', '')
+FUSION_METHODS = ('rrf', 'weighted')
+DEFAULT_FUSION = 'rrf'
+RRF_K = 60  # Reciprocal-rank fusion damping (Cormack et al. 2009)
 
 BOILERPLATE_SIGNALS = [
     'cookie', 'subscribe', 'sign up', 'log in', 'privacy policy',
@@ -41,42 +107,45 @@ BOILERPLATE_SIGNALS = [
 ]
 
 
-# --- Tokenizer ---
-def tokenize(text):
-    """Simple tokenizer: lowercase, split, remove stopwords and short tokens."""
-    return [
-        w for w in text.lower().split()
-        if w not in STOPWORDS and len(w) > 2 and w.isalpha()
-    ]
-
-
 # --- Chunker ---
 def chunk_page(text, min_words=MIN_CHUNK_WORDS, max_words=MAX_CHUNK_WORDS):
     """Split web page text into passages at paragraph boundaries."""
-    raw_chunks = text.split('\n\n')
-    chunks = []
+    return list(iter_chunks(text, min_words, max_words))
+
+
+def iter_chunks(source, min_words=MIN_CHUNK_WORDS, max_words=MAX_CHUNK_WORDS):
+    """
+    Streaming chunk_page: yields the same passages from a string, a text file
+    object, or an iterable of string pieces.
+
+    Each paragraph is counted and boilerplate-checked once; memory holds the
+    current paragraph, the chunk being built and the last chunk (kept back in
+    case small trailing content has to be appended to it), not the page.
+    """
     current_parts = []
     current_len = 0
+    pending = None  # last complete chunk, not yet yielded
 
-    for para in raw_chunks:
+    for para in _iter_paragraphs(source):
         para = para.strip()
         if not para:
             continue
 
-        words = para.split()
-        word_count = len(words)
+        word_count = len(para.split())
 
         # Skip tiny fragments (likely boilerplate/nav)
         if word_count < 8 and not current_parts:
             continue
 
         # Check for boilerplate
-        if _is_boilerplate(para):
+        if _is_boilerplate(para, word_count):
             continue
 
         # If adding this paragraph exceeds max, flush current buffer
         if current_len + word_count > max_words and current_parts:
-            chunks.append('\n\n'.join(current_parts))
+            if pending is not None:
+                yield pending
+            pending = '\n\n'.join(current_parts)
             current_parts = []
             current_len = 0
 
@@ -85,48 +154,121 @@ def chunk_page(text, min_words=MIN_CHUNK_WORDS, max_words=MAX_CHUNK_WORDS):
 
         # If buffer exceeds max, flush it
         if current_len >= max_words:
-            chunks.append('\n\n'.join(current_parts))
+            if pending is not None:
+                yield pending
+            pending = '\n\n'.join(current_parts)
             current_parts = []
             current_len = 0
 
     # Flush remaining
     if current_parts:
         chunk_text = '\n\n'.join(current_parts)
-        if len(chunk_text.split()) >= min_words:
-            chunks.append(chunk_text)
-        elif chunks:
+        if current_len >= min_words:
+            if pending is not None:
+                yield pending
+            pending = chunk_text
+        elif pending is not None:
             # Append small trailing content to last chunk
-            chunks[-1] += '\n\n' + chunk_text
+            pending += '\n\n' + chunk_text
+    if pending is not None:
+        yield pending
+
+
+def _iter_paragraphs(source, read_size=1 << 16):
+    """Split a string, file object or iterable of pieces on '\\n\\n' like str.split."""
+    if isinstance(source, str):
+        source = (source,)
+    elif hasattr(source, 'read'):
+        source = _iter_pieces(source, read_size)
+    buf = ''
+    for piece in source:
+        head, start = 0, max(len(buf) - 1, 0)  # no separator in buf except one split across pieces
+        buf += piece
+        while True:
+            cut = buf.find('\n\n', start)
+            if cut < 0:
+                break
+            yield buf[head:cut]
+            head = start = cut + 2
+        buf = buf[head:]
+    yield buf
+
+
+def _iter_pieces(f, read_size=1 << 16):
+    return iter(lambda: f.read(read_size), '')
+
+
+def chunk_page_dedup(source, min_words=MIN_CHUNK_WORDS, max_words=MAX_CHUNK_WORDS):
+    """
+    chunk_page with near-duplicate chunks collapsed into their first copy.
+    source may be anything iter_chunks accepts.
 
-    return chunks
+    Returns (chunks, clusters, hashes): clusters maps a position in chunks to
+    the chunk_page positions folded into it; hashes are the kept chunks' SimHashes.
+    """
+    chunks = list(iter_chunks(source, min_words, max_words))
+    kept, folded, all_hashes = dedup_chunks(chunks)
+    clusters = {pos: folded[i] for pos, i in enumerate(kept) if i in folded}
+    return [chunks[i] for i in kept], clusters, [all_hashes[i] for i in kept]
 
 
-def _is_boilerplate(text):
-    """Detect likely boilerplate content."""
+def _is_boilerplate(text, word_count=None):
+    """Detect likely boilerplate content (pass word_count if it is already known)."""
     text_lower = text.lower()
     hits = sum(1 for s in BOILERPLATE_SIGNALS if s in text_lower)
-    word_count = len(text.split())
+    if word_count is None:
+        word_count = len(text.split())
     return hits >= 2 or (hits >= 1 and word_count < 30)
 
 
 # --- BM25 Scorer ---
 class BM25:
-    """BM25 Okapi scorer. Zero dependencies."""
+    """
+    BM25 Okapi scorer over an inverted index. Zero dependencies.
+
+    Postings (term -> ascending chunk ids + precomputed BM25 weights) are built
+    once, with IDF and length normalization folded into each weight, so scoring
+    walks only the postings of the query terms (term-at-a-time).
+
+    idf optionally maps terms to IDF values computed elsewhere (corpus-level
+    statistics); terms it lacks use this corpus's own IDF.
+    """
 
-    def __init__(self, corpus, k1=BM25_K1, b=BM25_B):
+    def __init__(self, corpus, k1=BM25_K1, b=BM25_B, idf=None):
         self.k1 = k1
         self.b = b
         self.N = len(corpus)
         self.doc_len = [len(doc) for doc in corpus]
         self.avgdl = sum(self.doc_len) / self.N if self.N > 0 else 1
-        self.doc_freqs = {}
-        self.tf = []
 
-        for doc in corpus:
-            freq = Counter(doc)
-            self.tf.append(freq)
-            for term in freq:
-                self.doc_freqs[term] = self.doc_freqs.get(term, 0) + 1
+        # term -> ([chunk ids], [term frequencies]) in ascending chunk order
+        raw = {}
+        for idx, doc in enumerate(corpus):
+            for term, f in Counter(doc).items():
+                entry = raw.get(term)
+                if entry is None:
+                    raw[term] = ([idx], [f])
+                else:
+                    entry[0].append(idx)
+                    entry[1].append(f)
+
+        self.doc_freqs = {term: len(ids) for term, (ids, _) in raw.items()}
+        self.idf = {term: self._idf(term) for term in raw}
+        if idf:
+            self.idf.update((term, idf[term]) for term in raw if term in idf)
+        self.norm = [k1 * (1 - b + b * dl / self.avgdl) for dl in self.doc_len]
+
+        # term -> ([chunk ids], [weights]); max_impact bounds any one chunk's weight
+        self.postings = {}
+        self.max_impact = {}
+        for term, (ids, tfs) in raw.items():
+            idf = self.idf[term]
+            weights = [
+                idf * (f * (k1 + 1)) / (f + self.norm[d])
+                for d, f in zip(ids, tfs)
+            ]
+            self.postings[term] = (ids, weights)
+            self.max_impact[term] = max(weights)
 
     def _idf(self, term):
         n = self.doc_freqs.get(term, 0)
@@ -134,82 +276,664 @@ class BM25:
 
     def score(self, query, doc_idx):
         s = 0.0
-        dl = self.doc_len[doc_idx]
-        tf = self.tf[doc_idx]
         for term in query:
-            f = tf.get(term, 0)
-            if f == 0:
+            entry = self.postings.get(term)
+            if entry is None:
                 continue
-            idf = self._idf(term)
-            num = f * (self.k1 + 1)
-            den = f + self.k1 * (1 - self.b + self.b * dl / self.avgdl)
-            s += idf * num / den
+            ids, weights = entry
+            pos = bisect_left(ids, doc_idx)
+            if pos < len(ids) and ids[pos] == doc_idx:
+                s += weights[pos]
         return s
 
     def get_scores(self, query):
-        return [self.score(query, i) for i in range(self.N)]
+        scores = [0.0] * self.N
+        for term in query:
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            for d, w in zip(*entry):
+                scores[d] += w
+        return scores
+
+    def get_scores_multi(self, queries):
+        """get_scores for several queries, walking each distinct term's postings once (see _term_groups)."""
+        known = [Counter(t for t in query if t in self.postings) for query in queries]
+        rows = [[0.0] * self.N for _ in queries]
+        for uses, terms in _term_groups(known).items():
+            acc = rows[uses[0][0]] if uses == ((uses[0][0], 1),) else [0.0] * self.N
+            for term in terms:
+                for d, w in zip(*self.postings[term]):
+                    acc[d] += w
+            _spread(rows, uses, acc)
+        return rows
+
+    def top_k(self, query, k, prune=False):
+        """
+        Return up to k (chunk index, score) pairs with score > 0, best first.
+
+        prune=True enables MaxScore-style early termination: query terms are
+        processed by descending upper bound, and once the terms still to come
+        cannot lift an unseen chunk past the current k-th best score, only
+        chunks already in the candidate set keep accumulating. The selected
+        set is the same; scores may differ from get_scores in the last ulp
+        because terms are summed in a different order.
+        """
+        if k <= 0:
+            return []
+        if not prune:
+            scores = self.get_scores(query)
+            hits = [i for i in range(self.N) if scores[i] > 0]
+            top = heapq.nlargest(k, hits, key=scores.__getitem__)
+            return [(i, scores[i]) for i in top]
+
+        counts = Counter(t for t in query if t in self.postings)
+        bounds = {t: self.max_impact[t] * c for t, c in counts.items()}
+        order = sorted(counts, key=bounds.__getitem__, reverse=True)
+        remaining = sum(bounds.values())
+        acc = {}
+
+        for term in order:
+            ids, weights = self.postings[term]
+            count = counts[term]
+            closed = False
+            if len(acc) >= k:
+                threshold = heapq.nlargest(k, acc.values())[-1]
+                closed = remaining <= threshold
+            remaining -= bounds[term]
+
+            if not closed:
+                for d, w in zip(ids, weights):
+                    acc[d] = acc.get(d, 0.0) + w * count
+            elif len(acc) < len(ids):
+                for d in acc:
+                    pos = bisect_left(ids, d)
+                    if pos < len(ids) and ids[pos] == d:
+                        acc[d] += weights[pos] * count
+            else:
+                for d, w in zip(ids, weights):
+                    if d in acc:
+                        acc[d] += w * count
+
+        top = heapq.nlargest(k, sorted(acc), key=acc.__getitem__)
+        return [(i, acc[i]) for i in top]
+
+
+class ArrayBM25:
+    """
+    BM25 over a compressed sparse term x chunk matrix held in flat arrays.
+
+    Term t spans indices[indptr[t]:indptr[t + 1]] (ascending chunk ids) with the
+    matching precomputed BM25 weights in data. With NumPy the query is scored
+    as one sparse vector-matrix product (gather + bincount) and top-K uses
+    argpartition; without it the same layout lives in stdlib `array` buffers
+    and is scored term-at-a-time. Scores match BM25 within float rounding.
+    idf overrides per-term IDF as in BM25.
+    """
+
+    def __init__(self, corpus, k1=BM25_K1, b=BM25_B, use_numpy=None, idf=None):
+        self.k1 = k1
+        self.b = b
+        self.use_numpy = np is not None if use_numpy is None else bool(use_numpy and np is not None)
+        self.N = len(corpus)
+        self.doc_len = [len(doc) for doc in corpus]
+        self.avgdl = sum(self.doc_len) / self.N if self.N > 0 else 1
+        norm = [k1 * (1 - b + b * dl / self.avgdl) for dl in self.doc_len]
+
+        rows = {}  # term -> ([chunk ids], [tfs])
+        for idx, doc in enumerate(corpus):
+            for term, f in Counter(doc).items():
+                entry = rows.get(term)
+                if entry is None:
+                    rows[term] = ([idx], [f])
+                else:
+                    entry[0].append(idx)
+                    entry[1].append(f)
+
+        self.vocab = {}
+        self.doc_freqs = {}
+        self.idf = {}
+        indptr = array('L', [0])
+        indices = array('L')
+        data = array('d')
+        for term, (ids, tfs) in rows.items():
+            self.vocab[term] = len(self.vocab)
+            self.doc_freqs[term] = len(ids)
+            w = self.idf[term] = idf[term] if idf and term in idf else self._idf(term)
+            indices.extend(ids)
+            data.extend(w * (f * (k1 + 1)) / (f + norm[d]) for d, f in zip(ids, tfs))
+            indptr.append(len(indices))
+
+        if self.use_numpy:
+            uint = f'u{indices.itemsize}'
+            self.indptr = np.frombuffer(indptr, dtype=uint).astype(np.intp)
+            self.indices = np.frombuffer(indices, dtype=uint).astype(np.intp)
+            self.data = np.frombuffer(data, dtype=np.float64).copy()
+        else:
+            self.indptr, self.indices, self.data = indptr, indices, data
+
+    def _idf(self, term):
+        n = self.doc_freqs.get(term, 0)
+        return math.log((self.N - n + 0.5) / (n + 0.5) + 1)
+
+    def _query_terms(self, query):
+        """Query term ids with multiplicity, as a Counter."""
+        return Counter(self.vocab[t] for t in query if t in self.vocab)
+
+    def _score_vector(self, query):
+        """Scores for every chunk: ndarray with NumPy, list of floats otherwise."""
+        counts = self._query_terms(query)
+        if self.use_numpy:
+            if not counts:
+                return np.zeros(self.N)
+            spans = [(self.indptr[t], self.indptr[t + 1], c) for t, c in counts.items()]
+            idx = np.concatenate([self.indices[lo:hi] for lo, hi, _ in spans])
+            weights = np.concatenate([self.data[lo:hi] * c for lo, hi, c in spans])
+            return np.bincount(idx, weights=weights, minlength=self.N)
+
+        scores = [0.0] * self.N
+        indices, data = self.indices, self.data
+        for t, c in counts.items():
+            for p in range(self.indptr[t], self.indptr[t + 1]):
+                scores[indices[p]] += data[p] * c
+        return scores
+
+    def score(self, query, doc_idx):
+        s = 0.0
+        for term in query:
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            lo, hi = int(self.indptr[t]), int(self.indptr[t + 1])
+            pos = bisect_left(self.indices, doc_idx, lo, hi)
+            if pos < hi and self.indices[pos] == doc_idx:
+                s += float(self.data[pos])
+        return s
+
+    def get_scores(self, query):
+        scores = self._score_vector(query)
+        return scores.tolist() if self.use_numpy else scores
+
+    def get_scores_multi(self, queries):
+        """get_scores for several queries, reading each distinct term's span once (see _term_groups)."""
+        counts = [self._query_terms(query) for query in queries]
+        if self.use_numpy:
+            spans = [(self.indptr[t], self.indptr[t + 1], q, c)
+                     for q, terms in enumerate(counts) for t, c in terms.items()]
+            if not spans:
+                return [[0.0] * self.N for _ in queries]
+            idx = np.concatenate([self.indices[lo:hi] + q * self.N for lo, hi, q, _ in spans])
+            weights = np.concatenate([self.data[lo:hi] * c for lo, hi, _, c in spans])
+            flat = np.bincount(idx, weights=weights, minlength=self.N * len(queries))
+            return flat.reshape(len(queries), self.N).tolist()
+
+        rows = [[0.0] * self.N for _ in queries]
+        indices, data = self.indices, self.data
+        for uses, terms in _term_groups(counts).items():
+            acc = rows[uses[0][0]] if uses == ((uses[0][0], 1),) else [0.0] * self.N
+            for t in terms:
+                for p in range(self.indptr[t], self.indptr[t + 1]):
+                    acc[indices[p]] += data[p]
+            _spread(rows, uses, acc)
+        return rows
+
+    def top_k(self, query, k, prune=False):
+        """Return up to k (chunk index, score) pairs with score > 0, best first.
+
+        prune is accepted for API compatibility with BM25 and ignored.
+        """
+        if k <= 0:
+            return []
+        scores = self._score_vector(query)
+        if self.use_numpy:
+            hits = np.flatnonzero(scores > 0)
+            if len(hits) > k:
+                hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+            ranked = sorted(hits.tolist(), key=lambda i: (-scores[i], i))
+            return [(i, float(scores[i])) for i in ranked]
+        hits = [i for i in range(self.N) if scores[i] > 0]
+        top = heapq.nlargest(k, hits, key=scores.__getitem__)
+        return [(i, scores[i]) for i in top]
+
+
+def _term_groups(term_counts):
+    """
+    {((query, count), ...): [terms]} from each query's {term: count}.
+
+    Terms used by the same queries with the same counts (the words a
+    subquestion and its HyDE framings share) form one group: their postings
+    are summed once and the sum is added to every query in the group.
+    """
+    uses = {}
+    for q, counts in enumerate(term_counts):
+        for term, c in counts.items():
+            uses.setdefault(term, []).append((q, c))
+    groups = {}
+    for term, u in uses.items():
+        groups.setdefault(tuple(u), []).append(term)
+    return groups
+
+
+def _spread(rows, uses, acc):
+    """Add a group's summed postings to each query row using it (no-op when summed in place)."""
+    for q, c in uses:
+        if rows[q] is not acc:
+            rows[q] = [r + c * a for r, a in zip(rows[q], acc)]
+
+
+BACKENDS = {
+    'postings': BM25,
+    'array': ArrayBM25,
+}
+
+
+def make_bm25(corpus, backend=None, idf=None, k1=BM25_K1, b=BM25_B):
+    """Build the BM25 model for a tokenized corpus with the chosen backend."""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown BM25 backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](corpus, k1=k1, b=b, idf=idf)
 
 
 # --- Main Pipeline ---
-def filter_passages(content, query, k=DEFAULT_K, bypass_threshold=BYPASS_THRESHOLD):
+class PreparedPage:
+    """Chunked page whose tokenized BM25 model is built once and reused across queries.
+
+    content may be a text file object; it is then chunked as a stream and only
+    its first PREFIX_CHARS are kept as .content (the no-chunks fallback).
+
+    String pages go through the content-addressed chunk cache (chunk_cache.py,
+    default from DR_CHUNK_CACHE): a page seen before skips chunking, and
+    tokenizing too once it has been scored.
+
+    stats: optional corpus_stats.CorpusStats; the page's chunks are counted
+    into it on creation and its BM25 model uses the corpus-level IDF, current
+    as of the latest query.
+
+    min_words/max_words and k1/b override the chunking and BM25 constants
+    (parameter tuning, see eval_retrieval.py).
+    """
+
+    PREFIX_CHARS = 3000
+
+    def __init__(self, content, backend=None, dedup=None, cache=None, stats=None,
+                 min_words=MIN_CHUNK_WORDS, max_words=MAX_CHUNK_WORDS, k1=BM25_K1, b=BM25_B):
+        source = content
+        if hasattr(content, 'read'):
+            content = content.read(self.PREFIX_CHARS)
+            source = itertools.chain((content,), _iter_pieces(source))
+            cache = None  # a stream cannot be hashed before it is read
+        else:
+            cache = chunk_cache.from_env() if cache is None else cache
+        self.content = content
+        self.backend = backend
+        self._bm25 = None
+        self._tokens = None
+        self._df = None
+        self.stats = stats
+        self._corpus_size = None
+        self._positions = None
+        self.k1, self.b = k1, b
+        dedup = DEFAULT_DEDUP if dedup is None else dedup
+
+        self._cache, self._cache_key = cache, None
+        hit = None
+        if cache:
+            self._cache_key = chunk_cache.page_key(content, {
+                'min_words': min_words, 'max_words': max_words, 'dedup': dedup})
+            hit = cache.get(self._cache_key)
+            instrument.count('chunk_cache.misses' if hit is None else 'chunk_cache.hits')
+        if hit is not None:
+            self.chunks, self.clusters = hit.chunks, hit.clusters
+            self._tokens, self._df = hit.tokens, hit.df
+        else:
+            with instrument.span('bm25.chunk', dedup=dedup) as sp:
+                if dedup:
+                    self.chunks, self.clusters, _ = chunk_page_dedup(source, min_words, max_words)
+                else:
+                    self.chunks, self.clusters = list(iter_chunks(source, min_words, max_words)), {}
+                sp.set(chunks=len(self.chunks))
+            if cache:
+                cache.put(self._cache_key, chunk_cache.CachedPage(self.chunks, self.clusters))
+        instrument.count('bm25.pages')
+        instrument.count('bm25.chunks', len(self.chunks))
+
+        if stats is not None and self.chunks:
+            df = {VOCAB.terms[t]: n for t, n in self.doc_freqs.items()}
+            stats.add_page(corpus_stats.page_key(self.chunks), df, len(self.chunks))
+
+    @property
+    def positions(self):
+        """chunk_page(content) position of each kept chunk (copies fold into an earlier chunk)."""
+        if self._positions is None:
+            folded = {i for copies in self.clusters.values() for i in copies}
+            self._positions = [i for i in range(len(self.chunks) + len(folded)) if i not in folded]
+        return self._positions
+
+    def passage(self, i, score):
+        """Output dict for kept chunk i (see the module docstring for the dedup keys)."""
+        out = {"text": self.chunks[i], "score": score, "index": self.positions[i]}
+        if self.clusters:
+            out["dedup_index"] = i
+            if i in self.clusters:
+                out["duplicates"] = self.clusters[i]
+        return out
+
+    @property
+    def tokens(self):
+        """Per-chunk term-id streams (tokenizer.VOCAB ids), cached with the page."""
+        if self._tokens is None:
+            with instrument.span('bm25.tokenize', chunks=len(self.chunks)):
+                self._tokens = [VOCAB.encode(c) for c in self.chunks]
+            instrument.count('bm25.tokens', sum(map(len, self._tokens)))
+            self._df = None
+            if self._cache:
+                self._cache.put(self._cache_key, chunk_cache.CachedPage(
+                    self.chunks, self.clusters, self._tokens, self.doc_freqs))
+        return self._tokens
+
+    @property
+    def doc_freqs(self):
+        """{term id: chunks containing it} for this page."""
+        if self._df is None:
+            self._df = Counter(t for stream in self.tokens for t in set(stream))
+        return self._df
+
+    @property
+    def bm25(self):
+        """BM25 over the chunks' term-id streams (rebuilt when the corpus stats have grown)."""
+        if self.stats is not None:
+            corpus_size = self.stats.n_chunks
+            if corpus_size != self._corpus_size:
+                self._bm25, self._corpus_size = None, corpus_size
+        if self._bm25 is None:
+            idf = None
+            if self.stats is not None:
+                ids = list(self.doc_freqs)
+                terms = VOCAB.decode(ids)
+                corpus_idf = self.stats.idf(terms)
+                idf = {tid: corpus_idf[term] for tid, term in zip(ids, terms)}
+            tokens = self.tokens
+            with instrument.span('bm25.index', chunks=len(tokens), corpus_idf=idf is not None):
+                self._bm25 = make_bm25(tokens, self.backend, idf=idf, k1=self.k1, b=self.b)
+        return self._bm25
+
+    def with_bm25(self, k1=BM25_K1, b=BM25_B):
+        """Copy sharing this page's chunks and tokens, scored with other BM25 parameters."""
+        page = copy.copy(self)
+        page.k1, page.b, page._bm25 = k1, b, None
+        return page
+
+
+def weighted_queries(query):
+    """[(text, weight)] for a list query ("q" or {"query": "q", "weight": w} items); None for a plain string."""
+    if isinstance(query, str):
+        return None
+    pairs = []
+    for item in query:
+        if isinstance(item, dict):
+            text, weight = item.get('query', ''), item.get('weight', 1.0)
+        else:
+            text, weight = item, 1.0
+        if not isinstance(text, str) or not isinstance(weight, (int, float)) or weight < 0:
+            raise ValueError(f"each query must be a string or {{\"query\": str, \"weight\": >= 0}}, got {item!r}")
+        pairs.append((text, float(weight)))
+    return pairs
+
+
+def fuse_scores(score_lists, weights, fusion=DEFAULT_FUSION):
+    """
+    One score per chunk from several queries' score lists.
+
+    rrf sums weight / (RRF_K + rank) over the queries that match a chunk
+    (rank 1 = best, ties in document order); weighted sums each query's
+    scores scaled by weight / its best score, so long framings do not
+    drown out short ones.
+    """
+    n = len(score_lists[0]) if score_lists else 0
+    fused = [0.0] * n
+    if fusion == 'rrf':
+        for scores, weight in zip(score_lists, weights):
+            ranked = sorted((i for i in range(n) if scores[i] > 0), key=lambda i: -scores[i])
+            for rank, i in enumerate(ranked, 1):
+                fused[i] += weight / (RRF_K + rank)
+    elif fusion == 'weighted':
+        for scores, weight in zip(score_lists, weights):
+            best = max(scores, default=0.0)
+            if best > 0:
+                scale = weight / best
+                for i, score in enumerate(scores):
+                    fused[i] += score * scale
+    else:
+        raise ValueError(f"unknown fusion '{fusion}', expected one of: {', '.join(FUSION_METHODS)}")
+    return fused
+
+
+def filter_passages(content, query, k=DEFAULT_K, bypass_threshold=BYPASS_THRESHOLD, backend=None,
+                    dedup=None, corpus_stats_path=None, fusion=DEFAULT_FUSION):
     """
     Pre-filter web page content using BM25 scoring.
 
     Args:
-        content: Full page text (markdown)
-        query: The search subquestion
+        content: Full page text (markdown), or a text file object to stream
+        query: The search subquestion, or a list of queries (strings or
+            {"query": ..., "weight": ...}) fused into one ranking
         k: Number of top passages to return
         bypass_threshold: Pass all if fewer chunks than this
+        backend: BM25 backend name (see BACKENDS; default BM25_BACKEND env)
+        dedup: collapse near-duplicate chunks first (default BM25_DEDUP env)
+        corpus_stats_path: running corpus statistics to update and score
+            with (default BM25_CORPUS_STATS env; empty = per-page IDF)
+        fusion: how a list of queries is combined (see FUSION_METHODS)
 
     Returns:
         List of dicts: [{"text": ..., "score": ..., "index": ...}, ...]
     """
-    # Chunk the page
-    chunks = chunk_page(content)
+    stats = corpus_stats.open_stats(DEFAULT_CORPUS_STATS if corpus_stats_path is None else corpus_stats_path)
+    page = PreparedPage(content, backend=backend, dedup=dedup, stats=stats)
+    return filter_prepared(page, query, k=k, bypass_threshold=bypass_threshold, fusion=fusion)
+
 
+def filter_prepared(page, query, k=DEFAULT_K, bypass_threshold=BYPASS_THRESHOLD, lead_bonus=LEAD_BONUS,
+                    fusion=DEFAULT_FUSION):
+    """Run filter_passages against an already chunked PreparedPage."""
+    chunks = page.chunks
+    weighted = weighted_queries(query)
+    if weighted is not None and fusion not in FUSION_METHODS:
+        raise ValueError(f"unknown fusion '{fusion}', expected one of: {', '.join(FUSION_METHODS)}")
+
+    instrument.count('bm25.queries')
     if not chunks:
-        return [{"text": content[:3000], "score": 0.0, "index": 0}]
+        instrument.count('bm25.no_chunks')
+        return [{"text": page.content[:PreparedPage.PREFIX_CHARS], "score": 0.0, "index": 0}]
 
     # Bypass filter for short pages
     if len(chunks) <= bypass_threshold:
-        return [
-            {"text": c, "score": 1.0, "index": i}
-            for i, c in enumerate(chunks)
-        ]
+        instrument.count('bm25.bypass')
+        return [page.passage(i, 1.0) for i in range(len(chunks))]
 
-    # Tokenize chunks and query
-    tokenized_chunks = [tokenize(c) for c in chunks]
-    tokenized_query = tokenize(query)
+    # Tokenize query (chunks are tokenized once per page)
+    if weighted is None:
+        query_terms = tokenize(query)
+    else:
+        weighted = [(tokenize(text), weight) for text, weight in weighted]
+        weighted = [(terms, weight) for terms, weight in weighted if terms and weight > 0]
+        query_terms = [t for terms, _ in weighted for t in terms]
 
-    if not tokenized_query:
+    if not query_terms:
         # Query produced no usable tokens — return all
-        return [
-            {"text": c, "score": 1.0, "index": i}
-            for i, c in enumerate(chunks)
-        ]
+        instrument.count('bm25.empty_query')
+        return [page.passage(i, 1.0) for i in range(len(chunks))]
 
     # Score with BM25
-    bm25 = BM25(tokenized_chunks)
-    scores = bm25.get_scores(tokenized_query)
-
-    # Add lead passage bonus
-    max_score = max(scores) if scores else 1.0
-    if max_score > 0:
-        for i in range(len(scores)):
-            position_factor = max(0, 1 - (i / len(scores)))
-            scores[i] += LEAD_BONUS * position_factor * max_score
-
-    # Select top-K
-    ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
-    top_indices = ranked[:k]
+    bm25 = page.bm25
+    with instrument.span('bm25.score', chunks=len(chunks), k=k, queries=len(weighted or [query])):
+        if weighted is None:
+            scores = bm25.get_scores(VOCAB.lookup(query_terms))
+        else:
+            instrument.count('bm25.fused_queries', len(weighted))
+            per_query = bm25.get_scores_multi([VOCAB.lookup(terms) for terms, _ in weighted])
+            scores = fuse_scores(per_query, [weight for _, weight in weighted], fusion)
+
+        # Add lead passage bonus
+        max_score = max(scores) if scores else 1.0
+        if max_score > 0:
+            for i in range(len(scores)):
+                position_factor = max(0, 1 - (i / len(scores)))
+                scores[i] += lead_bonus * position_factor * max_score
+
+        # Select top-K (bounded heap; ties keep document order like a stable sort)
+        top_indices = heapq.nlargest(k, range(len(scores)), key=scores.__getitem__)
 
     # Return in original document order (preserves reading flow)
     top_indices.sort()
 
-    return [
-        {"text": chunks[i], "score": round(scores[i], 4), "index": i}
-        for i in top_indices
-    ]
+    return [page.passage(i, round(scores[i], 4)) for i in top_indices]
+
+
+def _page_params(params):
+    """(content, backend, dedup, corpus stats path) of a request, defaults applied."""
+    stats_path = params.get('corpus_stats')
+    if stats_path is None:
+        stats_path = DEFAULT_CORPUS_STATS
+    return params.get('content', ''), params.get('backend'), params.get('dedup'), stats_path
+
+
+def run(params, page_for=None):
+    """
+    Filter one request shaped like the stdin JSON: "content", "query", "k",
+    "backend", "dedup", "corpus_stats", "fusion".
+
+    The CLI, filter_server.py and filter_client.py's in-process fallback all
+    call this, so a parameter honoured by one is honoured by all.
+    page_for(content, backend, dedup, stats_path) may supply a warm PreparedPage.
+    """
+    content, backend, dedup, stats_path = _page_params(params)
+    if page_for is None:
+        page = PreparedPage(content, backend=backend, dedup=dedup, stats=corpus_stats.open_stats(stats_path))
+    else:
+        page = page_for(content, backend, dedup, stats_path)
+    return filter_prepared(page, params.get('query', ''), k=params.get('k', DEFAULT_K),
+                           fusion=params.get('fusion', DEFAULT_FUSION))
+
+
+# --- Batch Mode ---
+def _batch_queries(record):
+    """Normalize a batch record's "query"/"queries" fields to (query, k, fusion) triples."""
+    default_k = record.get('k', DEFAULT_K)
+    default_fusion = record.get('fusion', DEFAULT_FUSION)
+    queries = list(record.get('queries', []))
+    if 'query' in record:
+        queries.append(record['query'])
+    triples = []
+    for q in queries:
+        if isinstance(q, dict):
+            triples.append((q.get('query', ''), q.get('k', default_k), q.get('fusion', default_fusion)))
+        else:
+            triples.append((q, default_k, default_fusion))
+    return triples
+
+
+def run_batch(lines, out):
+    """
+    Score a JSONL stream of pages against their queries.
+
+    Pages that carry an "id" are kept so later lines can target them with
+    new queries without resending the content.
+    """
+    pages = {}
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"bm25_filter: line {line_no}: invalid JSON: {e}", file=sys.stderr)
+            continue
+
+        page_id = record.get('id', line_no)
+        if 'content' in record:
+            content, backend, dedup, stats_path = _page_params(record)
+            page = PreparedPage(content, backend=backend, dedup=dedup, stats=corpus_stats.open_stats(stats_path))
+            if 'id' in record:
+                pages[page_id] = page
+        elif page_id in pages:
+            page = pages[page_id]
+        else:
+            print(f"bm25_filter: line {line_no}: unknown page id {page_id!r}", file=sys.stderr)
+            out.write(json.dumps({"id": page_id, "error": "unknown page id"}) + '\n')
+            continue
+
+        for query, k, fusion in _batch_queries(record):
+            try:
+                passages = filter_prepared(page, query, k=k, fusion=fusion)
+            except ValueError as e:
+                print(f"bm25_filter: line {line_no}: {e}", file=sys.stderr)
+                out.write(json.dumps({"id": page_id, "query": query, "error": str(e)}) + '\n')
+                continue
+            out.write(json.dumps({"id": page_id, "query": query, "passages": passages}) + '\n')
+        out.flush()
+
+
+# --- Backend Parity Check ---
+_SYNTHETIC_VOCAB = (
+    'retrieval ranking passage evidence claim source quality index query model '
+    'neural sparse dense lexical token corpus agent research citation abstract '
+    'market revenue fiscal quarter court opinion filing regulation trial patient'
+).split()
+
+
+def synthetic_page(paragraphs=400, seed=0):
+    """Deterministic markdown-like page for parity checks and benchmarks."""
+    rng = random.Random(seed)
+    return '\n\n'.join(
+        ' '.join(rng.choice(_SYNTHETIC_VOCAB) for _ in range(rng.randint(20, 120)))
+        for _ in range(paragraphs)
+    )
+
+
+def check_backends(content=None, queries=None, tol=BACKEND_TOLERANCE):
+    """
+    Compare every ArrayBM25 variant against BM25 on one page.
+
+    Returns a list of human-readable mismatch descriptions (empty when all
+    scores agree within tol and top-K selections have the same scores).
+    """
+    content = content if content is not None else synthetic_page()
+    queries = queries or ['retrieval ranking evidence', 'court opinion filing', 'claim claim source']
+    corpus = [tokenize(c) for c in chunk_page(content)]
+    reference = BM25(corpus)
+    variants = [('array', ArrayBM25(corpus, use_numpy=False))]
+    if np is not None:
+        variants.append(('array+numpy', ArrayBM25(corpus, use_numpy=True)))
+
+    mismatches = []
+    for query in queries:
+        q = tokenize(query)
+        expected = reference.get_scores(q)
+        expected_top = [s for _, s in reference.top_k(q, DEFAULT_K)]
+        for name, model in variants:
+            got = model.get_scores(q)
+            worst = max((abs(a - e) for a, e in zip(got, expected)), default=0.0)
+            if len(got) != len(expected) or worst > tol:
+                mismatches.append(f"{name}: get_scores({query!r}) differs by {worst:.3g}")
+            got_top = [s for _, s in model.top_k(q, DEFAULT_K)]
+            if len(got_top) != len(expected_top) or any(
+                    abs(a - e) > tol for a, e in zip(got_top, expected_top)):
+                mismatches.append(f"{name}: top_k({query!r}) selection differs")
+            if abs(model.score(q, 0) - reference.score(q, 0)) > tol:
+                mismatches.append(f"{name}: score({query!r}, 0) differs")
+
+    # One pass over several queries must match scoring them one at a time
+    terms = [tokenize(query) for query in queries]
+    expected = [reference.get_scores(q) for q in terms]
+    for name, model in [('postings', reference)] + variants:
+        for query, got, want in zip(queries, model.get_scores_multi(terms), expected):
+            worst = max((abs(a - e) for a, e in zip(got, want)), default=0.0)
+            if len(got) != len(want) or worst > tol:
+                mismatches.append(f"{name}: get_scores_multi differs for {query!r} by {worst:.3g}")
+    return mismatches
 
 
 # --- CLI Interface ---
@@ -218,25 +942,58 @@ if __name__ == '__main__':
         print(__doc__)
         sys.exit(0)
 
+    if '--check-backends' in sys.argv:
+        content = None
+        if '--file' in sys.argv:
+            with open(sys.argv[sys.argv.index('--file') + 1]) as f:
+                content = f.read()
+        problems = check_backends(content)
+        for problem in problems:
+            print(f"bm25_filter: {problem}", file=sys.stderr)
+        print(json.dumps({"numpy": np is not None, "ok": not problems}))
+        sys.exit(1 if problems else 0)
+
+    if '--batch' in sys.argv:
+        run_batch(sys.stdin, sys.stdout)
+        sys.exit(0)
+
     # Read from stdin (JSON with "query" and "content" fields)
+    path = None
     if not sys.stdin.isatty():
-        data = json.load(sys.stdin)
-        query = data.get('query', '')
-        content = data.get('content', '')
-        k = data.get('k', DEFAULT_K)
+        params = json.load(sys.stdin)
     else:
         # Read from arguments
         import argparse
         parser = argparse.ArgumentParser(description='BM25 passage pre-filtering')
-        parser.add_argument('--query', required=True, help='Search query')
+        parser.add_argument('--query', required=True, action='append',
+                            help='Search query (repeat to fuse several, e.g. HyDE framings)')
         parser.add_argument('--file', required=True, help='Path to page content')
         parser.add_argument('--k', type=int, default=DEFAULT_K, help='Top-K passages')
+        parser.add_argument('--backend', choices=sorted(BACKENDS), help='BM25 scoring backend')
+        parser.add_argument('--no-dedup', dest='dedup', action='store_false', default=None,
+                            help='Keep near-duplicate chunks')
+        parser.add_argument('--corpus-stats', help='Corpus statistics file for corpus-level IDF')
+        parser.add_argument('--fusion', choices=FUSION_METHODS, default=DEFAULT_FUSION,
+                            help='How repeated --query rankings are combined')
         args = parser.parse_args()
-        query = args.query
-        with open(args.file) as f:
-            content = f.read()
-        k = args.k
-
-    results = filter_passages(content, query, k=k)
+        params = {
+            'query': args.query[0] if len(args.query) == 1 else args.query,
+            'k': args.k,
+            'backend': args.backend,
+            'dedup': args.dedup,
+            'corpus_stats': args.corpus_stats,
+            'fusion': args.fusion,
+        }
+        path = args.file
+
+    try:
+        if path is None:
+            results = run(params)
+        else:
+            with open(path) as content:  # streamed through the chunker
+                results = run({**params, 'content': content})
+    except ValueError as e:
+        print(f"bm25_filter: {e}", file=sys.stderr)
+        sys.exit(2)
     json.dump(results, sys.stdout, indent=2)
     print()  # Trailing newline
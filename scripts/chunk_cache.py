@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of chunked and tokenized pages.
+Zero external dependencies — uses only Python stdlib (sqlite3, zlib).
+
+The same URLs come back across subquestions, refinement rounds and projects.
+Entries are keyed by a hash of the page text (surrounding whitespace
+stripped, which never changes the chunks) plus the chunking/tokenizer
+settings, and hold the chunks, near-duplicate clusters, per-chunk term-id
+streams and document frequencies. A repeat page then costs a hash and a
+lookup before query scoring.
+
+Term ids are process-local (tokenizer.VOCAB), so each entry stores its own
+small vocabulary and the id streams are remapped on load. Entries are
+zlib-compressed and evicted least-recently-used once the cache exceeds its
+size cap.
+
+Usage:
+    python scripts/chunk_cache.py stats
+    python scripts/chunk_cache.py clear
+
+Config via env vars:
+    DR_CHUNK_CACHE     = <path>|off  (default: ~/.cache/dr/chunk_cache.sqlite)
+    DR_CHUNK_CACHE_MB  = <megabytes> (default: 128)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+import tokenizer
+from tokenizer import VOCAB
+
+# --- Configuration ---
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'dr', 'chunk_cache.sqlite')
+DEFAULT_MAX_MB = 128
+EVICT_TO = 0.9  # evict down to this fraction of the cap
+FORMAT = 'chunks-v1'  # bump when the chunker, tokenizer or entry layout changes
+HEADER_LEN = struct.Struct('<I')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key      TEXT PRIMARY KEY,
+    value    BLOB NOT NULL,
+    size     INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def page_key(content, settings):
+    """Cache key for page text under the given chunking/tokenizer settings."""
+    settings = dict(settings, token_re=tokenizer._TOKEN_RE.pattern, stem=tokenizer.DEFAULT_STEM)
+    h = hashlib.sha256(f"{FORMAT}\n{sys.byteorder}\n{json.dumps(settings, sort_keys=True)}\n".encode())
+    h.update(content.strip().encode('utf-8', 'surrogatepass'))
+    return h.hexdigest()
+
+
+class CachedPage:
+    """One cache entry: chunks, clusters and (when scored) term ids and document frequencies."""
+
+    __slots__ = ('chunks', 'clusters', 'tokens', 'df')
+
+    def __init__(self, chunks, clusters, tokens=None, df=None):
+        self.chunks = chunks
+        self.clusters = clusters
+        self.tokens = tokens  # [array('I')] in tokenizer.VOCAB ids, or None
+        self.df = df          # {VOCAB id: chunks containing it}, or None
+
+
+def _encode(page):
+    """Pack an entry; token streams are rewritten against a local vocabulary."""
+    header = {'chunks': page.chunks, 'clusters': {str(k): v for k, v in page.clusters.items()}}
+    body = array('I')
+    if page.tokens is not None:
+        local, terms = {}, []
+        lens = []
+        for stream in page.tokens:
+            for tid in stream:
+                lid = local.get(tid)
+                if lid is None:
+                    lid = local[tid] = len(terms)
+                    terms.append(VOCAB.terms[tid])
+                body.append(lid)
+            lens.append(len(stream))
+        df = [0] * len(terms)
+        for tid, n in (page.df or {}).items():
+            df[local[tid]] = n
+        header.update({'vocab': terms, 'lens': lens, 'df': df})
+    raw = json.dumps(header, separators=(',', ':')).encode()
+    return zlib.compress(HEADER_LEN.pack(len(raw)) + raw + body.tobytes())
+
+
+def _decode(blob):
+    data = zlib.decompress(blob)
+    (n,) = HEADER_LEN.unpack_from(data)
+    header = json.loads(data[HEADER_LEN.size:HEADER_LEN.size + n])
+    clusters = {int(k): v for k, v in header['clusters'].items()}
+    if 'vocab' not in header:
+        return CachedPage(header['chunks'], clusters)
+    body = array('I')
+    body.frombytes(data[HEADER_LEN.size + n:])
+    to_global = [VOCAB.id(t) for t in header['vocab']]
+    ids = array('I', map(to_global.__getitem__, body))
+    tokens, pos = [], 0
+    for length in header['lens']:
+        tokens.append(ids[pos:pos + length])
+        pos += length
+    df = {to_global[lid]: n for lid, n in enumerate(header['df'])}
+    return CachedPage(header['chunks'], clusters, tokens, df)
+
+
+class ChunkCache:
+    """SQLite-backed page cache with an LRU size cap."""
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        self._db.execute('INSERT INTO counters (name, value) VALUES (?, 1) '
+                         'ON CONFLICT(name) DO UPDATE SET value = value + 1', (name,))
+
+    def get(self, key):
+        """CachedPage for a page_key, or None."""
+        with self._lock:
+            row = self._db.execute('SELECT value FROM pages WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self._count('misses')
+                return None
+            self._db.execute('UPDATE pages SET accessed = ? WHERE key = ?', (time.time(), key))
+            self._count('hits')
+        return _decode(row[0])
+
+    def put(self, key, page):
+        blob = _encode(page)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO pages (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                             (key, blob, len(blob), time.time()))
+            self._evict()
+
+    def _evict(self):
+        """Drop least-recently-used pages until under the cap."""
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TO
+        doomed = []
+        for key, size in self._db.execute('SELECT key, size FROM pages ORDER BY accessed'):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._db.executemany('DELETE FROM pages WHERE key = ?', doomed)
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages').fetchone()
+            counters = dict(self._db.execute('SELECT name, value FROM counters').fetchall())
+        hits, misses = counters.get('hits', 0), counters.get('misses', 0)
+        return {'path': self.path, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes,
+                'hits': hits, 'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0}
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM pages')
+            self._db.execute('DELETE FROM counters')
+
+    def close(self):
+        self._db.close()
+
+
+_shared = {}
+
+
+def from_env():
+    """Process-wide ChunkCache configured by DR_CHUNK_CACHE, or None when disabled."""
+    path = os.environ.get('DR_CHUNK_CACHE', DEFAULT_PATH)
+    if path.lower() in ('', '0', 'off', 'false', 'none'):
+        return None
+    if path not in _shared:
+        max_mb = float(os.environ.get('DR_CHUNK_CACHE_MB', str(DEFAULT_MAX_MB)))
+        try:
+            _shared[path] = ChunkCache(path, max_bytes=int(max_mb * 1024 * 1024))
+        except (sqlite3.Error, OSError) as e:
+            print(f"chunk_cache: disabled, cannot open {path}: {e}", file=sys.stderr)
+            _shared[path] = None
+    return _shared[path]
+
+
+# --- CLI Interface ---
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print(__doc__)
+        sys.exit(0)
+
+    cache = from_env()
+    if cache is None:
+        print("chunk_cache: disabled (DR_CHUNK_CACHE=off)", file=sys.stderr)
+        sys.exit(1)
+    command = sys.argv[1]
+    if command == 'stats':
+        result = cache.stats()
+    elif command == 'clear':
+        cache.clear()
+        result = {'cleared': cache.path}
+    else:
+        print(f"chunk_cache: unknown command '{command}', expected stats or clear", file=sys.stderr)
+        sys.exit(2)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
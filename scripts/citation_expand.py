@@ -7,33 +7,88 @@ Usage:
     echo '{"urls": [...], "subquestion": "...", "top_n": 5}' | python scripts/citation_expand.py
 
 Input:  JSON with "urls" (list of academic URLs), "subquestion" (string), optional "top_n" (default 5)
+        Optional expansion controls:
+          "depth"        (default 1 — 2 adds a second hop from the best first-hop papers)
+          "frontier"     (default 5 — papers expanded per extra hop)
+          "max_per_seed" (default 100 — citations/references fetched per paper, paginated)
 Output: JSON array of top-N papers from citation expansion, scored and ranked.
+        "source" names the first seed a paper was found through, "sources"
+        every one; the seed-overlap bonus counts distinct origin papers.
+
+Seed IDs are resolved in one POST /paper/batch call (skipped when every seed is
+already a canonical S2 paperId or CorpusId), and second-hop papers are
+fetched with light fields, pruned with score_paper, and only the survivors are
+hydrated through /paper/batch — so each hop costs a bounded number of requests.
 
 Config via env vars:
-    S2_API_KEY   = <key>        (optional — uses unauth pool if not set)
-    S2_TIMEOUT   = <seconds>    (default: 10)
-    S2_MAX_SEEDS = <count>      (default: 3 — max seed papers to expand)
+    S2_API_KEY     = <key>        (optional — uses unauth pool if not set)
+    S2_TIMEOUT     = <seconds>    (default: 10)
+    S2_MAX_SEEDS   = <count>      (default: 3 — max seed papers to expand)
+    S2_RPS         = <req/sec>    (default: per key tier, see RATE_TIERS)
+    S2_CONCURRENCY = <count>      (default: 4 — parallel requests, still bounded by S2_RPS)
+
+The default tiers are Semantic Scholar's published limits: a standard API key
+is allowed 1 request/sec, so S2_CONCURRENCY alone only overlaps response
+latency. Set S2_RPS to the limit granted for your key to go faster; the burst
+allowance grows with it (one second's worth of requests).
+    S2_API_BASE    = <url>        (default: public Graph API — point at a local fake S2 for tests)
+    DR_HTTP_CACHE  = <path>|off   (default: shared on-disk response cache, see http_cache.py)
+    DR_TRACE       = <dir>|off    (request spans, retries, throttle/backoff time; see instrument.py)
+
+Requests share a token-bucket rate limiter and keep-alive connections; 429s
+are retried with jittered exponential backoff, honouring Retry-After.
 
 On any error, returns empty array to stdout + warning to stderr.
 """
 
+import email.utils
 import json
 import math
 import os
+import random
 import re
 import sys
+import threading
 import time
 import urllib.request
 import urllib.error
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import http_cache
+import instrument
+from http_pool import ConnectionPool
+from tokenizer import VOCAB, tokenize
 
 # --- Configuration ---
-S2_BASE = "https://api.semanticscholar.org/graph/v1"
+S2_BASE = os.environ.get("S2_API_BASE", "https://api.semanticscholar.org/graph/v1")
 S2_FIELDS = "paperId,title,year,citationCount,abstract,openAccessPdf,url"
 S2_CITE_FIELDS = "paperId,title,year,citationCount,abstract,openAccessPdf,url,isInfluential"
+S2_LIGHT_FIELDS = "paperId,title,year,citationCount,isInfluential"  # enough to prune before hydrating
+PAGE_SIZE = 100  # citations/references per request
+BATCH_SIZE = 500  # ids per POST /paper/batch (API maximum)
+DEFAULT_DEPTH = 1
+DEFAULT_FRONTIER = 5
+DEFAULT_PER_SEED = 100
+DEFAULT_HOP_LIMIT = 50  # citations/references fetched per frontier paper
+HOP_KEEP_FACTOR = 4  # extra-hop candidates kept for hydration = top_n * factor
 DEFAULT_TOP_N = 5
 DEFAULT_TIMEOUT = 10
 DEFAULT_MAX_SEEDS = 3
-RATE_LIMIT_DELAY = 1.1  # seconds between requests (slightly over 1 RPS)
+DEFAULT_CONCURRENCY = 4
+# Sustained requests/sec per key tier (unauthenticated shares a global pool;
+# 1.0 is the documented limit for a standard key — raise it with S2_RPS)
+RATE_TIERS = {
+    'unauthenticated': 0.9,
+    'api_key': 1.0,
+}
+RATE_BURST = 1  # minimum saved-up requests; higher rates burst one second's worth
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0  # seconds, doubled per retry
+BACKOFF_CAP = 30.0
+
+# IDs the API accepts as-is and that need no /paper/batch resolution
+CANONICAL_ID = re.compile(r'(?:[0-9a-f]{40}|CorpusId:\d+)$')
 
 # --- Academic URL patterns ---
 ACADEMIC_PATTERNS = [
@@ -47,15 +102,6 @@ ACADEMIC_PATTERNS = [
     (re.compile(r'(?:bio|med)rxiv\.org/content/(10\.\d{4,9}/[^\s"<>]+)'), 'doi'),
 ]
 
-STOPWORDS = frozenset([
-    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from',
-    'has', 'he', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'she',
-    'that', 'the', 'to', 'was', 'were', 'will', 'with', 'you', 'your',
-    'this', 'they', 'but', 'have', 'had', 'what', 'when', 'where',
-    'which', 'who', 'how', 'not', 'no', 'can', 'do', 'does', 'if',
-    'than', 'then', 'so', 'we', 'our',
-])
-
 
 # --- ID Extraction ---
 def extract_paper_id(url):
@@ -82,28 +128,32 @@ def _to_s2_id(raw_id, source_type):
 
 
 def _tokenize(text):
-    """Simple tokenizer for keyword overlap scoring."""
-    return {
-        w for w in text.lower().split()
-        if w not in STOPWORDS and len(w) > 2 and w.isalpha()
-    }
+    """Term set for keyword overlap scoring (shared tokenizer)."""
+    return set(tokenize(text))
 
 
 # --- Scoring ---
-def score_paper(paper, query_tokens, current_year=None):
-    """Score a paper for relevance to the subquestion."""
-    if current_year is None:
-        current_year = time.localtime().tm_year
+# Candidate flag bits
+INFLUENTIAL = 1
+OPEN_ACCESS = 2
+HAS_ABSTRACT = 4
+
+
+def _paper_flags(paper):
+    return ((INFLUENTIAL if paper.get('isInfluential') else 0)
+            | (OPEN_ACCESS if paper.get('openAccessPdf') else 0)
+            | (HAS_ABSTRACT if paper.get('abstract') else 0))
+
 
+def _base_score(cc, year, flags, overlap, current_year):
+    """Paper score from its column values (see score_paper)."""
     score = 0.0
 
     # Citation count (log scale, capped at 4)
-    cc = paper.get('citationCount') or 0
     if cc > 0:
         score += min(math.log10(cc + 1), 4.0)
 
     # Recency
-    year = paper.get('year')
     if year:
         age = current_year - year
         if age <= 1:
@@ -114,97 +164,374 @@ def score_paper(paper, query_tokens, current_year=None):
             score += 1.0
 
     # Keyword overlap
-    text = ((paper.get('title') or '') + ' ' + (paper.get('abstract') or '')).lower()
-    text_tokens = _tokenize(text)
-    overlap = len(query_tokens & text_tokens)
     score += min(overlap * 0.5, 3.0)
 
     # Influential citation bonus
-    if paper.get('isInfluential'):
+    if flags & INFLUENTIAL:
         score += 2.0
 
     # Open access bonus
-    if paper.get('openAccessPdf'):
+    if flags & OPEN_ACCESS:
         score += 1.0
 
     # No abstract penalty
-    if not paper.get('abstract'):
+    if not flags & HAS_ABSTRACT:
         score -= 1.0
 
     return round(score, 2)
 
 
+def score_paper(paper, query_tokens, current_year=None):
+    """Score a paper for relevance to the subquestion."""
+    if current_year is None:
+        current_year = time.localtime().tm_year
+    text = (paper.get('title') or '') + ' ' + (paper.get('abstract') or '')
+    overlap = len(query_tokens & _tokenize(text))
+    return _base_score(paper.get('citationCount') or 0, paper.get('year'), _paper_flags(paper),
+                       overlap, current_year)
+
+
+class CandidateTable:
+    """
+    Candidate papers in parallel columns, scored in one pass.
+
+    Row i holds papers[i] plus its citation count, year (0 = unknown), flag
+    bits and title+abstract term ids. origins[i] lists every (direction,
+    origin paper) that led to it, so the seed-overlap bonus counts distinct
+    origins and the output can name all of them. The query vocabulary and
+    current year are fixed when the table is created.
+    """
+
+    def __init__(self, subquestion, current_year=None):
+        self.current_year = time.localtime().tm_year if current_year is None else current_year
+        self.query_ids = frozenset(VOCAB.id(t) for t in _tokenize(subquestion))
+        self.row = {}  # paperId -> row
+        self.pids = []
+        self.papers = []
+        self.citations = array('q')
+        self.years = array('i')
+        self.flags = array('B')
+        self.terms = []  # array('I') of distinct term ids per row
+        self.origins = []  # [(direction, origin paperId)] in discovery order
+        self.hops = array('B')
+
+    def __len__(self):
+        return len(self.pids)
+
+    def __contains__(self, pid):
+        return pid in self.row
+
+    def _columns(self, paper):
+        text = (paper.get('title') or '') + ' ' + (paper.get('abstract') or '')
+        return (paper.get('citationCount') or 0, paper.get('year') or 0, _paper_flags(paper),
+                array('I', sorted(set(VOCAB.encode(text)))))
+
+    def add(self, pid, paper, direction, origin, hop):
+        """Record that origin's citation list (direction) contains pid; True if pid is new."""
+        i = self.row.get(pid)
+        if i is not None:
+            if (direction, origin) not in self.origins[i]:
+                self.origins[i].append((direction, origin))
+            return False
+        self.row[pid] = len(self.pids)
+        self.pids.append(pid)
+        self.papers.append(paper)
+        cc, year, flags, terms = self._columns(paper)
+        self.citations.append(cc)
+        self.years.append(year)
+        self.flags.append(flags)
+        self.terms.append(terms)
+        self.origins.append([(direction, origin)])
+        self.hops.append(hop)
+        return True
+
+    def update(self, pid, paper):
+        """Replace a row's paper (e.g. after hydration) and refresh its columns."""
+        i = self.row[pid]
+        self.papers[i] = paper
+        self.citations[i], self.years[i], self.flags[i], self.terms[i] = self._columns(paper)
+
+    def discard(self, pids):
+        """Drop rows, keeping the remaining rows in insertion order."""
+        drop = {self.row[pid] for pid in pids if pid in self.row}
+        if not drop:
+            return
+        keep = [i for i in range(len(self.pids)) if i not in drop]
+        for name in ('pids', 'papers', 'terms', 'origins'):
+            column = getattr(self, name)
+            setattr(self, name, [column[i] for i in keep])
+        for name in ('citations', 'years', 'flags', 'hops'):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, [column[i] for i in keep]))
+        self.row = {pid: i for i, pid in enumerate(self.pids)}
+
+    def scores(self):
+        """Rank score of every row: paper score plus the seed-overlap bonus."""
+        query, year_now = self.query_ids, self.current_year
+        out = []
+        for cc, year, flags, terms, origins in zip(self.citations, self.years, self.flags,
+                                                   self.terms, self.origins):
+            overlap = sum(1 for t in terms if t in query) if query else 0
+            score = _base_score(cc, year, flags, overlap, year_now)
+            n_origins = len({origin for _, origin in origins})
+            if n_origins > 1:
+                score += n_origins * 1.5
+            out.append(score)
+        return out
+
+
 # --- S2 API Client ---
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests/sec with up to `burst` saved up."""
+
+    def __init__(self, rate, burst=RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        """Hold back every caller for `seconds` (the server asked us to back off)."""
+        with self._lock:
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+
+def _retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _endpoint_name(path):
+    """Cache endpoint for an API path, e.g. /paper/X/citations -> s2:citations."""
+    if path.startswith('/paper/batch'):
+        return 's2:batch'
+    for kind in ('citations', 'references'):
+        if path.endswith('/' + kind):
+            return f's2:{kind}'
+    return 's2'
+
+
 class S2Client:
-    """Minimal Semantic Scholar API client with rate limiting."""
+    """Minimal Semantic Scholar API client with rate limiting.
+
+    rate:        requests/sec (default: RATE_TIERS entry for the key, or S2_RPS);
+                 only a rate above 1 lets concurrent requests start together
+    concurrency: max parallel requests used by expand_citations
+    pool:        optional http_pool.ConnectionPool for keep-alive connections
+    cache:       optional response cache with get(request, endpoint) / put(request, value, endpoint, cost_ms)
+    base:        API root (default S2_BASE)
+    """
 
-    def __init__(self, api_key=None, timeout=DEFAULT_TIMEOUT):
+    def __init__(self, api_key=None, timeout=DEFAULT_TIMEOUT, pool=None, cache=None,
+                 rate=None, concurrency=DEFAULT_CONCURRENCY, base=None):
         self.api_key = api_key
+        self.base = base or S2_BASE
         self.timeout = timeout
-        self._last_request = 0.0
+        self.concurrency = concurrency
+        self.pool = pool or ConnectionPool(timeout=timeout, max_idle=concurrency)
+        self.cache = cache
+        if rate is None:
+            rate = RATE_TIERS['api_key' if api_key else 'unauthenticated']
+        self.limiter = TokenBucket(rate, burst=max(RATE_BURST, int(rate)))
 
     def _throttle(self):
         """Enforce rate limit."""
-        elapsed = time.time() - self._last_request
-        if elapsed < RATE_LIMIT_DELAY:
-            time.sleep(RATE_LIMIT_DELAY - elapsed)
-        self._last_request = time.time()
-
-    def _get(self, path, params=None):
-        """Make GET request to S2 API."""
-        self._throttle()
-        url = f"{S2_BASE}{path}"
+        waited = self.limiter.acquire()
+        instrument.count('s2.throttle_ms', waited * 1000)
+        return waited
+
+    def _backoff(self, attempt, retry_after=None):
+        """Jittered exponential delay, never shorter than the server's Retry-After."""
+        delay = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        server = _retry_after(retry_after)
+        return max(delay, server) if server is not None else delay
+
+    def _request(self, path, params=None, body=None):
+        """GET (or POST when body is given) against the S2 API with retries."""
+        url = f"{self.base}{path}"
         if params:
             query = '&'.join(f'{k}={urllib.request.quote(str(v))}' for k, v in params.items())
             url = f"{url}?{query}"
+        cache_key = url if body is None else f"{url}\n{json.dumps(body, sort_keys=True)}"
+        endpoint = _endpoint_name(path)
+
+        if self.cache is not None:
+            cached = self.cache.get(cache_key, endpoint)
+            instrument.count('s2.cache_misses' if cached is None else 's2.cache_hits')
+            if cached is not None:
+                return cached
 
         headers = {"Accept": "application/json"}
         if self.api_key:
             headers["x-api-key"] = self.api_key
 
-        req = urllib.request.Request(url, headers=headers)
-
-        try:
-            resp = urllib.request.urlopen(req, timeout=self.timeout)
-            return json.loads(resp.read())
-        except urllib.error.HTTPError as e:
-            if e.code == 429:
-                print("citation_expand: rate limited, backing off 5s", file=sys.stderr)
-                time.sleep(5)
-                self._last_request = time.time()
-                try:
-                    resp = urllib.request.urlopen(req, timeout=self.timeout)
-                    return json.loads(resp.read())
-                except Exception:
+        for attempt in range(MAX_RETRIES + 1):
+            self._throttle()
+            start = time.perf_counter()
+            try:
+                with instrument.span('s2.request', endpoint=endpoint, attempt=attempt):
+                    if body is None:
+                        result = self.pool.get_json(url, headers=headers, timeout=self.timeout)
+                    else:
+                        result = self.pool.post_json(url, body, headers=headers, timeout=self.timeout)
+                break
+            except urllib.error.HTTPError as e:
+                if e.code == 429 and attempt < MAX_RETRIES:
+                    delay = self._backoff(attempt, e.headers.get('Retry-After') if e.headers else None)
+                    print(f"citation_expand: rate limited, backing off {delay:.1f}s", file=sys.stderr)
+                    instrument.count('s2.retries')
+                    instrument.count('s2.backoff_ms', delay * 1000)
+                    self.limiter.pause(delay)
+                    continue
+                if e.code == 404:
+                    instrument.count('s2.not_found')
                     return None
-            elif e.code == 404:
-                return None
-            else:
                 print(f"citation_expand: HTTP {e.code} for {path}", file=sys.stderr)
+                instrument.count(f's2.errors.http_{e.code}')
                 return None
-        except (urllib.error.URLError, TimeoutError, OSError) as e:
-            print(f"citation_expand: network error: {e}", file=sys.stderr)
-            return None
+            except (urllib.error.URLError, TimeoutError, OSError, ValueError) as e:
+                print(f"citation_expand: network error: {e}", file=sys.stderr)
+                instrument.count('s2.errors.network')
+                return None
+
+        if self.cache is not None:
+            self.cache.put(cache_key, result, endpoint, cost_ms=(time.perf_counter() - start) * 1000)
+        return result
 
-    def get_citations(self, paper_id, limit=100):
+    def _get(self, path, params=None):
+        """Make GET request to S2 API."""
+        return self._request(path, params)
+
+    def _paginate(self, path, fields, limit):
+        """Follow offset/next through a citation list until `limit` entries."""
+        entries = []
+        offset = 0
+        while len(entries) < limit:
+            page = self._get(path, {
+                "fields": fields,
+                "offset": str(offset),
+                "limit": str(min(PAGE_SIZE, limit - len(entries))),
+            })
+            if not page or 'data' not in page:
+                if not entries:
+                    return page
+                break
+            entries.extend(page['data'])
+            if page.get('next') is None or not page['data']:
+                break
+            offset = page['next']
+        return {'data': entries[:limit]}
+
+    def get_citations(self, paper_id, limit=100, fields=S2_CITE_FIELDS):
         """Get papers that cite this paper (forward)."""
         encoded_id = urllib.request.quote(paper_id, safe=':/')
-        return self._get(f"/paper/{encoded_id}/citations", {
-            "fields": S2_CITE_FIELDS,
-            "limit": str(limit),
-        })
+        return self._paginate(f"/paper/{encoded_id}/citations", fields, limit)
 
-    def get_references(self, paper_id, limit=100):
+    def get_references(self, paper_id, limit=100, fields=S2_CITE_FIELDS):
         """Get papers that this paper cites (backward)."""
         encoded_id = urllib.request.quote(paper_id, safe=':/')
-        return self._get(f"/paper/{encoded_id}/references", {
-            "fields": S2_CITE_FIELDS,
-            "limit": str(limit),
-        })
+        return self._paginate(f"/paper/{encoded_id}/references", fields, limit)
+
+    def get_batch(self, ids, fields=S2_FIELDS):
+        """Look up many papers by any supported ID; result is aligned with ids (None = unknown)."""
+        papers = []
+        for i in range(0, len(ids), BATCH_SIZE):
+            chunk = ids[i:i + BATCH_SIZE]
+            data = self._request("/paper/batch", {"fields": fields}, body={"ids": chunk})
+            if not isinstance(data, list) or len(data) != len(chunk):
+                return None
+            papers.extend(data)
+        return papers
+
+
+def client_from_env(**kwargs):
+    """Build an S2Client from the S2_* env vars."""
+    api_key = os.environ.get("S2_API_KEY", "")
+    timeout = int(os.environ.get("S2_TIMEOUT", str(DEFAULT_TIMEOUT)))
+    rps = os.environ.get("S2_RPS")
+    concurrency = int(os.environ.get("S2_CONCURRENCY", str(DEFAULT_CONCURRENCY)))
+    kwargs.setdefault('cache', http_cache.from_env())
+    return S2Client(api_key=api_key or None, timeout=timeout, rate=float(rps) if rps else None,
+                    concurrency=concurrency, **kwargs)
 
 
 # --- Main Expansion ---
-def expand_citations(urls, subquestion, top_n=DEFAULT_TOP_N, max_seeds=DEFAULT_MAX_SEEDS):
+def _fetch_neighbours(client, paper_ids, limit, fields):
+    """Citations + references for each id, fetched concurrently, in (id, direction) order."""
+    fetches = [(pid, direction) for pid in paper_ids for direction in ('forward', 'backward')]
+
+    def fetch(job):
+        pid, direction = job
+        if direction == 'forward':
+            return client.get_citations(pid, limit=limit, fields=fields)
+        return client.get_references(pid, limit=limit, fields=fields)
+
+    if not fetches:
+        return []
+    # The client's rate limiter bounds how many requests are actually in flight
+    with ThreadPoolExecutor(max_workers=max(1, min(client.concurrency, len(fetches)))) as executor:
+        return list(zip(fetches, executor.map(fetch, fetches)))
+
+
+def _merge_neighbours(table, results, hop, source_names=None):
+    """Fold fetched citation lists into the candidate table; returns paperIds first seen here."""
+    new_ids = []
+    for (origin, direction), data in results:
+        if not data or 'data' not in data:
+            continue
+        origin = (source_names or {}).get(origin, origin)
+        paper_key = 'citingPaper' if direction == 'forward' else 'citedPaper'
+        for entry in data['data']:
+            paper = entry.get(paper_key) or {}
+            pid = paper.get('paperId')
+            if not pid:
+                continue
+            if pid not in table:
+                paper['isInfluential'] = entry.get('isInfluential', False)
+            if table.add(pid, paper, direction, origin, hop):
+                new_ids.append(pid)
+    return new_ids
+
+
+def _source_label(direction, origin):
+    return f"{'citation_of' if direction == 'forward' else 'reference_of'}:{origin}"
+
+
+def _best_first(table, pids):
+    """pids sorted by rank score, best first (stable for ties)."""
+    scores = table.scores()
+    return sorted(pids, key=lambda pid: scores[table.row[pid]], reverse=True)
+
+
+def expand_citations(urls, subquestion, top_n=DEFAULT_TOP_N, max_seeds=DEFAULT_MAX_SEEDS, client=None,
+                     depth=DEFAULT_DEPTH, frontier=DEFAULT_FRONTIER, max_per_seed=DEFAULT_PER_SEED):
     """
     Expand citation graph from academic URLs.
 
@@ -213,15 +540,16 @@ def expand_citations(urls, subquestion, top_n=DEFAULT_TOP_N, max_seeds=DEFAULT_M
         subquestion: the research subquestion (for scoring)
         top_n: number of papers to return
         max_seeds: max seed papers to expand
+        client: optional S2Client to reuse (default: built from env vars)
+        depth: citation hops to follow (1 = seeds' neighbours only)
+        frontier: best-scoring papers expanded at each hop beyond the first
+        max_per_seed: citations/references fetched per seed (paginated)
 
     Returns:
         list of scored paper dicts, sorted by score descending
     """
-    api_key = os.environ.get("S2_API_KEY", "")
-    timeout = int(os.environ.get("S2_TIMEOUT", str(DEFAULT_TIMEOUT)))
-    client = S2Client(api_key=api_key or None, timeout=timeout)
-
-    query_tokens = _tokenize(subquestion)
+    if client is None:
+        client = client_from_env()
 
     # Extract paper IDs from academic URLs
     seeds = []
@@ -233,60 +561,56 @@ def expand_citations(urls, subquestion, top_n=DEFAULT_TOP_N, max_seeds=DEFAULT_M
     if not seeds:
         return []
 
-    print(f"citation_expand: expanding {len(seeds)} seed(s)", file=sys.stderr)
-
-    # Expand each seed (citations + references)
-    all_papers = {}  # paperId -> {paper, seed_count, direction, source_seed}
+    # Resolve the remaining seeds in one batch call: unknown IDs are dropped
+    # before they cost two citation requests, and aliases of one paper collapse
+    # to one seed. Canonical S2 IDs are used as-is, saving the round trip.
+    pending = [seed_id for seed_id, _ in seeds if not CANONICAL_ID.match(seed_id)]
+    resolved = client.get_batch(pending, fields="paperId") if pending else []
+    if resolved is None:
+        resolved = [{'paperId': seed_id} for seed_id in pending]
+    resolved = dict(zip(pending, resolved))
+    seed_names = {}  # id used for requests -> id reported in "source"
+    for seed_id, _ in seeds:
+        paper = resolved[seed_id] if seed_id in resolved else {'paperId': seed_id}
+        if paper and paper.get('paperId'):
+            seed_names.setdefault(paper['paperId'], seed_id)
+        else:
+            print(f"citation_expand: seed {seed_id} not found, skipping", file=sys.stderr)
+    if not seed_names:
+        return []
 
-    for seed_id, seed_url in seeds:
-        # Forward citations
-        cites_data = client.get_citations(seed_id)
-        if cites_data and 'data' in cites_data:
-            for entry in cites_data['data']:
-                paper = entry.get('citingPaper', {})
-                pid = paper.get('paperId')
-                if not pid:
-                    continue
-                if pid not in all_papers:
-                    paper['isInfluential'] = entry.get('isInfluential', False)
-                    all_papers[pid] = {
-                        'paper': paper,
-                        'seed_count': 1,
-                        'direction': 'forward',
-                        'source_seed': seed_id,
-                    }
-                else:
-                    all_papers[pid]['seed_count'] += 1
-
-        # Backward references
-        refs_data = client.get_references(seed_id)
-        if refs_data and 'data' in refs_data:
-            for entry in refs_data['data']:
-                paper = entry.get('citedPaper', {})
-                pid = paper.get('paperId')
-                if not pid:
-                    continue
-                if pid not in all_papers:
-                    paper['isInfluential'] = entry.get('isInfluential', False)
-                    all_papers[pid] = {
-                        'paper': paper,
-                        'seed_count': 1,
-                        'direction': 'backward',
-                        'source_seed': seed_id,
-                    }
-                else:
-                    all_papers[pid]['seed_count'] += 1
-
-    # Score and rank
+    print(f"citation_expand: expanding {len(seed_names)} seed(s)", file=sys.stderr)
+
+    table = CandidateTable(subquestion)
+    results = _fetch_neighbours(client, list(seed_names), max_per_seed, S2_CITE_FIELDS)
+    last_hop = _merge_neighbours(table, results, hop=1, source_names=seed_names)
+
+    # Extra hops: expand only the best papers of the previous hop, fetch their
+    # neighbours with light fields, keep the best and hydrate just those
+    expanded = set(seed_names)
+    for hop in range(2, depth + 1):
+        candidates = _best_first(table, [pid for pid in last_hop if pid not in expanded])
+        hop_seeds = candidates[:frontier]
+        if not hop_seeds:
+            break
+        expanded.update(hop_seeds)
+        results = _fetch_neighbours(client, hop_seeds, DEFAULT_HOP_LIMIT, S2_LIGHT_FIELDS)
+        new_ids = _best_first(table, _merge_neighbours(table, results, hop=hop))
+
+        keep = new_ids[:top_n * HOP_KEEP_FACTOR]
+        table.discard(new_ids[len(keep):])
+        hydrated = client.get_batch(keep) or []
+        for pid, full in zip(keep, hydrated):
+            if full:
+                influential = table.papers[table.row[pid]].get('isInfluential')
+                table.update(pid, {**full, 'isInfluential': influential})
+        last_hop = keep
+
+    # Score and rank every candidate in one pass
     scored = []
-    for pid, info in all_papers.items():
-        paper = info['paper']
-        base_score = score_paper(paper, query_tokens)
-
-        # Seed overlap bonus
-        if info['seed_count'] > 1:
-            base_score += info['seed_count'] * 1.5
-
+    for pid, paper, origins, hop, base_score in zip(table.pids, table.papers, table.origins,
+                                                    table.hops, table.scores()):
+        direction, origin = origins[0]
         scored.append({
             'paperId': pid,
             'title': paper.get('title', ''),
@@ -296,16 +620,40 @@ def expand_citations(urls, subquestion, top_n=DEFAULT_TOP_N, max_seeds=DEFAULT_M
             'url': paper.get('url') or f"https://www.semanticscholar.org/paper/{pid}",
             'openAccessPdf': (paper.get('openAccessPdf') or {}).get('url'),
             'score': round(base_score, 2),
-            'source': f"{'citation_of' if info['direction'] == 'forward' else 'reference_of'}:{info['source_seed']}",
-            'direction': info['direction'],
+            'source': _source_label(direction, origin),
+            'sources': [_source_label(d, o) for d, o in origins],
+            'direction': direction,
+            'hop': hop,
         })
 
     scored.sort(key=lambda x: x['score'], reverse=True)
-    print(f"citation_expand: found {len(all_papers)} papers, returning top {min(top_n, len(scored))}", file=sys.stderr)
+    print(f"citation_expand: found {len(table)} papers, returning top {min(top_n, len(scored))}", file=sys.stderr)
     return scored[:top_n]
 
 
 # --- CLI Interface ---
+def run(data, client=None):
+    """Expand a parsed stdin request; returns an empty list on any error."""
+    urls = data.get('urls', [])
+    subquestion = data.get('subquestion', '')
+    top_n = data.get('top_n', DEFAULT_TOP_N)
+
+    if not urls:
+        return []
+
+    try:
+        return expand_citations(
+            urls, subquestion, top_n=top_n, client=client,
+            max_seeds=int(os.environ.get("S2_MAX_SEEDS", str(DEFAULT_MAX_SEEDS))),
+            depth=data.get('depth', DEFAULT_DEPTH),
+            frontier=data.get('frontier', DEFAULT_FRONTIER),
+            max_per_seed=data.get('max_per_seed', DEFAULT_PER_SEED),
+        )
+    except Exception as e:
+        print(f"citation_expand: unexpected error: {e}", file=sys.stderr)
+        return []
+
+
 def main():
     if '--help' in sys.argv or '-h' in sys.argv:
         print(__doc__)
@@ -319,23 +667,8 @@ def main():
         print()
         return
 
-    urls = data.get('urls', [])
-    subquestion = data.get('subquestion', '')
-    top_n = data.get('top_n', DEFAULT_TOP_N)
-
-    if not urls:
-        json.dump([], sys.stdout)
-        print()
-        return
-
-    try:
-        results = expand_citations(urls, subquestion, top_n=top_n)
-        json.dump(results, sys.stdout, indent=2)
-        print()
-    except Exception as e:
-        print(f"citation_expand: unexpected error: {e}", file=sys.stderr)
-        json.dump([], sys.stdout)
-        print()
+    json.dump(run(data), sys.stdout, indent=2)
+    print()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Running document-frequency statistics across the pages of a subquestion or project.
+Zero external dependencies — uses only Python stdlib (sqlite3).
+
+Per-page BM25 computes IDF from that page's chunks alone, so a term in every
+chunk of a focused page scores near zero even when it is rare across the
+sources. With corpus stats, every page filtered adds its chunk document
+frequencies once (pages are keyed by content hash) and BM25 scores with
+corpus-level IDF. Earlier pages are never re-indexed.
+
+Usage:
+    python scripts/corpus_stats.py show  RESEARCH/my-project/corpus_stats.sqlite [--top 20]
+    python scripts/corpus_stats.py clear RESEARCH/my-project/corpus_stats.sqlite
+
+Used by bm25_filter.py via --corpus-stats PATH, "corpus_stats": PATH in the
+input JSON, or env BM25_CORPUS_STATS.
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS df (
+    term TEXT PRIMARY KEY,
+    n    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    key    TEXT PRIMARY KEY,
+    chunks INTEGER NOT NULL
+);
+"""
+LOOKUP_BATCH = 500  # terms per SELECT ... IN (...)
+
+
+def page_key(chunks):
+    h = hashlib.sha1()
+    for chunk in chunks:
+        h.update(chunk.encode('utf-8', 'surrogatepass'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class CorpusStats:
+    """Chunk count and per-term chunk frequencies over every page added, in SQLite."""
+
+    def __init__(self, path):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    @property
+    def n_chunks(self):
+        return self._db.execute('SELECT COALESCE(SUM(chunks), 0) FROM pages').fetchone()[0]
+
+    def add_page(self, key, df, n_chunks):
+        """Count a page once: df maps term -> chunks containing it. False if already counted."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                if self._db.execute('SELECT 1 FROM pages WHERE key = ?', (key,)).fetchone():
+                    self._db.execute('ROLLBACK')
+                    return False
+                self._db.execute('INSERT INTO pages (key, chunks) VALUES (?, ?)', (key, n_chunks))
+                self._db.executemany('INSERT INTO df (term, n) VALUES (?, ?) '
+                                     'ON CONFLICT(term) DO UPDATE SET n = n + excluded.n', df.items())
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+        return True
+
+    def doc_freqs(self, terms):
+        """{term: chunks containing it} for the given terms (absent terms are left out)."""
+        terms = list(set(terms))
+        found = {}
+        with self._lock:
+            for i in range(0, len(terms), LOOKUP_BATCH):
+                batch = terms[i:i + LOOKUP_BATCH]
+                marks = ','.join('?' * len(batch))
+                found.update(self._db.execute(f'SELECT term, n FROM df WHERE term IN ({marks})', batch))
+        return found
+
+    def idf(self, terms):
+        """Corpus-level BM25 IDF for terms, same formula as the per-page scorer."""
+        n_total = self.n_chunks
+        df = self.doc_freqs(terms)
+        return {t: math.log((n_total - df.get(t, 0) + 0.5) / (df.get(t, 0) + 0.5) + 1) for t in set(terms)}
+
+    def summary(self, top=20):
+        with self._lock:
+            pages, chunks = self._db.execute('SELECT COUNT(*), COALESCE(SUM(chunks), 0) FROM pages').fetchone()
+            terms = self._db.execute('SELECT COUNT(*) FROM df').fetchone()[0]
+            common = self._db.execute('SELECT term, n FROM df ORDER BY n DESC, term LIMIT ?', (top,)).fetchall()
+        return {'path': self.path, 'pages': pages, 'chunks': chunks, 'terms': terms,
+                'most_common': [[t, n] for t, n in common]}
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM df')
+            self._db.execute('DELETE FROM pages')
+
+    def close(self):
+        self._db.close()
+
+
+_shared = {}
+
+
+def open_stats(path):
+    """Process-wide CorpusStats for a path (None/'' means off)."""
+    if not path:
+        return None
+    if path not in _shared:
+        _shared[path] = CorpusStats(path)
+    return _shared[path]
+
+
+# --- CLI Interface ---
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] in ('-h', '--help'):
+        print(__doc__)
+        sys.exit(0)
+
+    command, path = sys.argv[1], sys.argv[2]
+    if not os.path.exists(path):
+        print(f"corpus_stats: no statistics at {path}", file=sys.stderr)
+        sys.exit(1)
+    stats = CorpusStats(path)
+    if command == 'show':
+        top = int(sys.argv[sys.argv.index('--top') + 1]) if '--top' in sys.argv else 20
+        result = stats.summary(top)
+    elif command == 'clear':
+        stats.clear()
+        result = {'cleared': path}
+    else:
+        print(f"corpus_stats: unknown command '{command}', expected show or clear", file=sys.stderr)
+        sys.exit(2)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Retrieval-quality evaluation of bm25_filter (optionally + rerank) on labeled qrels.
+Zero external dependencies — uses only Python stdlib.
+
+Every passage that survives the filter costs LLM context downstream. The
+filter's constants (K, bypass threshold, chunk sizes, BM25 k1/b, lead bonus)
+decide how many survive, so this scores filter_passages over labeled
+(query, page, relevant span) sets and grid-searches those constants in a
+process pool.
+
+Qrels (JSONL, one judged query per line):
+    {"id": "q1", "query": "...", "page": "pages/a.md", "relevant": ["span", ...]}
+    {"id": "q2", "query": "...", "content": "<page text>", "relevant": ["span", ...]}
+"page" paths are relative to the qrels file. Spans are matched on lowercase
+words, so markdown and whitespace differences do not matter. A span cut by a
+chunk boundary counts once the returned passages hold SPAN_MATCH of its word
+trigrams between them.
+
+Metrics (means over judged queries):
+    recall     fraction of relevant spans found in the returned passages
+    ndcg       nDCG@K of the passages by rank (relevant = holds PASSAGE_MATCH of a span)
+    tokens     estimated LLM tokens passed on (characters / CHARS_PER_TOKEN)
+    reduction  1 - tokens / tokens of the whole page
+    passages   passages returned
+
+Usage:
+    python scripts/eval_retrieval.py qrels.jsonl                          # current constants only
+    python scripts/eval_retrieval.py qrels.jsonl --grid                   # DEFAULT_GRID
+    python scripts/eval_retrieval.py qrels.jsonl --grid '{"k": [5, 10], "max_words": [200, 300]}'
+    python scripts/eval_retrieval.py qrels.jsonl --grid grid.json --workers 8 --rerank 10
+
+Grid keys: k, bypass_threshold, min_words, max_words, k1, b, lead_bonus;
+keys left out stay at the bm25_filter constants. --rerank N sends each
+query's passages through rerank.py (RERANKER_* env) and keeps its top N.
+
+Output: JSON report with the current constants' scores ("baseline"), every
+configuration best first, and "recommended": the configuration passing the
+fewest tokens whose recall is within --recall-tolerance of the baseline.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import bm25_filter
+
+# --- Configuration ---
+CHARS_PER_TOKEN = 4     # rough LLM tokenizer ratio for English prose
+SPAN_MATCH = 0.6        # share of a span's trigrams the returned passages must hold
+PASSAGE_MATCH = 0.3     # share of some span's trigrams that makes one passage relevant
+DEFAULT_TOLERANCE = 0.01
+PARAMS = ('k', 'bypass_threshold', 'min_words', 'max_words', 'k1', 'b', 'lead_bonus')
+DEFAULT_GRID = {
+    'k': [3, 5, 8, 10, 15, 20],
+    'max_words': [150, 200, 300],
+    'lead_bonus': [0.0, 0.15, 0.3],
+}
+
+_WORD = re.compile(r'\w+')
+
+
+def default_params():
+    """The constants bm25_filter runs with today."""
+    return {
+        'k': bm25_filter.DEFAULT_K,
+        'bypass_threshold': bm25_filter.BYPASS_THRESHOLD,
+        'min_words': bm25_filter.MIN_CHUNK_WORDS,
+        'max_words': bm25_filter.MAX_CHUNK_WORDS,
+        'k1': bm25_filter.BM25_K1,
+        'b': bm25_filter.BM25_B,
+        'lead_bonus': bm25_filter.LEAD_BONUS,
+    }
+
+
+def expand_grid(grid):
+    """Every parameter combination in grid (over the defaults), current constants first."""
+    unknown = set(grid) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"unknown grid keys: {', '.join(sorted(unknown))}; expected {', '.join(PARAMS)}")
+    base = default_params()
+    keys = sorted(grid)
+    configs = [base]
+    for values in itertools.product(*(grid[key] for key in keys)):
+        config = dict(base, **dict(zip(keys, values)))
+        if config not in configs:
+            configs.append(config)
+    return configs
+
+
+# --- Qrels ---
+def load_qrels(path):
+    """Judgments from a qrels JSONL file, with page text loaded."""
+    root = os.path.dirname(os.path.abspath(path))
+    judgments = []
+    with open(path) as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            content = record.get('content')
+            if content is None:
+                with open(os.path.join(root, record['page']), errors='replace') as page:
+                    content = page.read()
+            spans = [s for s in record.get('relevant', []) if _WORD.search(s)]
+            if not record.get('query') or not spans:
+                print(f"eval_retrieval: line {n}: needs a query and relevant spans, skipped", file=sys.stderr)
+                continue
+            judgments.append({'id': record.get('id', n), 'query': record['query'],
+                              'content': content, 'relevant': spans})
+    return judgments
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def _trigrams(words):
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def span_coverage(span, passage):
+    """Share of a span's word trigrams in passage (1.0 when the whole span occurs in it)."""
+    span_words, passage_words = _words(span), _words(passage)
+    if f" {' '.join(span_words)} " in f" {' '.join(passage_words)} ":
+        return 1.0
+    if len(span_words) < 3:
+        return 0.0
+    grams = _trigrams(span_words)
+    return len(grams & _trigrams(passage_words)) / len(grams)
+
+
+# --- Evaluation ---
+def score_ranking(ranked, coverage, n_spans, relevant_chunks, page_tokens):
+    """Metrics for one query: ranked chunk indices against its coverage matrix."""
+    found = [0.0] * n_spans
+    dcg = 0.0
+    chars = 0
+    for rank, (index, text) in enumerate(ranked):
+        row = coverage[index]
+        for s, share in enumerate(row):
+            found[s] += share
+        if max(row, default=0.0) >= PASSAGE_MATCH:
+            dcg += 1 / math.log2(rank + 2)
+        chars += len(text)
+    ideal = sum(1 / math.log2(rank + 2) for rank in range(min(len(ranked), relevant_chunks)))
+    tokens = chars / CHARS_PER_TOKEN
+    return {
+        'recall': sum(1 for share in found if share >= SPAN_MATCH) / n_spans,
+        'ndcg': dcg / ideal if ideal else 0.0,
+        'tokens': tokens,
+        'reduction': 1 - tokens / page_tokens if page_tokens else 0.0,
+        'passages': len(ranked),
+    }
+
+
+_judgments = []
+_rerank_top_n = 0
+_pages = {}  # (judgment index, min_words, max_words) -> (PreparedPage, coverage matrix, relevant chunks)
+
+
+def _init_worker(judgments, rerank_top_n):
+    global _judgments, _rerank_top_n
+    _judgments, _rerank_top_n = judgments, rerank_top_n
+
+
+def _prepared(i, min_words, max_words):
+    key = (i, min_words, max_words)
+    if key not in _pages:
+        judgment = _judgments[i]
+        page = bm25_filter.PreparedPage(judgment['content'], min_words=min_words, max_words=max_words)
+        coverage = [[span_coverage(span, chunk) for span in judgment['relevant']] for chunk in page.chunks]
+        relevant = sum(1 for row in coverage if max(row, default=0.0) >= PASSAGE_MATCH)
+        _pages[key] = (page, coverage, relevant)
+    return _pages[key]
+
+
+def evaluate_group(configs):
+    """Score configs sharing chunking and BM25 parameters over every judgment."""
+    import rerank
+    first = configs[0]
+    totals = [dict.fromkeys(('recall', 'ndcg', 'tokens', 'reduction', 'passages'), 0.0) for _ in configs]
+    for i, judgment in enumerate(_judgments):
+        page, coverage, relevant = _prepared(i, first['min_words'], first['max_words'])
+        page = page.with_bm25(k1=first['k1'], b=first['b'])
+        page_tokens = len(judgment['content']) / CHARS_PER_TOKEN
+        for config, total in zip(configs, totals):
+            results = bm25_filter.filter_prepared(page, judgment['query'], k=config['k'],
+                                                  bypass_threshold=config['bypass_threshold'],
+                                                  lead_bonus=config['lead_bonus'])
+            if _rerank_top_n and results and coverage:
+                results = rerank.run({'query': judgment['query'], 'passages': results, 'top_n': _rerank_top_n})
+            else:
+                results = sorted(results, key=lambda r: -r['score'])  # stable: ties keep page order
+            # coverage rows follow page.chunks, i.e. the kept chunks when dedup collapsed copies
+            ranked = [(r.get('dedup_index', r['index']), r['text']) for r in results] if coverage else []
+            metrics = score_ranking(ranked, coverage, len(judgment['relevant']), relevant, page_tokens)
+            for name, value in metrics.items():
+                total[name] += value
+    n = max(1, len(_judgments))
+    return [dict(params=config, **{name: round(value / n, 4) for name, value in total.items()})
+            for config, total in zip(configs, totals)]
+
+
+def run_grid(judgments, configs, workers=None, rerank_top_n=0):
+    """Evaluate configs in a process pool; one task per chunking/BM25 setting."""
+    groups = {}
+    for config in configs:
+        groups.setdefault(tuple(config[p] for p in ('min_words', 'max_words', 'k1', 'b')), []).append(config)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(groups) == 1:
+        _init_worker(judgments, rerank_top_n)
+        results = [r for group in groups.values() for r in evaluate_group(group)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(groups)), initializer=_init_worker,
+                                 initargs=(judgments, rerank_top_n)) as ex:
+            results = [r for batch in ex.map(evaluate_group, groups.values()) for r in batch]
+    order = {json.dumps(c, sort_keys=True): n for n, c in enumerate(configs)}
+    return sorted(results, key=lambda r: order[json.dumps(r['params'], sort_keys=True)])
+
+
+def recommend(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Cheapest configuration (fewest tokens) whose recall is within tolerance of the baseline."""
+    keeping = [r for r in results if r['recall'] >= baseline['recall'] - tolerance]
+    return min(keeping, key=lambda r: (r['tokens'], -r['ndcg'], -r['recall']))
+
+
+# --- CLI Interface ---
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate and tune bm25_filter on labeled qrels')
+    parser.add_argument('qrels', help='Qrels JSONL file')
+    parser.add_argument('--grid', nargs='?', const='default',
+                        help='Parameter grid: JSON object or file (no value: DEFAULT_GRID)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--rerank', type=int, default=0, metavar='N', help='Rerank and keep the top N passages')
+    parser.add_argument('--recall-tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Recall the recommendation may give up vs the current constants')
+    args = parser.parse_args()
+
+    judgments = load_qrels(args.qrels)
+    if not judgments:
+        print("eval_retrieval: no usable judgments", file=sys.stderr)
+        sys.exit(1)
+
+    grid = {}
+    if args.grid == 'default':
+        grid = DEFAULT_GRID
+    elif args.grid:
+        if os.path.exists(args.grid):
+            with open(args.grid) as f:
+                grid = json.load(f)
+        else:
+            grid = json.loads(args.grid)
+    try:
+        configs = expand_grid(grid)
+    except ValueError as e:
+        print(f"eval_retrieval: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    print(f"eval_retrieval: {len(judgments)} judgments x {len(configs)} configurations", file=sys.stderr)
+    results = run_grid(judgments, configs, workers=args.workers, rerank_top_n=args.rerank)
+    baseline = results[0]
+    report = {
+        'judgments': len(judgments),
+        'configurations': len(configs),
+        'baseline': baseline,
+        'recommended': recommend(results, baseline, args.recall_tolerance),
+        'results': sorted(results, key=lambda r: (-r['recall'], -r['ndcg'], r['tokens'])),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
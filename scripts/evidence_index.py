@@ -0,0 +1,834 @@
+#!/usr/bin/env python3
+"""
+Project-wide evidence index over every fetched page.
+Zero external dependencies — uses only Python stdlib.
+
+Pages are chunked and tokenized with the bm25_filter pipeline and appended to
+RESEARCH/{project}/evidence_index/ as they are fetched. Claim verification
+then queries one BM25 index across all sources instead of re-reading
+evidence_passages.json.
+
+Usage:
+    echo '{"url": "...", "content": "...", "quality": "B", "title": "..."}' \\
+        | python scripts/evidence_index.py add --project RESEARCH/my-project
+    python scripts/evidence_index.py query --project RESEARCH/my-project --claim "..." [--k 10] [--min-quality B]
+    echo '{"claim": "...", "k": 5}' | python scripts/evidence_index.py query --project RESEARCH/my-project
+    python scripts/evidence_index.py import --project ... --passages 07_working_notes/evidence_passages.json
+    python scripts/evidence_index.py import --project ... --catalog 03_source_catalog.csv
+    python scripts/evidence_index.py export --project ... --format passages|catalog [--out FILE]
+    python scripts/evidence_index.py compact --project ...
+
+Output:
+    add   -> {"url": ..., "chunks": N, "duplicates": N, "status": "added"|"unchanged"|"updated"}
+    query -> JSON array of {"text", "score", "url", "quality", "title", "chunk"[, "also_in"]}
+
+Storage: immutable binary segments (see write_segment) listed in
+segments.json. Every add writes one small segment; once more than
+MAX_SEGMENTS exist they are merged into one, dropping superseded pages.
+Readers memory-map segments and read passage text, postings and chunk
+lengths in place without parsing. Re-adding a URL with identical content
+is a no-op; changed content supersedes the earlier version. export
+reproduces the evidence_passages.json / 03_source_catalog.csv layouts,
+including every field that was imported.
+
+Near-duplicates: add collapses chunks that repeat (SimHash, see near_dup.py)
+either earlier in the same page or a chunk already indexed from another URL,
+e.g. syndicated copies of one press release. Only the first copy is stored;
+the page records which chunks it repeats, and query results for that chunk
+list the other URLs under "also_in" so independence checks still see every
+source. Pass "dedup": false to add to store everything. When the page holding
+the first copy is replaced, the copies are re-pointed at the chunk of the new
+version with the same SimHash, or, if it is gone, stored on their own page.
+"""
+
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections import Counter
+
+from bm25_filter import BM25_B, BM25_K1, DEFAULT_K, chunk_page, chunk_page_dedup, tokenize
+from near_dup import MAX_DISTANCE, SimHashIndex, distance, simhash
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; writers are then unlocked
+    fcntl = None
+
+# --- Configuration ---
+INDEX_DIRNAME = 'evidence_index'
+MANIFEST_FILE = 'segments.json'
+LOCK_FILE = 'index.lock'
+LEGACY_PAGES_FILE = 'pages.jsonl'  # JSONL layout used before binary segments
+MAX_SEGMENTS = 8
+OPEN_ATTEMPTS = 5  # manifest re-reads while a concurrent merge swaps segments
+QUALITY_GRADES = 'ABCDE'  # best to worst
+FALLBACK_CHARS = 3000  # pages that yield no chunks are indexed as one prefix chunk
+CATALOG_COLUMNS = ['id', 'url', 'title', 'grade', 'type', 'date', 'used_for']
+
+
+def content_hash(content):
+    return hashlib.sha1(content.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def chunk_for_index(content, dedup=True):
+    """(chunks, near-duplicates folded within the page, SimHashes or None) as add stores a page."""
+    if dedup:
+        chunks, folded, hashes = chunk_page_dedup(content)
+        n_folded = sum(len(v) for v in folded.values())
+    else:
+        chunks, n_folded, hashes = chunk_page(content), 0, None
+    if not chunks:
+        chunks, hashes = [content[:FALLBACK_CHARS]], None
+    return chunks, n_folded, hashes
+
+
+def collapse_copies(url, hashes, index):
+    """Chunks another source already carries: (positions to keep, [{"url", "chunk"} of each copy])."""
+    keep, copies = [], []
+    for i, value in enumerate(hashes):
+        original = index.find(value, skip=lambda key: key[0] == url)
+        if original is None:
+            keep.append(i)
+        else:
+            copies.append({'url': original[0], 'chunk': original[1], 'simhash': value})
+    return keep, copies
+
+
+def rehome_copy(copy, old_hashes, new_hashes):
+    """Chunk of a replaced original that still carries copy, by SimHash; None if it is gone."""
+    value = copy.get('simhash')
+    if value is None and copy['chunk'] < len(old_hashes):
+        value = old_hashes[copy['chunk']]  # copies recorded before they carried their own hash
+    if value is None:
+        return None
+    return next((i for i, h in enumerate(new_hashes) if distance(h, value) <= MAX_DISTANCE), None)
+
+
+def page_meta(previous, url, digest, quality, title, subquestion, hashes, copies, n_folded):
+    """Stored metadata for a (re-)added page; previous is its live (segment, entry) or None."""
+    meta = dict(previous[1]['meta']) if previous else {}
+    meta.update({'url': url, 'hash': digest, 'quality': quality, 'title': title,
+                 'subquestion': subquestion})
+    for key in ('simhash', 'copies', 'duplicates'):
+        meta.pop(key, None)
+    if copies:
+        meta['copies'] = copies
+    if hashes is not None:
+        meta['simhash'] = hashes
+    meta['duplicates'] = n_folded + len(copies)
+    return meta
+
+
+# --- Segment Format ---
+# Header, section table, then 8-byte aligned sections. Integer arrays are
+# little-endian and read in place through memoryview casts.
+#   meta           JSON: [{"meta": {...}, "first": chunk id, "n": chunks, "chunk_meta": [...]|null}]
+#   chunk_offsets  u64[n_chunks + 1]  byte offsets into text
+#   chunk_lens     u32[n_chunks]      token count per chunk (BM25 doc length)
+#   text           UTF-8 chunk text, concatenated
+#   term_offsets   u64[n_terms + 1]   byte offsets into terms
+#   terms          UTF-8 terms sorted by byte value
+#   post_ptr       u64[n_terms + 1]   posting range per term
+#   post_ids       u32[n_postings]    ascending chunk ids
+#   post_tfs       u32[n_postings]    term frequency per posting
+MAGIC = b'DRSEG001'
+HEADER = struct.Struct('<8sIIIQ')  # magic, n_docs, n_chunks, n_terms, total tokens
+SECTIONS = ('meta', 'chunk_offsets', 'chunk_lens', 'text', 'term_offsets', 'terms',
+            'post_ptr', 'post_ids', 'post_tfs')
+TABLE = struct.Struct('<' + 'QQ' * len(SECTIONS))
+ALIGN = 8
+
+
+def build_postings(docs):
+    """Invert tokenized docs into ({term: (ids, tfs)}, chunk_lens)."""
+    postings = {}
+    lens = array('I')
+    for doc in docs:
+        for tokens in doc['tokens']:
+            cid = len(lens)
+            lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                entry = postings.get(term)
+                if entry is None:
+                    postings[term] = entry = (array('I'), array('I'))
+                entry[0].append(cid)
+                entry[1].append(tf)
+    return postings, lens
+
+
+def encode_segment(docs, postings, chunk_lens):
+    """Segment layout for docs and postings: (total size, [(offset, bytes), ...])."""
+    if sys.byteorder != 'little':
+        raise RuntimeError("evidence_index segments require a little-endian host")
+
+    entries, text, chunk_offsets = [], bytearray(), array('Q', [0])
+    for doc in docs:
+        entries.append({'meta': doc['meta'], 'first': len(chunk_offsets) - 1,
+                        'n': len(doc['chunks']), 'chunk_meta': doc.get('chunk_meta')})
+        for chunk in doc['chunks']:
+            text += chunk.encode('utf-8', 'surrogatepass')
+            chunk_offsets.append(len(text))
+
+    terms = sorted(postings, key=lambda t: t.encode('utf-8', 'surrogatepass'))
+    term_blob, term_offsets = bytearray(), array('Q', [0])
+    post_ptr, post_ids, post_tfs = array('Q', [0]), array('I'), array('I')
+    for term in terms:
+        term_blob += term.encode('utf-8', 'surrogatepass')
+        term_offsets.append(len(term_blob))
+        ids, tfs = postings[term]
+        post_ids.extend(ids)
+        post_tfs.extend(tfs)
+        post_ptr.append(len(post_ids))
+
+    blobs = [json.dumps(entries).encode(), chunk_offsets.tobytes(), chunk_lens.tobytes(), bytes(text),
+             term_offsets.tobytes(), bytes(term_blob), post_ptr.tobytes(), post_ids.tobytes(),
+             post_tfs.tobytes()]
+    pos = HEADER.size + TABLE.size
+    table, parts = [], []
+    for blob in blobs:
+        pos += -pos % ALIGN
+        table += [pos, len(blob)]
+        parts.append((pos, blob))
+        pos += len(blob)
+    head = HEADER.pack(MAGIC, len(entries), len(chunk_lens), len(terms), sum(chunk_lens)) + TABLE.pack(*table)
+    return pos, [(0, head)] + parts
+
+
+def write_segment(path, docs, postings, chunk_lens):
+    """Write docs ({"meta", "chunks", "chunk_meta"}) and their postings as one segment."""
+    _, parts = encode_segment(docs, postings, chunk_lens)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        for offset, blob in parts:
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(blob)
+    os.replace(tmp, path)
+
+
+class Segment:
+    """Read-only view of one segment: a memory-mapped file, or any buffer holding the layout."""
+
+    def __init__(self, path, buffer=None):
+        self.path = path
+        if buffer is None:
+            with open(path, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            buffer = self._mm
+        else:
+            self._mm = None
+        magic, self.n_docs, self.n_chunks, self.n_terms, self.total_tokens = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not an evidence index segment")
+        table = TABLE.unpack_from(buffer, HEADER.size)
+        self._buf = memoryview(buffer)
+        raw = {name: self._buf[table[2 * i]:table[2 * i] + table[2 * i + 1]]
+               for i, name in enumerate(SECTIONS)}
+
+        self.docs = json.loads(bytes(raw['meta']))
+        self._doc_starts = [d['first'] for d in self.docs]
+        self.chunk_offsets = raw['chunk_offsets'].cast('Q')
+        self.chunk_lens = raw['chunk_lens'].cast('I')
+        self.text = raw['text']
+        self.term_offsets = raw['term_offsets'].cast('Q')
+        self.terms = raw['terms']
+        self.post_ptr = raw['post_ptr'].cast('Q')
+        self.post_ids = raw['post_ids'].cast('I')
+        self.post_tfs = raw['post_tfs'].cast('I')
+        self._views = list(raw.values()) + [self.chunk_offsets, self.chunk_lens, self.term_offsets,
+                                            self.post_ptr, self.post_ids, self.post_tfs]
+
+    def chunk_text(self, cid):
+        return bytes(self.text[self.chunk_offsets[cid]:self.chunk_offsets[cid + 1]]).decode('utf-8', 'surrogatepass')
+
+    def doc_of(self, cid):
+        """Index of the doc that owns chunk cid."""
+        return bisect_right(self._doc_starts, cid) - 1
+
+    def term(self, t):
+        return bytes(self.terms[self.term_offsets[t]:self.term_offsets[t + 1]]).decode('utf-8', 'surrogatepass')
+
+    def find(self, term):
+        """Term number by binary search over the sorted term table, or -1."""
+        key = term.encode('utf-8', 'surrogatepass')
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(self.terms[self.term_offsets[mid]:self.term_offsets[mid + 1]]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and bytes(self.terms[self.term_offsets[lo]:self.term_offsets[lo + 1]]) == key:
+            return lo
+        return -1
+
+    def postings(self, t):
+        lo, hi = self.post_ptr[t], self.post_ptr[t + 1]
+        return self.post_ids[lo:hi], self.post_tfs[lo:hi]
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._buf.release()
+        if self._mm is None:
+            return
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # a caller still holds a postings slice; the map is freed with it
+
+
+# --- Index ---
+class EvidenceIndex:
+    """Per-project passage index: append-only segments with BM25 lookup across all sources."""
+
+    def __init__(self, project_dir):
+        self.project_dir = project_dir
+        self.path = os.path.join(project_dir, INDEX_DIRNAME) if project_dir else None
+        self._segments = None  # [Segment] in manifest order
+        self._live = None      # url -> (segment position, doc number)
+        self._dead = None      # per segment: set of superseded chunk ids
+        self._copies = None    # (url, chunk) -> [urls whose near-duplicate chunk was collapsed into it]
+        self._simhashes = None  # SimHashIndex over live chunks, keyed (url, chunk), built on demand
+
+    # Manifest and locking
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'next_id': 1, 'segments': []}
+
+    def _write_manifest(self, manifest):
+        path = os.path.join(self.path, MANIFEST_FILE)
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def over(cls, segments):
+        """Read-only index over given segments, e.g. views of shared memory (see index_build.py)."""
+        index = cls(None)
+        index._attach(segments)
+        return index
+
+    @staticmethod
+    def _number_docs(manifest, docs):
+        """Give new URLs a stable insertion number; updated docs keep theirs."""
+        for doc in docs:
+            if 'seq' not in doc['meta']:
+                doc['meta']['seq'] = manifest.get('next_doc', 0)
+                manifest['next_doc'] = doc['meta']['seq'] + 1
+
+    def _locked(self):
+        os.makedirs(self.path, exist_ok=True)
+        lock = open(os.path.join(self.path, LOCK_FILE), 'a')
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        return lock
+
+    def _open(self):
+        if self._segments is not None:
+            return
+        if os.path.exists(os.path.join(self.path, LEGACY_PAGES_FILE)):
+            with self._locked():
+                self._migrate_legacy()
+        for _ in range(OPEN_ATTEMPTS):
+            manifest = self._read_manifest()
+            try:
+                segments = [Segment(os.path.join(self.path, name)) for name in manifest['segments']]
+                break
+            except FileNotFoundError as e:
+                missing = e  # a merge replaced segments between manifest read and open
+        else:
+            raise RuntimeError(f"{self.path}: {MANIFEST_FILE} lists a segment that does not exist "
+                               f"({os.path.basename(missing.filename)}) after {OPEN_ATTEMPTS} reads; the index is damaged")
+        self._attach(segments)
+
+    def _attach(self, segments):
+        """Serve reads from already opened segments (oldest first)."""
+        live = {}
+        for s, seg in enumerate(segments):
+            for d, entry in enumerate(seg.docs):
+                live[entry['meta']['url']] = (s, d)
+        dead = [set() for _ in segments]
+        for s, seg in enumerate(segments):
+            for d, entry in enumerate(seg.docs):
+                if live[entry['meta']['url']] != (s, d):
+                    dead[s].update(range(entry['first'], entry['first'] + entry['n']))
+        copies = {}
+        for s, d in live.values():
+            meta = segments[s].docs[d]['meta']
+            for copy in meta.get('copies', ()):
+                copies.setdefault((copy['url'], copy['chunk']), []).append(meta['url'])
+        self._segments, self._live, self._dead, self._copies = segments, live, dead, copies
+
+    def close(self):
+        for seg in self._segments or []:
+            seg.close()
+        self._segments = self._live = self._dead = self._copies = self._simhashes = None
+
+    def get(self, url):
+        """Live (segment, doc entry) for a URL, or None."""
+        self._open()
+        hit = self._live.get(url)
+        if hit is None:
+            return None
+        seg = self._segments[hit[0]]
+        return seg, seg.docs[hit[1]]
+
+    def iter_docs(self):
+        """Live (segment, doc entry) pairs in first-insertion order of their URL."""
+        self._open()
+        live = [(self._segments[s], self._segments[s].docs[d]) for s, d in self._live.values()]
+        live.sort(key=lambda pair: pair[1]['meta'].get('seq', 0))
+        return iter(live)
+
+    @staticmethod
+    def _chunk_hashes(seg, entry):
+        """SimHash of each chunk of a stored doc; docs stored without them are hashed here."""
+        hashes = entry['meta'].get('simhash')
+        if hashes is None or len(hashes) != entry['n']:
+            hashes = [simhash(seg.chunk_text(entry['first'] + i)) for i in range(entry['n'])]
+        return hashes
+
+    def _simhash_index(self):
+        """SimHashes of every live chunk, keyed (url, chunk)."""
+        self._open()
+        if self._simhashes is None:
+            index = SimHashIndex()
+            for seg, entry in self.iter_docs():
+                url = entry['meta']['url']
+                for i, value in enumerate(self._chunk_hashes(seg, entry)):
+                    index.add((url, i), value)
+            self._simhashes = index
+        return self._simhashes
+
+    def _doc_record(self, seg, entry):
+        """Rebuild a writable doc record (meta, chunks, tokens) from a stored doc."""
+        chunks = [seg.chunk_text(c) for c in range(entry['first'], entry['first'] + entry['n'])]
+        return {'meta': dict(entry['meta']), 'chunks': chunks,
+                'chunk_meta': entry.get('chunk_meta'), 'tokens': [tokenize(c) for c in chunks]}
+
+    # Writes
+
+    def _rehome_copies(self, docs):
+        """Rewrite live pages whose collapsed copies point into a page docs replace (lock held).
+
+        A copy is re-pointed to the chunk of the new version with the same
+        SimHash; when the new version no longer has it, the copy's text (taken
+        from the old version) is stored on the copying page after all.
+        """
+        self._open()
+        replaced = {}  # url -> (old chunk hashes, new chunk hashes)
+        for doc in docs:
+            url = doc['meta']['url']
+            previous = self.get(url)
+            if previous is None:
+                continue
+            new_hashes = doc['meta'].get('simhash')
+            if new_hashes is None or len(new_hashes) != len(doc['chunks']):
+                new_hashes = [simhash(c) for c in doc['chunks']]
+            replaced[url] = (previous, self._chunk_hashes(*previous), new_hashes)
+        if not replaced:
+            return []
+
+        batch = {doc['meta']['url'] for doc in docs}
+        fixed = []
+        for seg, entry in self.iter_docs():
+            copies = entry['meta'].get('copies') or ()
+            if entry['meta']['url'] in batch or not any(c['url'] in replaced for c in copies):
+                continue
+            doc = self._doc_record(seg, entry)
+            meta = doc['meta']
+            hashes = list(self._chunk_hashes(seg, entry)) if 'simhash' in meta else None
+            kept = []
+            for copy in copies:
+                if copy['url'] not in replaced:
+                    kept.append(copy)
+                    continue
+                (old_seg, old_entry), old_hashes, new_hashes = replaced[copy['url']]
+                chunk = rehome_copy(copy, old_hashes, new_hashes)
+                if chunk is not None:
+                    kept.append(dict(copy, chunk=chunk))
+                    continue
+                text = old_seg.chunk_text(old_entry['first'] + copy['chunk'])
+                doc['chunks'].append(text)
+                doc['tokens'].append(tokenize(text))
+                if doc['chunk_meta'] is not None:
+                    doc['chunk_meta'].append(None)
+                if hashes is not None:
+                    hashes.append(copy.get('simhash', old_hashes[copy['chunk']]))
+                meta['duplicates'] = max(0, meta.get('duplicates', 0) - 1)
+            meta.pop('copies', None)
+            if kept:
+                meta['copies'] = kept
+            if hashes is not None:
+                meta['simhash'] = hashes
+            fixed.append(doc)
+        return fixed
+
+    def _append(self, docs, postings=None, lens=None):
+        """Write docs as a new segment and merge if the segment count is over budget.
+
+        postings/lens: prebuilt for docs (parallel build); otherwise built from docs' tokens.
+        Pages holding collapsed copies of a replaced page are rewritten alongside.
+        """
+        with self._locked():
+            self.close()
+            self._migrate_legacy()
+            fixed = self._rehome_copies(docs)
+            self.close()
+            manifest = self._read_manifest()
+            if postings is None:
+                docs, fixed = docs + fixed, []
+                postings, lens = build_postings(docs)
+            for batch, batch_postings, batch_lens in ((docs, postings, lens), (fixed, None, None)):
+                if not batch:
+                    continue
+                if batch_postings is None:
+                    batch_postings, batch_lens = build_postings(batch)
+                self._number_docs(manifest, batch)
+                name = f"seg-{manifest['next_id']:06d}.seg"
+                write_segment(os.path.join(self.path, name), batch, batch_postings, batch_lens)
+                manifest['next_id'] += 1
+                manifest['segments'].append(name)
+            self._write_manifest(manifest)
+            if len(manifest['segments']) > MAX_SEGMENTS:
+                self._merge(manifest)
+        self.close()
+
+    def _migrate_legacy(self):
+        """Convert a pages.jsonl index from before binary segments (lock held)."""
+        legacy = os.path.join(self.path, LEGACY_PAGES_FILE)
+        if not os.path.exists(legacy):
+            return
+        pages = {}
+        with open(legacy, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                pages[record['url']] = record
+        docs = [{'meta': {k: record.get(k) for k in ('url', 'hash', 'quality', 'title', 'subquestion')},
+                 'chunks': record['chunks'], 'tokens': record['tokens']} for record in pages.values()]
+        manifest = self._read_manifest()
+        self._number_docs(manifest, docs)
+        if docs:
+            name = f"seg-{manifest['next_id']:06d}.seg"
+            postings, lens = build_postings(docs)
+            write_segment(os.path.join(self.path, name), docs, postings, lens)
+            manifest['next_id'] += 1
+            manifest['segments'].insert(0, name)
+            self._write_manifest(manifest)
+        os.replace(legacy, legacy + '.migrated')
+
+    def _merge(self, manifest):
+        """Merge every segment into one, dropping superseded docs (lock held)."""
+        self._open()
+        docs, lens = [], array('I')
+        remaps = [{} for _ in self._segments]  # old chunk id -> merged chunk id, per segment
+        for seg, entry in self.iter_docs():
+            remap = remaps[self._segments.index(seg)]
+            chunk_ids = range(entry['first'], entry['first'] + entry['n'])
+            docs.append({'meta': entry['meta'], 'chunk_meta': entry.get('chunk_meta'),
+                         'chunks': [seg.chunk_text(c) for c in chunk_ids]})
+            for c in chunk_ids:
+                remap[c] = len(lens)
+                lens.append(seg.chunk_lens[c])
+
+        merged = {}  # term -> [(merged chunk id, tf)]
+        for seg, remap in zip(self._segments, remaps):
+            for t in range(seg.n_terms):
+                ids, tfs = seg.postings(t)
+                kept = [(remap[c], tf) for c, tf in zip(ids, tfs) if c in remap]
+                if kept:
+                    merged.setdefault(seg.term(t), []).extend(kept)
+        postings = {}
+        for term, pairs in merged.items():
+            pairs.sort()
+            postings[term] = (array('I', [c for c, _ in pairs]), array('I', [tf for _, tf in pairs]))
+
+        name = f"seg-{manifest['next_id']:06d}.seg"
+        write_segment(os.path.join(self.path, name), docs, postings, lens)
+        old = manifest['segments']
+        manifest['next_id'] += 1
+        manifest['segments'] = [name]
+        self._write_manifest(manifest)
+        self.close()
+        for stale in old:
+            try:
+                os.unlink(os.path.join(self.path, stale))
+            except OSError:
+                pass
+
+    def compact(self):
+        """Merge all segments now."""
+        with self._locked():
+            self.close()
+            self._migrate_legacy()
+            manifest = self._read_manifest()
+            if len(manifest['segments']) > 1:
+                self._merge(manifest)
+        self.close()
+
+    def add_page(self, url, content, quality=None, title=None, subquestion=None, dedup=True):
+        """Chunk, tokenize and append one fetched page.
+
+        Returns (status, chunks stored, near-duplicate chunks collapsed).
+        """
+        digest = content_hash(content)
+        previous = self.get(url)
+        if previous and previous[1]['meta'].get('hash') == digest:
+            return 'unchanged', previous[1]['n'], previous[1]['meta'].get('duplicates', 0)
+
+        chunks, n_folded, hashes = chunk_for_index(content, dedup)
+        keep = range(len(chunks))
+        copies = []
+        if hashes is not None:
+            keep, copies = collapse_copies(url, hashes, self._simhash_index())
+        chunks = [chunks[i] for i in keep]
+        meta = page_meta(previous, url, digest, quality, title, subquestion,
+                         None if hashes is None else [hashes[i] for i in keep], copies, n_folded)
+        self._append([{'meta': meta, 'chunks': chunks, 'tokens': [tokenize(c) for c in chunks]}])
+        return ('updated' if previous else 'added'), len(chunks), meta['duplicates']
+
+    def import_passages(self, passages):
+        """Import evidence_passages.json records; extra fields are kept per passage."""
+        by_url = {}
+        for p in passages:
+            by_url.setdefault(p.get('url', ''), []).append(p)
+        docs = []
+        for url, group in by_url.items():
+            previous = self.get(url)
+            doc = self._doc_record(*previous) if previous else {'meta': {'url': url}, 'chunks': [],
+                                                                 'chunk_meta': None, 'tokens': []}
+            chunk_meta = doc['chunk_meta'] or [None] * len(doc['chunks'])
+            for p in group:
+                doc['chunks'].append(p.get('text', ''))
+                doc['tokens'].append(tokenize(p.get('text', '')))
+                chunk_meta.append({k: v for k, v in p.items() if k not in ('text', 'url')})
+            doc['chunk_meta'] = chunk_meta
+            docs.append(doc)
+        if docs:
+            self._append(docs)
+        return sum(len(g) for g in by_url.values())
+
+    def import_catalog(self, rows):
+        """Import 03_source_catalog.csv rows as source metadata, keeping every column."""
+        docs = []
+        for row in rows:
+            url = row.get('url')
+            if not url:
+                continue
+            previous = self.get(url)
+            doc = self._doc_record(*previous) if previous else {'meta': {'url': url}, 'chunks': [],
+                                                                 'chunk_meta': None, 'tokens': []}
+            doc['meta']['catalog'] = dict(row)
+            doc['meta']['title'] = doc['meta'].get('title') or row.get('title')
+            doc['meta']['quality'] = doc['meta'].get('quality') or row.get('grade')
+            docs.append(doc)
+        if docs:
+            self._append(docs)
+        return len(docs)
+
+    # Reads
+
+    def query(self, claim, k=DEFAULT_K, min_quality=None):
+        """Top-k passages for a claim across every indexed source."""
+        self._open()
+        allowed = None
+        if min_quality:
+            allowed = set(QUALITY_GRADES[:QUALITY_GRADES.index(min_quality.upper()) + 1])
+
+        n_live = sum(seg.n_chunks - len(dead) for seg, dead in zip(self._segments, self._dead))
+        if n_live == 0:
+            return []
+        live_tokens = sum(seg.total_tokens - sum(seg.chunk_lens[c] for c in dead)
+                          for seg, dead in zip(self._segments, self._dead))
+        avgdl = live_tokens / n_live or 1
+
+        acc = {}  # (segment position, chunk id) -> score
+        for term, count in Counter(tokenize(claim)).items():
+            hits, df = [], 0
+            for s, seg in enumerate(self._segments):
+                t = seg.find(term)
+                if t < 0:
+                    continue
+                ids, tfs = seg.postings(t)
+                dead = self._dead[s]
+                hits.append((s, seg, ids, tfs, dead))
+                df += len(ids) - (sum(1 for c in ids if c in dead) if dead else 0)
+            if not df:
+                continue
+            idf = math.log((n_live - df + 0.5) / (df + 0.5) + 1)
+            for s, seg, ids, tfs, dead in hits:
+                lens = seg.chunk_lens
+                for c, tf in zip(ids, tfs):
+                    if dead and c in dead:
+                        continue
+                    w = idf * (tf * (BM25_K1 + 1)) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lens[c] / avgdl))
+                    acc[(s, c)] = acc.get((s, c), 0.0) + w * count
+
+        if allowed is None:
+            ranked = heapq.nlargest(k, sorted(acc), key=acc.__getitem__)
+        else:
+            ranked = sorted(acc, key=lambda key: (-acc[key], key))
+
+        results = []
+        for s, c in ranked:
+            seg = self._segments[s]
+            entry = seg.docs[seg.doc_of(c)]
+            meta = entry['meta']
+            if allowed is not None and (meta.get('quality') or '').upper() not in allowed:
+                continue
+            result = {
+                'text': seg.chunk_text(c),
+                'score': round(acc[(s, c)], 4),
+                'url': meta['url'],
+                'quality': meta.get('quality'),
+                'title': meta.get('title'),
+                'chunk': c - entry['first'],
+            }
+            also_in = self._copies.get((meta['url'], c - entry['first']))
+            if also_in:
+                result['also_in'] = also_in
+            results.append(result)
+            if len(results) == k:
+                break
+        return results
+
+    def export_passages(self):
+        """All passages in the evidence_passages.json layout, imported fields included.
+
+        Passages come back grouped by URL (first-seen order), as the orchestrator
+        writes them after deduplicating by URL.
+        """
+        out = []
+        for seg, entry in self.iter_docs():
+            chunk_meta = entry.get('chunk_meta') or [None] * entry['n']
+            for i, extra in enumerate(chunk_meta):
+                record = {'text': seg.chunk_text(entry['first'] + i), 'url': entry['meta']['url']}
+                record.update(extra or {})
+                out.append(record)
+        return out
+
+    def export_catalog(self, out):
+        """Write sources in the 03_source_catalog.csv layout, imported columns included."""
+        rows, columns = [], list(CATALOG_COLUMNS)
+        docs = list(self.iter_docs())
+        taken = {e['meta']['catalog'].get('id') for _, e in docs if e['meta'].get('catalog')}
+        next_id = 1
+        for _, entry in docs:
+            meta = entry['meta']
+            row = meta.get('catalog')
+            if row is None:
+                while f"S{next_id:02d}" in taken:
+                    next_id += 1
+                taken.add(f"S{next_id:02d}")
+                row = {'id': f"S{next_id:02d}", 'url': meta['url'], 'title': meta.get('title') or '',
+                       'grade': meta.get('quality') or '', 'used_for': meta.get('subquestion') or ''}
+            columns += [c for c in row if c not in columns]
+            rows.append(row)
+        writer = csv.DictWriter(out, fieldnames=columns, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# --- CLI Interface ---
+def _read_stdin_json():
+    if sys.stdin.isatty():
+        return {}
+    raw = sys.stdin.read()
+    return json.loads(raw) if raw.strip() else {}
+
+
+def main():
+    if '--help' in sys.argv or '-h' in sys.argv or len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='Project-wide evidence index')
+    parser.add_argument('command', choices=['add', 'query', 'import', 'export', 'compact'])
+    parser.add_argument('--project', required=True, help='Project directory, e.g. RESEARCH/my-project')
+    parser.add_argument('--claim', help='Claim to look up (query)')
+    parser.add_argument('--k', type=int, help='Passages to return (query)')
+    parser.add_argument('--min-quality', choices=list(QUALITY_GRADES), help='Worst grade to include (query)')
+    parser.add_argument('--passages', help='evidence_passages.json to import')
+    parser.add_argument('--catalog', help='03_source_catalog.csv to import')
+    parser.add_argument('--format', choices=['passages', 'catalog'], help='Export layout')
+    parser.add_argument('--out', help='Export destination (default: stdout)')
+    args = parser.parse_args()
+
+    index = EvidenceIndex(args.project)
+
+    if args.command == 'compact':
+        index.compact()
+        return
+
+    if args.command == 'import':
+        if not (args.passages or args.catalog):
+            parser.error('import needs --passages and/or --catalog')
+        counts = {}
+        if args.passages:
+            with open(args.passages) as f:
+                counts['passages'] = index.import_passages(json.load(f))
+        if args.catalog:
+            with open(args.catalog, newline='') as f:
+                counts['sources'] = index.import_catalog(list(csv.DictReader(f)))
+        json.dump(counts, sys.stdout)
+        print()
+        return
+
+    if args.command == 'export':
+        if not args.format:
+            parser.error('export needs --format')
+        out = open(args.out, 'w', newline='') if args.out else sys.stdout
+        try:
+            if args.format == 'passages':
+                json.dump(index.export_passages(), out, indent=2)
+                out.write('\n')
+            else:
+                index.export_catalog(out)
+        finally:
+            if args.out:
+                out.close()
+        return
+
+    try:
+        data = {} if args.claim else _read_stdin_json()
+    except json.JSONDecodeError as e:
+        print(f"evidence_index: invalid JSON input: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == 'add':
+        if not data.get('url') or 'content' not in data:
+            print("evidence_index: add needs JSON with \"url\" and \"content\"", file=sys.stderr)
+            sys.exit(1)
+        status, n, dups = index.add_page(data['url'], data['content'], quality=data.get('quality'),
+                                         title=data.get('title'), subquestion=data.get('subquestion'),
+                                         dedup=data.get('dedup', True))
+        json.dump({'url': data['url'], 'chunks': n, 'duplicates': dups, 'status': status}, sys.stdout)
+        print()
+        return
+
+    claim = args.claim or data.get('claim', '')
+    k = args.k or data.get('k', DEFAULT_K)
+    min_quality = args.min_quality or data.get('min_quality')
+    json.dump(index.query(claim, k=k, min_quality=min_quality), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
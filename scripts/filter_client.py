@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Thin client for filter_server.py that keeps each script's stdin/stdout contract.
+Zero external dependencies — uses only Python stdlib.
+
+Usage:
+    echo '{"query": "...", "content": "...", "k": 10}' | python scripts/filter_client.py bm25_filter
+    echo '{"query": ["...", "..."], "fusion": "weighted", "content": "..."}' | python scripts/filter_client.py bm25_filter
+    echo '{"query": "...", "passages": [...]}'        | python scripts/filter_client.py rerank
+    echo '{"urls": [...], "subquestion": "..."}'      | python scripts/filter_client.py citation_expand
+    python scripts/filter_client.py stats
+    python scripts/filter_client.py shutdown
+    python scripts/filter_client.py --check rerank < request.json
+
+If no daemon is listening on DR_FILTER_SOCKET, the request runs in-process,
+so output is identical either way (just without the warm state).
+Every RERANKER_* variable is forwarded with a rerank request, so hedging,
+per-provider keys/endpoints, batching and the routing stats file behave the
+same in the daemon. --check runs one request both ways and compares them. Both paths
+hand the whole bm25_filter request to bm25_filter.run, so "corpus_stats"
+updates and scores against the same statistics file in either mode.
+"""
+
+import json
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET = os.environ.get("DR_FILTER_SOCKET", f"/tmp/dr-filter-{os.getuid()}.sock")
+
+COMMANDS = {
+    'bm25_filter': 'filter_passages',
+    'rerank': 'rerank',
+    'citation_expand': 'expand_citations',
+}
+
+# Env vars with this prefix are forwarded so the daemon reranks with the caller's configuration
+FORWARDED_ENV_PREFIX = 'RERANKER_'
+
+
+def call(method, params=None, socket_path=DEFAULT_SOCKET, timeout=None):
+    """Send one request to the daemon. Raises OSError if it is not reachable."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+        request = {"id": 1, "method": method, "params": params or {}}
+        sock.sendall((json.dumps(request) + '\n').encode())
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    finally:
+        sock.close()
+    if not line:
+        raise ConnectionError("daemon closed the connection")
+    response = json.loads(line)
+    if 'error' in response:
+        raise RuntimeError(response['error'])
+    return response['result']
+
+
+def forwarded_env(environ=None):
+    """The caller's RERANKER_* settings; a relative stats path is resolved here, not in the daemon's cwd."""
+    environ = os.environ if environ is None else environ
+    env = {k: v for k, v in environ.items() if k.startswith(FORWARDED_ENV_PREFIX)}
+    if env.get('RERANKER_STATS'):
+        env['RERANKER_STATS'] = os.path.abspath(os.path.expanduser(env['RERANKER_STATS']))
+    return env
+
+
+def request_params(command, data):
+    """Daemon params for one command's stdin JSON."""
+    if command == 'rerank':
+        return {**data, 'env': forwarded_env()}
+    return data
+
+
+def run_local(command, data):
+    """In-process fallback with the same semantics as the one-shot script."""
+    if command == 'bm25_filter':
+        import bm25_filter
+        return bm25_filter.run(data)
+    if command == 'rerank':
+        import rerank
+        return rerank.run(data)
+    import citation_expand
+    return citation_expand.run(data)
+
+
+def check(command, data, socket_path=DEFAULT_SOCKET):
+    """Run one request through the daemon and in-process; describe any differences (empty = identical)."""
+    remote = call(COMMANDS[command], request_params(command, data), socket_path)
+    local = json.loads(json.dumps(run_local(command, data)))
+    if remote == local:
+        return []
+    if not isinstance(remote, list) or not isinstance(local, list):
+        return [f"{command}: daemon and in-process results differ"]
+    problems = [f"{command}: item {i} differs" for i, (a, b) in enumerate(zip(remote, local)) if a != b]
+    if len(remote) != len(local):
+        problems.append(f"{command}: daemon returned {len(remote)} items, in-process {len(local)}")
+    return problems
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print(__doc__)
+        sys.exit(0)
+
+    checking = sys.argv[1] == '--check'
+    command = sys.argv[2] if checking and len(sys.argv) > 2 else sys.argv[1]
+    if command in ('stats', 'shutdown') and not checking:
+        try:
+            result = call(command)
+        except (OSError, RuntimeError) as e:
+            print(f"filter_client: daemon unavailable: {e}", file=sys.stderr)
+            sys.exit(1)
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+
+    if command not in COMMANDS:
+        print(f"filter_client: unknown command '{command}', expected one of: "
+              f"{', '.join(COMMANDS)}, stats, shutdown", file=sys.stderr)
+        sys.exit(2)
+
+    raw = sys.stdin.read()
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"filter_client: invalid JSON input: {e}", file=sys.stderr)
+        if checking:
+            sys.exit(1)
+        if command == 'rerank':
+            sys.stdout.write(raw)
+            return
+        if command == 'citation_expand':
+            json.dump([], sys.stdout)
+            print()
+            return
+        sys.exit(1)
+
+    if checking:
+        try:
+            problems = check(command, data)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"filter_client: daemon unavailable: {e}", file=sys.stderr)
+            sys.exit(1)
+        for problem in problems:
+            print(f"filter_client: {problem}", file=sys.stderr)
+        print(json.dumps({"command": command, "ok": not problems}))
+        sys.exit(1 if problems else 0)
+
+    try:
+        result = call(COMMANDS[command], request_params(command, data))
+    except (OSError, RuntimeError, ValueError) as e:
+        if not isinstance(e, (FileNotFoundError, ConnectionRefusedError)):
+            print(f"filter_client: daemon error ({e}), running in-process", file=sys.stderr)
+        result = run_local(command, data)
+
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
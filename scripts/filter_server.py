@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Long-lived filter daemon for bm25_filter / rerank / citation_expand.
+Zero external dependencies — uses only Python stdlib.
+
+Keeps warm state between calls (chunked + tokenized pages keyed by content
+hash, keep-alive HTTP connections, Semantic Scholar responses) so startup
+cost is paid once per research project instead of once per call.
+
+Usage:
+    python scripts/filter_server.py [--socket PATH] &
+    echo '{"query": "...", "content": "..."}' | python scripts/filter_client.py bm25_filter
+    python scripts/filter_client.py stats
+
+Protocol: line-delimited JSON over a Unix domain socket.
+    -> {"id": 1, "method": "filter_passages", "params": {"query": "...", "content": "...", "k": 10}}
+    <- {"id": 1, "result": [...]}            or {"id": 1, "error": "..."}
+
+Methods: filter_passages, rerank, expand_citations (params = the script's stdin
+JSON, including bm25_filter's query lists and "fusion"), stats (p50/p99 latency per method + cache counters), shutdown.
+
+Config via env vars:
+    DR_FILTER_SOCKET     = <path>   (default: /tmp/dr-filter-<uid>.sock)
+    DR_FILTER_CACHE_SIZE = <pages>  (default: 256 — warm pages kept in memory)
+    DR_FILTER_VOCAB_MAX  = <terms>  (default: 1000000 — past this, the shared term
+                                     vocabulary and the warm pages are dropped together)
+    DR_HTTP_CACHE                   (S2/rerank responses: on-disk cache, in-memory LRU if off)
+    S2_API_KEY / S2_TIMEOUT         (read once at startup)
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+import bm25_filter
+import citation_expand
+import corpus_stats
+import http_cache
+import instrument
+import rerank
+from http_pool import ConnectionPool
+from tokenizer import VOCAB
+
+# --- Configuration ---
+DEFAULT_SOCKET = os.environ.get("DR_FILTER_SOCKET", f"/tmp/dr-filter-{os.getuid()}.sock")
+DEFAULT_CACHE_SIZE = int(os.environ.get("DR_FILTER_CACHE_SIZE", "256"))
+DEFAULT_VOCAB_MAX = int(os.environ.get("DR_FILTER_VOCAB_MAX", "1000000"))
+S2_CACHE_SIZE = 2048
+LATENCY_WINDOW = 10000  # samples kept per method for percentiles
+HTTP_TIMEOUT = 10
+
+
+class LRUCache:
+    """Thread-safe bounded mapping with hit/miss counters."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, endpoint=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def put(self, key, value, endpoint=None, cost_ms=0.0):
+        self[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+def _percentile(sorted_samples, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+# --- Service ---
+class FilterService:
+    """Dispatches protocol requests to the retrieval scripts with shared warm state."""
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, vocab_max=DEFAULT_VOCAB_MAX):
+        self.started = time.time()
+        self.pages = LRUCache(cache_size)
+        # Pages hold tokenizer.VOCAB ids, which only grows; once it passes vocab_max
+        # both are dropped together while no request is running (one "generation")
+        self.vocab_max = vocab_max
+        self.vocab_resets = 0
+        self._active = 0
+        self._idle = threading.Condition()
+        self.pool = ConnectionPool(timeout=HTTP_TIMEOUT)
+        # Share the on-disk cache with one-shot runs when enabled, else keep responses in memory
+        self.s2_cache = http_cache.from_env() or LRUCache(S2_CACHE_SIZE)
+        self.s2 = citation_expand.client_from_env(pool=self.pool, cache=self.s2_cache)
+        self._latency = {}  # method -> deque of seconds
+        self._errors = {}
+        self._lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def _enter(self):
+        """Admit a request, first starting a new vocabulary generation if it is due."""
+        with self._idle:
+            if len(VOCAB) > self.vocab_max:
+                self._idle.wait_for(lambda: self._active == 0)
+                if len(VOCAB) > self.vocab_max:
+                    self.pages.clear()
+                    VOCAB.reset()
+                    self.vocab_resets += 1
+            self._active += 1
+
+    def _exit(self):
+        with self._idle:
+            self._active -= 1
+            if not self._active:
+                self._idle.notify_all()
+
+    def _page(self, content, backend=None, dedup=None, stats_path=None):
+        key = hashlib.sha1(content.encode('utf-8', 'surrogatepass')).hexdigest()
+        key += f':{backend or ""}:{"" if dedup is None else int(bool(dedup))}:{stats_path or ""}'
+        page = self.pages.get(key)
+        if page is None:
+            page = bm25_filter.PreparedPage(content, backend=backend, dedup=dedup,
+                                            stats=corpus_stats.open_stats(stats_path))
+            self.pages[key] = page
+        return page
+
+    def filter_passages(self, params):
+        return bm25_filter.run(params, page_for=self._page)
+
+    def rerank(self, params):
+        # The client forwards its RERANKER_* vars so results match a one-shot call
+        return rerank.run(params, env=params.get('env'), pool=self.pool)
+
+    def expand_citations(self, params):
+        return citation_expand.run(params, client=self.s2)
+
+    def stats(self, params=None):
+        methods = {}
+        with self._lock:
+            snapshot = {m: sorted(samples) for m, samples in self._latency.items()}
+            errors = dict(self._errors)
+        for method, samples in snapshot.items():
+            methods[method] = {
+                "count": len(samples),
+                "errors": errors.get(method, 0),
+                "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+                "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+            }
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "methods": methods,
+            "page_cache": self.pages.stats(),
+            "vocab": {"terms": len(VOCAB), "max": self.vocab_max, "resets": self.vocab_resets},
+            "s2_cache": self.s2_cache.stats(),
+        }
+
+    def shutdown(self, params=None):
+        self.stopping.set()
+        return {"stopping": True}
+
+    METHODS = ('filter_passages', 'rerank', 'expand_citations', 'stats', 'shutdown')
+
+    def handle(self, request):
+        """Execute one decoded request and return the response object."""
+        req_id = request.get('id')
+        method = request.get('method')
+        if method not in self.METHODS:
+            return {"id": req_id, "error": f"unknown method {method!r}"}
+
+        start = time.perf_counter()
+        self._enter()
+        try:
+            result = getattr(self, method)(request.get('params') or {})
+            response = {"id": req_id, "result": result}
+        except Exception as e:
+            print(f"filter_server: {method} failed: {e}", file=sys.stderr)
+            response = {"id": req_id, "error": str(e)}
+            with self._lock:
+                self._errors[method] = self._errors.get(method, 0) + 1
+        finally:
+            self._exit()
+        elapsed = time.perf_counter() - start
+
+        if method not in ('stats', 'shutdown'):
+            with self._lock:
+                self._latency.setdefault(method, deque(maxlen=LATENCY_WINDOW)).append(elapsed)
+        instrument.flush()  # the daemon outlives many runs; don't hold counters until exit
+        return response
+
+
+# --- Socket Server ---
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                response = {"id": None, "error": f"invalid JSON: {e}"}
+            else:
+                response = service.handle(request)
+            self.wfile.write((json.dumps(response) + '\n').encode())
+            self.wfile.flush()
+            if service.stopping.is_set():
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class FilterServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, service):
+        self.service = service
+        super().__init__(path, _Handler)
+
+
+def _claim_socket(path):
+    """Remove a stale socket file; refuse to start if a daemon is already listening."""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    print(f"filter_server: already running on {path}", file=sys.stderr)
+    sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Persistent filter daemon')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket path')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help='Warm pages kept')
+    parser.add_argument('--vocab-max', type=int, default=DEFAULT_VOCAB_MAX,
+                        help='Vocabulary size that resets the vocabulary and warm pages')
+    args = parser.parse_args()
+
+    _claim_socket(args.socket)
+    service = FilterService(cache_size=args.cache_size, vocab_max=args.vocab_max)
+    server = FilterServer(args.socket, service)
+    print(f"filter_server: listening on {args.socket}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.pool.close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        print(f"filter_server: stats {json.dumps(service.stats())}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+On-disk response cache for Semantic Scholar and reranker API calls.
+Zero external dependencies — uses only Python stdlib (sqlite3).
+
+Entries are keyed by request fingerprint (endpoint + canonical URL/body),
+expire per endpoint TTL, and are evicted least-recently-used once the cache
+exceeds its size cap. Hit/miss counters and the API latency saved by hits
+persist in the same database, shared by every script and process.
+
+Usage:
+    python scripts/http_cache.py stats
+    python scripts/http_cache.py clear
+    python scripts/http_cache.py bench --citation request.json   (cold vs warm run)
+    python scripts/http_cache.py bench --rerank request.json
+
+Config via env vars:
+    DR_HTTP_CACHE      = <path>|off  (default: ~/.cache/dr/http_cache.sqlite)
+    DR_HTTP_CACHE_MB   = <megabytes> (default: 256)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# --- Configuration ---
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'dr', 'http_cache.sqlite')
+DEFAULT_MAX_MB = 256
+EVICT_TO = 0.9  # evict down to this fraction of the cap
+DAY = 86400
+# Endpoint TTLs in seconds; an endpoint matches the longest prefix listed
+TTLS = {
+    's2:citations': 7 * DAY,   # new citing papers appear over time
+    's2:references': 90 * DAY,  # a paper's references never change
+    's2:batch': 30 * DAY,
+    's2': 7 * DAY,
+    'rerank': 30 * DAY,        # deterministic for a given model
+    'default': DAY,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key      TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    value    BLOB NOT NULL,
+    size     INTEGER NOT NULL,
+    cost_ms  REAL NOT NULL,
+    expires  REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    endpoint TEXT PRIMARY KEY,
+    hits     INTEGER NOT NULL DEFAULT 0,
+    misses   INTEGER NOT NULL DEFAULT 0,
+    saved_ms REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+def fingerprint(endpoint, request):
+    """Stable key for an endpoint + request (URL string or JSON-able body)."""
+    canonical = request if isinstance(request, str) else json.dumps(request, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f"{endpoint}\n{canonical}".encode()).hexdigest()
+
+
+def ttl_for(endpoint):
+    best = None
+    for prefix in TTLS:
+        if endpoint == prefix or endpoint.startswith(prefix + ':'):
+            if best is None or len(prefix) > len(best):
+                best = prefix
+    return TTLS[best or 'default']
+
+
+class HttpCache:
+    """SQLite-backed response cache with per-endpoint TTL and LRU size cap."""
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def _count(self, endpoint, hit, saved_ms=0.0):
+        column = 'hits' if hit else 'misses'
+        self._db.execute(
+            f"INSERT INTO counters (endpoint, {column}, saved_ms) VALUES (?, 1, ?) "
+            f"ON CONFLICT(endpoint) DO UPDATE SET {column} = {column} + 1, saved_ms = saved_ms + ?",
+            (endpoint, saved_ms, saved_ms))
+
+    def get(self, request, endpoint='default'):
+        """Cached JSON value for a request, or None (expired entries count as misses)."""
+        key = fingerprint(endpoint, request)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT value, cost_ms, expires FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None or row[2] < now:
+                if row is not None:
+                    self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._count(endpoint, hit=False)
+                return None
+            self._db.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+            self._count(endpoint, hit=True, saved_ms=row[1])
+        return json.loads(row[0])
+
+    def put(self, request, value, endpoint='default', cost_ms=0.0):
+        """Store a JSON value; cost_ms is the API latency a future hit saves."""
+        key = fingerprint(endpoint, request)
+        blob = json.dumps(value, separators=(',', ':')).encode()
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (key, endpoint, value, size, cost_ms, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, endpoint, blob, len(blob), cost_ms, now + ttl_for(endpoint), now))
+            self._evict()
+
+    def _evict(self):
+        """Drop expired entries, then least-recently-used ones, until under the cap."""
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self._db.execute('DELETE FROM entries WHERE expires < ?', (time.time(),))
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        target = self.max_bytes * EVICT_TO
+        doomed = []
+        for key, size in self._db.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._db.executemany('DELETE FROM entries WHERE key = ?', doomed)
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            rows = self._db.execute('SELECT endpoint, hits, misses, saved_ms FROM counters ORDER BY endpoint').fetchall()
+        endpoints = {}
+        for endpoint, hits, misses, saved_ms in rows:
+            endpoints[endpoint] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                'api_calls_saved': hits,
+                'latency_saved_s': round(saved_ms / 1000, 2),
+            }
+        return {'path': self.path, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes,
+                'endpoints': endpoints}
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM entries')
+            self._db.execute('DELETE FROM counters')
+
+    def close(self):
+        self._db.close()
+
+    def bind(self, endpoint):
+        """Mapping-style view for one endpoint (get(request) / view[request] = value)."""
+        return _EndpointView(self, endpoint)
+
+
+class _EndpointView:
+    def __init__(self, cache, endpoint):
+        self.cache = cache
+        self.endpoint = endpoint
+
+    def get(self, request, endpoint=None):
+        return self.cache.get(request, endpoint or self.endpoint)
+
+    def put(self, request, value, endpoint=None, cost_ms=0.0):
+        self.cache.put(request, value, endpoint or self.endpoint, cost_ms=cost_ms)
+
+    def __setitem__(self, request, value):
+        self.put(request, value)
+
+
+_shared = {}
+
+
+def from_env():
+    """Process-wide HttpCache configured by DR_HTTP_CACHE, or None when disabled."""
+    path = os.environ.get('DR_HTTP_CACHE', DEFAULT_PATH)
+    if path.lower() in ('', '0', 'off', 'false', 'none'):
+        return None
+    if path not in _shared:
+        max_mb = float(os.environ.get('DR_HTTP_CACHE_MB', str(DEFAULT_MAX_MB)))
+        try:
+            _shared[path] = HttpCache(path, max_bytes=int(max_mb * 1024 * 1024))
+        except (sqlite3.Error, OSError) as e:
+            print(f"http_cache: disabled, cannot open {path}: {e}", file=sys.stderr)
+            _shared[path] = None
+    return _shared[path]
+
+
+# --- CLI Interface ---
+def _bench(kind, request_path):
+    """Run one request against a fresh cache twice and report cold vs warm cost."""
+    import tempfile
+
+    with open(request_path) as f:
+        data = json.load(f)
+
+    def api_calls(stats):
+        return sum(e['misses'] for e in stats['endpoints'].values())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = HttpCache(os.path.join(tmp, 'bench.sqlite'))
+        timings, calls = [], []
+        for _ in range(2):
+            before = api_calls(cache.stats())
+            start = time.perf_counter()
+            if kind == 'citation':
+                import citation_expand
+                citation_expand.run(data, client=citation_expand.client_from_env(cache=cache))
+            else:
+                import rerank
+                rerank.run(data, cache=cache)
+            timings.append(time.perf_counter() - start)
+            calls.append(api_calls(cache.stats()) - before)
+        stats = cache.stats()
+        cache.close()
+    return {
+        'cold_s': round(timings[0], 3),
+        'warm_s': round(timings[1], 3),
+        'latency_saved_s': round(timings[0] - timings[1], 3),
+        'api_calls_cold': calls[0],
+        'api_calls_warm': calls[1],
+        'endpoints': stats['endpoints'],
+    }
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print(__doc__)
+        sys.exit(0)
+
+    command = sys.argv[1]
+    if command == 'bench':
+        if len(sys.argv) != 4 or sys.argv[2] not in ('--citation', '--rerank'):
+            print("http_cache: usage: bench --citation|--rerank request.json", file=sys.stderr)
+            sys.exit(2)
+        result = _bench(sys.argv[2][2:], sys.argv[3])
+    else:
+        cache = from_env()
+        if cache is None:
+            print("http_cache: disabled (DR_HTTP_CACHE=off)", file=sys.stderr)
+            sys.exit(1)
+        if command == 'stats':
+            result = cache.stats()
+        elif command == 'clear':
+            cache.clear()
+            result = {'cleared': cache.path}
+        else:
+            print(f"http_cache: unknown command '{command}', expected stats, clear or bench", file=sys.stderr)
+            sys.exit(2)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Keep-alive HTTP connection pool for the retrieval scripts.
+Zero external dependencies — uses only Python stdlib.
+
+Reuses http.client connections per (scheme, host, port) so repeated calls to
+the same API skip TCP/TLS setup. Errors are raised as urllib.error.HTTPError /
+URLError so callers keep their existing urllib error handling.
+"""
+
+import http.client
+import io
+import json
+import threading
+import urllib.error
+import urllib.parse
+
+import instrument
+
+DEFAULT_MAX_IDLE = 4
+
+
+class ConnectionPool:
+    """Thread-safe pool of idle keep-alive connections, keyed by origin."""
+
+    def __init__(self, timeout=10, max_idle=DEFAULT_MAX_IDLE):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = {}  # (scheme, host, port) -> [HTTPConnection, ...]
+        self._lock = threading.Lock()
+
+    def _acquire(self, origin, timeout):
+        with self._lock:
+            conns = self._idle.get(origin)
+            if conns:
+                conn = conns.pop()
+                conn.timeout = timeout
+                return conn, True
+        scheme, host, port = origin
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout), False
+
+    def _release(self, origin, conn):
+        with self._lock:
+            conns = self._idle.setdefault(origin, [])
+            if len(conns) < self.max_idle:
+                conns.append(conn)
+                return
+        conn.close()
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        """Send a request and return (status, headers, body bytes).
+
+        Raises urllib.error.HTTPError for status >= 400 and URLError for
+        connection failures. A stale reused connection is retried once.
+        """
+        parts = urllib.parse.urlsplit(url)
+        origin = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        timeout = self.timeout if timeout is None else timeout
+
+        for attempt in range(2):
+            conn, reused = self._acquire(origin, timeout)
+            instrument.count('http.connections_reused' if reused else 'http.connections_new')
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    instrument.count('http.stale_retries')
+                    continue
+                raise urllib.error.URLError(e)
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise urllib.error.URLError(e)
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(origin, conn)
+
+            if resp.status >= 400:
+                raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, io.BytesIO(data))
+            return resp.status, resp.headers, data
+
+    def get_json(self, url, headers=None, timeout=None):
+        _, _, data = self.request('GET', url, headers=headers, timeout=timeout)
+        return json.loads(data)
+
+    def post_json(self, url, payload, headers=None, timeout=None):
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        _, _, data = self.request('POST', url, body=json.dumps(payload).encode(),
+                                  headers=headers, timeout=timeout)
+        return json.loads(data)
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
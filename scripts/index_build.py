@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Parallel bulk build of a project evidence index, and shared-memory query workers.
+Zero external dependencies — uses only Python stdlib.
+
+Ingesting a backlog of fetched pages (or rerunning retrieval over an archived
+RESEARCH/ tree) one `evidence_index.py add` at a time chunks, tokenizes and
+inverts every page on one core. build shards the pages across a process pool:
+each worker chunks, tokenizes and inverts a contiguous run of pages into
+shard-local postings, and the parent merges them into one segment by offsetting
+chunk ids. Shards are contiguous, so merged posting lists stay sorted and a
+term's document frequency is its list length. Cross-source near-duplicate
+collapsing (see evidence_index.py) runs in the parent on the SimHashes the
+workers return, so the stored index matches the one sequential adds build.
+
+query copies the index's segments into multiprocessing.shared_memory once;
+pool workers attach by name and score claims against the shared postings in
+place. Only claims and results are pickled.
+
+Usage:
+    python scripts/index_build.py build --project RESEARCH/my-project --pages DIR|pages.jsonl
+                                        [--workers N] [--no-dedup]
+    python scripts/index_build.py query --project RESEARCH/my-project --claims claims.jsonl
+                                        [--workers N] [--k 10] [--min-quality B]
+
+Input:
+    --pages DIR      every *.md / *.txt / *.html below DIR is one page; its relative path is the url
+    --pages FILE     JSONL of `evidence_index.py add` records: {"url", "content", "quality", "title", "subquestion"}
+    --claims FILE    JSONL of {"claim", "k", "min_quality"} objects or plain JSON strings
+
+Output:
+    build -> {"pages", "added", "updated", "unchanged", "chunks", "duplicates", "workers"}
+    query -> one JSONL line per claim: {"claim": "...", "results": [<evidence_index query results>]}
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import evidence_index
+from bm25_filter import DEFAULT_K
+from evidence_index import EvidenceIndex, Segment
+from tokenizer import tokenize
+
+# --- Configuration ---
+DEFAULT_WORKERS = os.cpu_count() or 1
+SHARDS_PER_WORKER = 4  # smaller shards even out pages of very different sizes
+PAGE_SUFFIXES = ('.md', '.txt', '.html')
+QUERY_CHUNKSIZE = 8    # claims sent to a query worker at a time
+
+
+# --- Build ---
+def shard(records, n):
+    """Split records into at most n contiguous runs of about equal total content length."""
+    total = sum(len(r['content']) for r in records)
+    shards, current, size = [], [], 0
+    for record in records:
+        current.append(record)
+        size += len(record['content'])
+        if len(shards) < n - 1 and size >= total * (len(shards) + 1) / n:
+            shards.append(current)
+            current = []
+    if current:
+        shards.append(current)
+    return shards
+
+
+def build_shard(records, dedup=True):
+    """
+    Chunk, tokenize and invert one shard.
+
+    Returns ([(chunks, folded, simhashes)], terms, ptr, ids, tfs, chunk lens):
+    term i's postings are ids/tfs[ptr[i]:ptr[i + 1]]. A few flat arrays
+    pickle back to the parent ~30x faster than a dict of small ones.
+    """
+    pages, docs = [], []
+    for record in records:
+        chunks, n_folded, hashes = evidence_index.chunk_for_index(record['content'], dedup)
+        pages.append((chunks, n_folded, hashes))
+        docs.append({'tokens': [tokenize(c) for c in chunks]})
+    postings, lens = evidence_index.build_postings(docs)
+    terms, ptr, ids, tfs = list(postings), array('Q', [0]), array('I'), array('I')
+    for term in terms:
+        term_ids, term_tfs = postings[term]
+        ids.extend(term_ids)
+        tfs.extend(term_tfs)
+        ptr.append(len(ids))
+    return pages, terms, ptr, ids, tfs, lens
+
+
+def merge_shards(shards, remaps):
+    """Concatenate shard postings in shard order into one segment's (postings, chunk lens).
+
+    remaps[s] is None to keep every chunk of shard s, or an array mapping its
+    local chunk ids to merged positions within the shard (-1 = dropped).
+    """
+    postings, lens, base = {}, array('I'), 0
+    for (_, terms, ptr, shard_ids, shard_tfs, shard_lens), remap in zip(shards, remaps):
+        for t, term in enumerate(terms):
+            ids, tfs = shard_ids[ptr[t]:ptr[t + 1]], shard_tfs[ptr[t]:ptr[t + 1]]
+            entry = postings.get(term)
+            if entry is None:
+                postings[term] = entry = (array('I'), array('I'))
+            if remap is None:
+                entry[0].extend(map(base.__add__, ids))
+                entry[1].extend(tfs)
+                continue
+            for c, tf in zip(ids, tfs):
+                if remap[c] >= 0:
+                    entry[0].append(base + remap[c])
+                    entry[1].append(tf)
+        if remap is None:
+            lens.extend(shard_lens)
+        else:
+            lens.extend(shard_lens[c] for c in range(len(shard_lens)) if remap[c] >= 0)
+        base = len(lens)
+    return {term: entry for term, entry in postings.items() if entry[0]}, lens
+
+
+def build(records, workers=None, dedup=True, index=None):
+    """
+    Chunk, tokenize and invert records across a process pool.
+
+    Returns (docs, postings, chunk lens) for one segment. With index (an
+    EvidenceIndex), chunks another source in it already carries are
+    collapsed and updated pages keep their stored metadata, as add does.
+    """
+    workers = max(1, min(workers or DEFAULT_WORKERS, len(records)))
+    shards = shard(records, workers * SHARDS_PER_WORKER if workers > 1 else 1)
+    if workers == 1:
+        results = [build_shard(s, dedup) for s in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(build_shard, shards, itertools.repeat(dedup)))
+
+    simhashes = None
+    if dedup:
+        simhashes = index._simhash_index() if index is not None else evidence_index.SimHashIndex()
+    docs, remaps = [], []
+    for shard_records, (pages, *_) in zip(shards, results):
+        remap, position, dropped = array('i'), 0, False
+        for record, (chunks, n_folded, hashes) in zip(shard_records, pages):
+            url = record['url']
+            keep, copies = range(len(chunks)), []
+            if hashes is not None:
+                keep, copies = evidence_index.collapse_copies(url, hashes, simhashes)
+                for pos, i in enumerate(keep):
+                    simhashes.add((url, pos), hashes[i])
+            kept = set(keep)
+            for i in range(len(chunks)):
+                if i in kept:
+                    remap.append(position)
+                    position += 1
+                else:
+                    remap.append(-1)
+                    dropped = True
+            previous = index.get(url) if index is not None else None
+            meta = evidence_index.page_meta(
+                previous, url, record.get('hash') or evidence_index.content_hash(record['content']),
+                record.get('quality'), record.get('title'), record.get('subquestion'),
+                None if hashes is None else [hashes[i] for i in keep], copies, n_folded)
+            docs.append({'meta': meta, 'chunks': [chunks[i] for i in keep], 'chunk_meta': None})
+        remaps.append(remap if dropped else None)
+    postings, lens = merge_shards(results, remaps)
+    return docs, postings, lens
+
+
+def bulk_add(index, records, workers=None, dedup=True):
+    """Add pages to a project index as one segment; same per-page semantics as add."""
+    latest = {}
+    for record in records:
+        latest[record['url']] = record  # a URL given twice keeps its last content, as repeated adds do
+    todo, counts = [], {'pages': len(latest), 'added': 0, 'updated': 0, 'unchanged': 0}
+    for url, record in latest.items():
+        digest = evidence_index.content_hash(record['content'])
+        previous = index.get(url)
+        if previous and previous[1]['meta'].get('hash') == digest:
+            counts['unchanged'] += 1
+            continue
+        counts['updated' if previous else 'added'] += 1
+        todo.append(dict(record, hash=digest))
+    docs = []
+    if todo:
+        docs, postings, lens = build(todo, workers=workers, dedup=dedup, index=index)
+        index._append(docs, postings, lens)
+    counts['chunks'] = sum(len(d['chunks']) for d in docs)
+    counts['duplicates'] = sum(d['meta']['duplicates'] for d in docs)
+    counts['workers'] = max(1, min(workers or DEFAULT_WORKERS, len(todo) or 1))
+    return counts
+
+
+def read_pages(path):
+    """Page records from a directory of saved pages or a JSONL file of add records."""
+    records = []
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(PAGE_SUFFIXES):
+                    full = os.path.join(root, name)
+                    with open(full, errors='replace') as f:
+                        records.append({'url': os.path.relpath(full, path), 'content': f.read()})
+        return records
+    with open(path) as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get('url') or 'content' not in record:
+                print(f"index_build: line {n}: needs \"url\" and \"content\", skipped", file=sys.stderr)
+                continue
+            records.append(record)
+    return records
+
+
+# --- Shared-memory query workers ---
+class SharedSegment:
+    """A segment's bytes in a shared_memory block: copied in by the parent, attached by name in workers."""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.name = shm.name
+        self.segment = Segment(f'shm:{shm.name}', buffer=shm.buf)
+
+    @classmethod
+    def copy_of(cls, segment):
+        size = len(segment._buf)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        shm.buf[:size] = segment._buf
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    def close(self):
+        self.segment.close()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+_worker_shared = []
+_worker_index = None
+
+
+def _attach_worker(names):
+    global _worker_index
+    _worker_shared[:] = [SharedSegment.attach(name) for name in names]  # keep the blocks mapped
+    _worker_index = EvidenceIndex.over([s.segment for s in _worker_shared])
+
+
+def _claim_args(claim, k, min_quality):
+    if isinstance(claim, dict):
+        return claim.get('claim', ''), claim.get('k', k), claim.get('min_quality', min_quality)
+    return claim, k, min_quality
+
+
+def _run_claim(args):
+    claim, k, min_quality = args
+    return _worker_index.query(claim, k=k, min_quality=min_quality)
+
+
+def query_shared(index, claims, workers=None, k=DEFAULT_K, min_quality=None):
+    """Results for many claims, scored by pool workers over shared-memory copies of the segments."""
+    jobs = [_claim_args(c, k, min_quality) for c in claims]
+    workers = max(1, min(workers or DEFAULT_WORKERS, len(jobs)))
+    if workers == 1:
+        return [index.query(*job) for job in jobs]
+    index._open()
+    shared = [SharedSegment.copy_of(seg) for seg in index._segments]
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker,
+                                 initargs=([s.name for s in shared],)) as ex:
+            return list(ex.map(_run_claim, jobs, chunksize=QUERY_CHUNKSIZE))
+    finally:
+        for s in shared:
+            s.close()
+
+
+# --- CLI Interface ---
+def main():
+    if '--help' in sys.argv or '-h' in sys.argv or len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='Parallel evidence index build and query')
+    parser.add_argument('command', choices=['build', 'query'])
+    parser.add_argument('--project', required=True, help='Project directory, e.g. RESEARCH/my-project')
+    parser.add_argument('--pages', help='Directory of saved pages or JSONL of add records (build)')
+    parser.add_argument('--claims', help='JSONL of claims (query; default: stdin)')
+    parser.add_argument('--workers', type=int, help=f'Worker processes (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--no-dedup', dest='dedup', action='store_false', help='Keep near-duplicate chunks (build)')
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help='Passages per claim (query)')
+    parser.add_argument('--min-quality', choices=list(evidence_index.QUALITY_GRADES),
+                        help='Worst grade to include (query)')
+    args = parser.parse_args()
+
+    index = EvidenceIndex(args.project)
+    try:
+        if args.command == 'build':
+            if not args.pages or not os.path.exists(args.pages):
+                parser.error('build needs --pages DIR|FILE')
+            result = bulk_add(index, read_pages(args.pages), workers=args.workers, dedup=args.dedup)
+            json.dump(result, sys.stdout)
+            print()
+            return
+
+        source = open(args.claims) if args.claims else sys.stdin
+        with source:
+            claims = [json.loads(line) for line in source if line.strip()]
+        results = query_shared(index, claims, workers=args.workers, k=args.k, min_quality=args.min_quality)
+        for claim, hits in zip(claims, results):
+            text = claim.get('claim', '') if isinstance(claim, dict) else claim
+            sys.stdout.write(json.dumps({'claim': text, 'results': hits}) + '\n')
+    except json.JSONDecodeError as e:
+        print(f"index_build: invalid JSON input: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
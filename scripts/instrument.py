@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing spans and counters for the retrieval scripts, as JSONL traces.
+Zero external dependencies — uses only Python stdlib.
+
+Off unless DR_TRACE is set; while off, span() hands back one shared no-op
+object and count() returns at once, so instrumented code pays a function call.
+When on, every span (name, duration, attributes) becomes one trace record and
+counters (chunks, tokens, bypass hits, cache hits, retries, throttle time,
+rerank fallbacks by reason, ...) are summed in memory. Records are buffered
+and appended every FLUSH_RECORDS records / FLUSH_SECONDS and at exit, with
+the counters accumulated since the previous flush.
+
+Config via env vars:
+    DR_TRACE = <dir>|<file>.jsonl|off  (default: off)
+        <dir>         one <script>-<pid>.jsonl per process (no interleaving)
+        <file>.jsonl  every process appends to that file
+
+Usage:
+    DR_TRACE=RESEARCH/my-project/traces python scripts/bm25_filter.py ...
+    python scripts/instrument.py summary RESEARCH/my-project [--by-script]
+
+Records:
+    {"kind": "span", "name": "bm25.score", "ms": 1.92, "ts": ..., "script": "bm25_filter", "pid": 7, ...attrs}
+    {"kind": "counters", "counters": {"bm25.chunks": 412, "s2.throttle_ms": 830.5}, "ts": ..., "script": ..., "pid": ...}
+
+summary reads the trace files below the given paths (any *.jsonl whose first
+line is a trace record, so other JSONL in a project is skipped) and reports
+per span name count / total / mean / p50 / p95 / max milliseconds, summed
+counters, and the processes and scripts seen. Files named explicitly are
+always read; lines in them that are not trace records are ignored.
+
+Long-lived processes (filter_server.py) call flush() after every request, so
+their counters reach the trace without waiting for exit.
+"""
+
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+# --- Configuration ---
+FLUSH_RECORDS = 512
+FLUSH_SECONDS = 5.0
+TRACE_KINDS = ('span', 'counters')
+
+
+def _configured_path():
+    path = os.environ.get('DR_TRACE', '')
+    return None if path.lower() in ('', '0', 'off', 'false', 'none') else path
+
+
+_path = _configured_path()
+_lock = threading.Lock()
+_records = []
+_counters = {}
+_last_flush = time.monotonic()
+
+
+def enabled():
+    return _path is not None
+
+
+def _script():
+    name = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else 'python'
+    return name[:-3] if name.endswith('.py') else name
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'attrs', 'start')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        record(self.name, (time.perf_counter() - self.start) * 1000, **self.attrs)
+        return False
+
+    def set(self, **attrs):
+        """Attach attributes known only inside the span (e.g. chunks produced)."""
+        self.attrs.update(attrs)
+
+
+def span(name, **attrs):
+    """Context manager timing a stage: `with instrument.span('bm25.score', k=k) as sp: ...`."""
+    if _path is None:
+        return _NO_SPAN
+    return _Span(name, attrs)
+
+
+def record(name, ms, **attrs):
+    """Record a span measured elsewhere (e.g. an asyncio task's own clock)."""
+    if _path is None:
+        return
+    entry = {'kind': 'span', 'name': name, 'ms': round(ms, 3), 'ts': round(time.time(), 3)}
+    entry.update(attrs)
+    with _lock:
+        _records.append(entry)
+        due = len(_records) >= FLUSH_RECORDS or time.monotonic() - _last_flush >= FLUSH_SECONDS
+    if due:
+        flush()
+
+
+def count(name, n=1):
+    """Add n to a counter (floats allowed, e.g. milliseconds slept)."""
+    if _path is None:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def _target():
+    if _path.endswith('.jsonl'):
+        directory, path = os.path.dirname(os.path.abspath(_path)), _path
+    else:
+        directory, path = _path, os.path.join(_path, f'{_script()}-{os.getpid()}.jsonl')
+    os.makedirs(directory, exist_ok=True)
+    return path
+
+
+def flush():
+    """Append buffered spans and the counters gathered since the last flush."""
+    global _records, _counters, _last_flush
+    if _path is None:
+        return
+    with _lock:
+        records, counters = _records, _counters
+        _records, _counters = [], {}
+        _last_flush = time.monotonic()
+    if counters:
+        records.append({'kind': 'counters', 'counters': counters, 'ts': round(time.time(), 3)})
+    if not records:
+        return
+    stamp = {'script': _script(), 'pid': os.getpid()}
+    lines = ''.join(json.dumps({**r, **stamp}) + '\n' for r in records)
+    try:
+        with open(_target(), 'a') as f:
+            f.write(lines)
+    except OSError as e:
+        print(f"instrument: cannot write trace to {_path}: {e}", file=sys.stderr)
+
+
+atexit.register(flush)
+
+
+# --- Aggregation ---
+def _is_trace_record(entry):
+    """Span/counters records as flush() writes them (stamped with script and pid)."""
+    return isinstance(entry, dict) and entry.get('kind') in TRACE_KINDS and 'pid' in entry
+
+
+def _is_trace_file(path):
+    """Whether a *.jsonl found in a directory walk holds trace records (judged by its first line)."""
+    try:
+        with open(path, errors='replace') as f:
+            return _is_trace_record(json.loads(f.readline()))
+    except (OSError, json.JSONDecodeError):
+        return False
+
+
+def _trace_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith('.jsonl') and _is_trace_file(os.path.join(root, name)):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _summarize(spans, counters):
+    out = {}
+    for name in sorted(spans):
+        ms = sorted(spans[name])
+        total = sum(ms)
+        out[name] = {'count': len(ms), 'total_ms': round(total, 1), 'mean_ms': round(total / len(ms), 3),
+                     'p50_ms': round(_percentile(ms, 0.5), 3), 'p95_ms': round(_percentile(ms, 0.95), 3),
+                     'max_ms': round(ms[-1], 3)}
+    return {'spans': out, 'counters': {k: round(v, 3) for k, v in sorted(counters.items())}}
+
+
+def summarize(paths, by_script=False):
+    """Aggregate every trace record under paths (files or directories)."""
+    spans, counters = {}, {}
+    per_script = {}
+    processes, files, records, bad = set(), 0, 0, 0
+    first = last = None
+    for path in _trace_files(paths):
+        files += 1
+        with open(path, errors='replace') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    bad += 1
+                    continue
+                if not _is_trace_record(entry):
+                    continue
+                records += 1
+                script = entry.get('script', '?')
+                processes.add((script, entry.get('pid')))
+                ts = entry.get('ts')
+                if ts is not None:
+                    first = ts if first is None else min(first, ts)
+                    last = ts if last is None else max(last, ts)
+                targets = [(spans, counters)]
+                if by_script:
+                    targets.append(per_script.setdefault(script, ({}, {})))
+                for span_table, counter_table in targets:
+                    if entry.get('kind') == 'span':
+                        span_table.setdefault(entry['name'], []).append(entry['ms'])
+                    elif entry.get('kind') == 'counters':
+                        for name, n in entry['counters'].items():
+                            counter_table[name] = counter_table.get(name, 0) + n
+    scripts = {}
+    for script, _ in processes:
+        scripts[script] = scripts.get(script, 0) + 1
+    report = {'files': files, 'records': records, 'processes': len(processes), 'scripts': scripts,
+              'wall_s': round(last - first, 1) if first is not None else 0.0}
+    if bad:
+        report['unreadable_lines'] = bad
+    report.update(_summarize(spans, counters))
+    if by_script:
+        report['by_script'] = {name: _summarize(*tables) for name, tables in sorted(per_script.items())}
+    return report
+
+
+# --- CLI Interface ---
+def main():
+    parser = argparse.ArgumentParser(description='Summarize DR_TRACE trace records')
+    parser.add_argument('command', choices=['summary'])
+    parser.add_argument('paths', nargs='+', help='Trace files or directories (e.g. RESEARCH/my-project)')
+    parser.add_argument('--by-script', action='store_true', help='Also break spans and counters down per script')
+    args = parser.parse_args()
+
+    missing = [p for p in args.paths if not os.path.exists(p)]
+    if missing:
+        print(f"instrument: no traces at {', '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+    json.dump(summarize(args.paths, by_script=args.by_script), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
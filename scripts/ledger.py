@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Indexed source catalog and evidence ledger for a research project.
+Zero external dependencies — uses only Python stdlib (sqlite3).
+
+Sources and claims live in RESEARCH/{project}/ledger.sqlite, indexed by
+normalized URL, domain, source ID and claim ID, with claim -> source links in
+their own table. Subagents append through short IMMEDIATE transactions (WAL
+mode, busy timeout), so parallel writers never lose rows or hand out the same
+ID. "Already fetched from this domain?" and claim -> source joins are index
+lookups instead of CSV rescans; 03_source_catalog.csv and
+04_evidence_ledger.csv are exported with today's columns.
+
+Usage:
+    echo '{"url": "...", "title": "...", "grade": "B", "type": "...", "date": "2025", "used_for": "SQ1"}' \\
+        | python scripts/ledger.py add-source --project RESEARCH/my-project
+    echo '{"claim": "...", "confidence": "HIGH", "type": "C1", "source_ids": ["S01", "S03"], "status": "VERIFIED"}' \\
+        | python scripts/ledger.py add-claim --project RESEARCH/my-project
+    python scripts/ledger.py check --project ... --url https://a.example/x [--url ...]
+    python scripts/ledger.py claim --project ... --id CL01
+    python scripts/ledger.py claims --project ... [--source S01] [--type C1]
+    python scripts/ledger.py import --project ... [--catalog 03_source_catalog.csv] [--ledger 04_evidence_ledger.csv]
+    python scripts/ledger.py export --project ... [--format catalog|ledger --out FILE]
+
+Input/Output:
+    add-source  JSON object or array; "id" optional (next S01, S02, ... is assigned).
+                -> [{"id", "url", "status": "added"|"exists"|"updated"}]
+                A URL already in the catalog (after normalization) keeps its ID;
+                fields given again fill in or replace the stored ones.
+    add-claim   JSON object or array; "claim_id" optional (next CL01, ...).
+                "source_ids" is a list or comma-separated string of IDs or URLs.
+                Re-sending a claim_id updates the fields given (e.g. status).
+                -> [{"claim_id", "status": "added"|"updated", "unknown_sources": [...]}]
+    check       -> [{"url", "source_id" (null if new), "domain", "domain_sources": [IDs]}]
+    claim(s)    -> claims with their joined sources and "domains": the number of
+                distinct domains among them (same domain = DEPENDENT)
+    export      without --format writes both CSVs into the project directory
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+# --- Configuration ---
+DB_NAME = 'ledger.sqlite'
+CATALOG_FILE = '03_source_catalog.csv'
+LEDGER_FILE = '04_evidence_ledger.csv'
+CATALOG_COLUMNS = ['id', 'url', 'title', 'grade', 'type', 'date', 'used_for']
+LEDGER_COLUMNS = ['claim_id', 'claim', 'confidence', 'type', 'source_ids', 'independence', 'status', 'notes']
+BUSY_TIMEOUT = 30  # seconds a writer waits for another subagent's transaction
+
+# Second-level labels under which registrations happen one level deeper (bbc.co.uk, abc.net.au)
+_SECOND_LEVEL = frozenset(['ac', 'co', 'com', 'edu', 'gov', 'net', 'org', 'nhs', 'or', 'ne', 'go'])
+# Shared hosting suffixes whose subdomains belong to different owners (bm25s.github.io)
+_HOSTED_SUFFIXES = frozenset(['github.io', 'gitlab.io', 'readthedocs.io', 'substack.com', 'medium.com',
+                              'blogspot.com', 'wordpress.com', 'netlify.app', 'vercel.app', 'pages.dev'])
+_TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref|ref_src)$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id       TEXT PRIMARY KEY,
+    url      TEXT NOT NULL,
+    norm_url TEXT NOT NULL UNIQUE,
+    domain   TEXT NOT NULL,
+    title    TEXT, grade TEXT, type TEXT, date TEXT, used_for TEXT,
+    extra    TEXT,
+    added    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sources_domain ON sources (domain);
+CREATE TABLE IF NOT EXISTS claims (
+    claim_id     TEXT PRIMARY KEY,
+    claim        TEXT, confidence TEXT, type TEXT, independence TEXT, status TEXT, notes TEXT,
+    extra        TEXT,
+    added        REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS claims_type ON claims (type);
+CREATE TABLE IF NOT EXISTS claim_sources (
+    claim_id  TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    pos       INTEGER NOT NULL,
+    PRIMARY KEY (claim_id, source_id)
+);
+CREATE INDEX IF NOT EXISTS claim_sources_source ON claim_sources (source_id);
+"""
+
+
+# --- Normalization ---
+def normalize_url(url):
+    """URL identity for dedup: lowercase host without www., no fragment, tracking params or trailing slash."""
+    parts = _split(url)
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    port = f':{parts.port}' if parts.port and parts.port not in (80, 443) else ''
+    query = urllib.parse.urlencode(sorted((k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+                                          if not _TRACKING_PARAMS.match(k)))
+    path = parts.path.rstrip('/') or ''
+    return host + port + path + ('?' + query if query else '') or url.strip()
+
+
+def _split(url):
+    """urlsplit that parses a host out of scheme-less input too (catalog rows often hold bare domains)."""
+    url = url.strip()
+    if '://' not in url and not url.startswith('//'):
+        url = '//' + url
+    return urllib.parse.urlsplit(url)
+
+
+def normalize_domain(url):
+    """Registrable domain of a URL (approximate, no public-suffix list): news.bbc.co.uk -> bbc.co.uk."""
+    host = (_split(url).hostname or '').lower().rstrip('.')
+    labels = host.split('.')
+    if len(labels) <= 2:
+        return host
+    if (len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL) or '.'.join(labels[-2:]) in _HOSTED_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def _split_ids(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [v.strip() for v in value if v and v.strip()]
+
+
+class Ledger:
+    """Source catalog + evidence ledger of one project, shared safely by concurrent writers."""
+
+    def __init__(self, project):
+        self.project = project
+        os.makedirs(project, exist_ok=True)
+        self.path = os.path.join(project, DB_NAME)
+        self._db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT * 1000}')
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _write(self):
+        """One IMMEDIATE transaction: the write lock is taken up front, so ID allocation cannot race."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def _next_id(self, db, table, column, prefix):
+        row = db.execute(f"SELECT MAX(CAST(SUBSTR({column}, ?) AS INTEGER)) FROM {table} "
+                         f"WHERE {column} GLOB ?", (len(prefix) + 1, f'{prefix}[0-9]*')).fetchone()
+        return f'{prefix}{(row[0] or 0) + 1:02d}'
+
+    # --- Sources ---
+    def add_sources(self, records):
+        """Add or update catalog rows; a known URL keeps its ID."""
+        results = []
+        with self._write() as db:
+            for record in records:
+                url = (record.get('url') or '').strip()
+                if not url:
+                    raise ValueError('source needs a "url"')
+                norm = normalize_url(url)
+                fields = {c: record[c] for c in CATALOG_COLUMNS[2:] if record.get(c) not in (None, '')}
+                extra = {k: v for k, v in record.items() if k not in CATALOG_COLUMNS}
+                row = db.execute('SELECT id, extra FROM sources WHERE norm_url = ?', (norm,)).fetchone()
+                if row is None and record.get('id'):
+                    row = db.execute('SELECT id, extra FROM sources WHERE id = ?', (record['id'],)).fetchone()
+                if row is not None:
+                    if fields or extra:
+                        merged = dict(json.loads(row['extra'] or '{}'), **extra)
+                        sets = ', '.join(f'{c} = ?' for c in fields)
+                        db.execute(f"UPDATE sources SET {sets + ', ' if sets else ''}extra = ? WHERE id = ?",
+                                   (*fields.values(), json.dumps(merged) if merged else None, row['id']))
+                        status = 'updated'
+                    else:
+                        status = 'exists'
+                    results.append({'id': row['id'], 'url': url, 'status': status})
+                    continue
+                source_id = record.get('id') or self._next_id(db, 'sources', 'id', 'S')
+                db.execute('INSERT INTO sources (id, url, norm_url, domain, title, grade, type, date, used_for, '
+                           'extra, added) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           (source_id, url, norm, normalize_domain(url),
+                            *(fields.get(c) for c in CATALOG_COLUMNS[2:]),
+                            json.dumps(extra) if extra else None, time.time()))
+                results.append({'id': source_id, 'url': url, 'status': 'added'})
+        return results
+
+    def check_urls(self, urls):
+        """Catalog ID of each URL (None if new) and the sources already taken from its domain."""
+        out = []
+        with self._lock:
+            for url in urls:
+                row = self._db.execute('SELECT id FROM sources WHERE norm_url = ?', (normalize_url(url),)).fetchone()
+                domain = normalize_domain(url)
+                same = [r[0] for r in self._db.execute('SELECT id FROM sources WHERE domain = ? ORDER BY added',
+                                                       (domain,))]
+                out.append({'url': url, 'source_id': row[0] if row else None, 'domain': domain,
+                            'domain_sources': same})
+        return out
+
+    def domains(self, used_for=None):
+        """Domains sources were taken from, optionally only those used for one subquestion (e.g. SQ2)."""
+        with self._lock:
+            rows = self._db.execute('SELECT domain, used_for FROM sources ORDER BY added').fetchall()
+        return list(dict.fromkeys(r['domain'] for r in rows
+                                  if used_for is None or used_for in _split_ids(r['used_for'])))
+
+    # --- Claims ---
+    def _resolve_sources(self, db, refs):
+        """Source IDs for IDs or URLs, plus the references that match nothing."""
+        ids, unknown = [], []
+        for ref in refs:
+            if '://' in ref:
+                row = db.execute('SELECT id FROM sources WHERE norm_url = ?', (normalize_url(ref),)).fetchone()
+            else:
+                row = db.execute('SELECT id FROM sources WHERE id = ?', (ref,)).fetchone()
+            if row is None:
+                unknown.append(ref)
+                if '://' not in ref:
+                    ids.append(ref)  # keep the reference; the source may be catalogued later
+            elif row[0] not in ids:
+                ids.append(row[0])
+        return ids, unknown
+
+    def add_claims(self, records):
+        """Add claims or update the fields given for an existing claim_id."""
+        columns = LEDGER_COLUMNS[1:4] + LEDGER_COLUMNS[5:]
+        results = []
+        with self._write() as db:
+            for record in records:
+                claim_id = record.get('claim_id')
+                exists = claim_id and db.execute('SELECT 1 FROM claims WHERE claim_id = ?', (claim_id,)).fetchone()
+                fields = {c: record[c] for c in columns if c in record}
+                extra = {k: v for k, v in record.items() if k not in LEDGER_COLUMNS}
+                if exists:
+                    if fields or extra:
+                        stored = db.execute('SELECT extra FROM claims WHERE claim_id = ?', (claim_id,)).fetchone()[0]
+                        merged = dict(json.loads(stored or '{}'), **extra)
+                        sets = ', '.join(f'{c} = ?' for c in fields)
+                        db.execute(f"UPDATE claims SET {sets + ', ' if sets else ''}extra = ? WHERE claim_id = ?",
+                                   (*fields.values(), json.dumps(merged) if merged else None, claim_id))
+                    status = 'updated'
+                else:
+                    if not record.get('claim'):
+                        raise ValueError('new claim needs "claim" text')
+                    claim_id = claim_id or self._next_id(db, 'claims', 'claim_id', 'CL')
+                    db.execute(f"INSERT INTO claims (claim_id, {', '.join(columns)}, extra, added) "
+                               f"VALUES (?, {', '.join('?' * len(columns))}, ?, ?)",
+                               (claim_id, *(fields.get(c) for c in columns),
+                                json.dumps(extra) if extra else None, time.time()))
+                    status = 'added'
+                unknown = []
+                if 'source_ids' in record:
+                    ids, unknown = self._resolve_sources(db, _split_ids(record['source_ids']))
+                    db.execute('DELETE FROM claim_sources WHERE claim_id = ?', (claim_id,))
+                    db.executemany('INSERT INTO claim_sources (claim_id, source_id, pos) VALUES (?, ?, ?)',
+                                   [(claim_id, sid, pos) for pos, sid in enumerate(ids)])
+                results.append({'claim_id': claim_id, 'status': status, 'unknown_sources': unknown})
+        return results
+
+    def claims(self, claim_id=None, source_id=None, claim_type=None):
+        """Claims (optionally one ID, those citing source_id, or of one type) with their sources joined."""
+        where, params = [], []
+        if claim_id:
+            where.append('c.claim_id = ?')
+            params.append(claim_id)
+        if source_id:
+            where.append('c.claim_id IN (SELECT claim_id FROM claim_sources WHERE source_id = ?)')
+            params.append(source_id)
+        if claim_type:
+            where.append('c.type = ?')
+            params.append(claim_type)
+        sql = ('SELECT c.*, cs.source_id, s.url, s.title, s.grade, s.domain FROM claims c '
+               'LEFT JOIN claim_sources cs ON cs.claim_id = c.claim_id '
+               'LEFT JOIN sources s ON s.id = cs.source_id'
+               + (' WHERE ' + ' AND '.join(where) if where else '') + ' ORDER BY c.added, c.claim_id, cs.pos')
+        claims = {}
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        for row in rows:
+            claim = claims.get(row['claim_id'])
+            if claim is None:
+                claim = claims[row['claim_id']] = {c: row[c] for c in LEDGER_COLUMNS if c != 'source_ids'}
+                claim['sources'] = []
+            if row['source_id'] is not None:
+                claim['sources'].append({'id': row['source_id'], 'url': row['url'], 'title': row['title'],
+                                         'grade': row['grade'], 'domain': row['domain']})
+        for claim in claims.values():
+            claim['source_ids'] = [s['id'] for s in claim['sources']]
+            claim['domains'] = len({s['domain'] or s['id'] for s in claim['sources']})
+        return list(claims.values())
+
+    # --- CSV import / export ---
+    def import_catalog(self, rows):
+        return len(self.add_sources([{k: v for k, v in row.items() if k} for row in rows]))
+
+    def import_ledger(self, rows):
+        return len(self.add_claims([{k: v for k, v in row.items() if k} for row in rows]))
+
+    def export_catalog(self, out):
+        with self._lock:
+            rows = self._db.execute(f"SELECT {', '.join(CATALOG_COLUMNS)}, extra FROM sources "
+                                    'ORDER BY added, id').fetchall()
+        _write_csv(out, CATALOG_COLUMNS, rows)
+
+    def export_ledger(self, out):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT c.claim_id, c.claim, c.confidence, c.type, "
+                "(SELECT GROUP_CONCAT(source_id, ',') FROM "
+                " (SELECT source_id FROM claim_sources WHERE claim_id = c.claim_id ORDER BY pos)) AS source_ids, "
+                "c.independence, c.status, c.notes, c.extra FROM claims c ORDER BY c.added, c.claim_id").fetchall()
+        _write_csv(out, LEDGER_COLUMNS, rows)
+
+    def export_files(self):
+        """Write both CSVs into the project directory (atomically replaced)."""
+        written = []
+        for name, export in ((CATALOG_FILE, self.export_catalog), (LEDGER_FILE, self.export_ledger)):
+            path = os.path.join(self.project, name)
+            tmp = f'{path}.tmp{os.getpid()}'
+            with open(tmp, 'w', newline='') as f:
+                export(f)
+            os.replace(tmp, path)
+            written.append(path)
+        return written
+
+    def close(self):
+        self._db.close()
+
+
+def _write_csv(out, columns, rows):
+    """Rows in today's column order; fields kept from import follow as extra columns."""
+    extras = [json.loads(row['extra']) if row['extra'] else {} for row in rows]
+    extra_columns = [k for k in dict.fromkeys(k for e in extras for k in e) if k not in columns]
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(columns + extra_columns)
+    for row, extra in zip(rows, extras):
+        writer.writerow([row[c] if row[c] is not None else '' for c in columns]
+                        + [extra.get(c, '') for c in extra_columns])
+
+
+def _read_stdin_records():
+    data = json.loads(sys.stdin.read())
+    return data if isinstance(data, list) else [data]
+
+
+# --- CLI Interface ---
+def main():
+    if '--help' in sys.argv or '-h' in sys.argv or len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='Indexed source catalog and evidence ledger')
+    parser.add_argument('command', choices=['add-source', 'add-claim', 'check', 'claim', 'claims', 'import', 'export'])
+    parser.add_argument('--project', required=True, help='Project directory, e.g. RESEARCH/my-project')
+    parser.add_argument('--url', action='append', default=[], help='URL to check (repeatable)')
+    parser.add_argument('--id', help='Claim ID (claim)')
+    parser.add_argument('--source', help='Only claims citing this source ID (claims)')
+    parser.add_argument('--type', help='Only claims of this type, e.g. C1 (claims)')
+    parser.add_argument('--catalog', help='03_source_catalog.csv to import')
+    parser.add_argument('--ledger', help='04_evidence_ledger.csv to import')
+    parser.add_argument('--format', choices=['catalog', 'ledger'], help='Export one CSV layout')
+    parser.add_argument('--out', help='Export destination for --format (default: stdout)')
+    args = parser.parse_args()
+
+    ledger = Ledger(args.project)
+    try:
+        if args.command in ('add-source', 'add-claim'):
+            records = _read_stdin_records()
+            result = ledger.add_sources(records) if args.command == 'add-source' else ledger.add_claims(records)
+        elif args.command == 'check':
+            if not args.url:
+                parser.error('check needs --url')
+            result = ledger.check_urls(args.url)
+        elif args.command == 'claim':
+            if not args.id:
+                parser.error('claim needs --id')
+            found = ledger.claims(claim_id=args.id)
+            if not found:
+                print(f"ledger: no claim {args.id}", file=sys.stderr)
+                sys.exit(1)
+            result = found[0]
+        elif args.command == 'claims':
+            result = ledger.claims(source_id=args.source, claim_type=args.type)
+        elif args.command == 'import':
+            if not (args.catalog or args.ledger):
+                parser.error('import needs --catalog and/or --ledger')
+            result = {}
+            if args.catalog:
+                with open(args.catalog, newline='') as f:
+                    result['sources'] = ledger.import_catalog(list(csv.DictReader(f)))
+            if args.ledger:
+                with open(args.ledger, newline='') as f:
+                    result['claims'] = ledger.import_ledger(list(csv.DictReader(f)))
+        else:
+            if not args.format:
+                result = {'written': ledger.export_files()}
+            else:
+                export = ledger.export_catalog if args.format == 'catalog' else ledger.export_ledger
+                if args.out:
+                    with open(args.out, 'w', newline='') as f:
+                        export(f)
+                else:
+                    export(sys.stdout)
+                return
+    except json.JSONDecodeError as e:
+        print(f"ledger: invalid JSON input: {e}", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(f"ledger: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        ledger.close()
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
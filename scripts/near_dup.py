@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection for passages (64-bit SimHash over word shingles).
+Zero external dependencies — uses only Python stdlib.
+
+Syndicated news and press-release copies produce chunks that differ only in
+bylines, punctuation or a few edited words. Each chunk is reduced to one
+64-bit SimHash; two chunks are near-duplicates when their hashes differ in at
+most MAX_DISTANCE bits.
+
+Usage:
+    python scripts/near_dup.py < chunks.json          # JSON array of strings
+    -> {"kept": [0, 2, ...], "clusters": {"0": [1, 5], ...}}
+"""
+
+import hashlib
+import json
+import re
+import sys
+
+# --- Configuration ---
+SHINGLE_WORDS = 3
+HASH_BITS = 64
+MAX_DISTANCE = 8  # bits; unrelated chunks sit near 32, copies with ~2% words edited under 8
+LANE_BITS = 20    # per-bit counter width while summing shingles (up to ~1M shingles)
+
+_WORD = re.compile(r'\w+')
+
+# _SPREAD[j][b]: byte b at position j of a hash, one bit per LANE_BITS-wide lane,
+# so summing spread hashes counts every bit position in a single big-int add.
+_SPREAD = [[sum(((b >> i) & 1) << ((8 * j + i) * LANE_BITS) for i in range(8)) for b in range(256)]
+           for j in range(HASH_BITS // 8)]
+_LANE_MASK = (1 << LANE_BITS) - 1
+
+
+def _shingles(text):
+    words = _WORD.findall(text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return [' '.join(words)] if words else []
+    return [' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+
+
+def simhash(text):
+    """64-bit SimHash of a text's word shingles (0 for text without words)."""
+    shingles = _shingles(text)
+    if not shingles:
+        return 0
+    total = 0
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode(), digest_size=8).digest()
+        for j, byte in enumerate(digest):
+            total += _SPREAD[j][byte]
+    half = len(shingles) / 2
+    value = 0
+    for i in range(HASH_BITS):
+        if (total >> (i * LANE_BITS)) & _LANE_MASK > half:
+            value |= 1 << i
+    return value
+
+
+def distance(a, b):
+    """Hamming distance between two SimHashes."""
+    return (a ^ b).bit_count()
+
+
+class SimHashIndex:
+    """
+    Near-duplicate lookup over stored SimHashes.
+
+    Hashes are split into MAX_DISTANCE + 1 bands; two hashes within
+    MAX_DISTANCE bits must agree exactly on at least one band (pigeonhole), so
+    each lookup only compares against hashes sharing a band.
+    """
+
+    def __init__(self, max_distance=MAX_DISTANCE):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        cuts = [HASH_BITS * i // bands for i in range(bands + 1)]
+        self._bands = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(cuts, cuts[1:])]
+        self._tables = [{} for _ in self._bands]
+        self._hashes = {}
+
+    def add(self, key, value):
+        self._hashes[key] = (value, len(self._hashes))
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            table.setdefault((value >> shift) & mask, []).append(key)
+
+    def find(self, value, skip=None):
+        """First stored key within max_distance of value (insertion order), or None.
+
+        skip: optional predicate; keys it accepts are never returned.
+        """
+        best = None
+        seen = set()
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            for key in table.get((value >> shift) & mask, ()):
+                if key in seen or (skip is not None and skip(key)):
+                    continue
+                seen.add(key)
+                stored, order = self._hashes[key]
+                if distance(stored, value) <= self.max_distance and (best is None or order < best[0]):
+                    best = (order, key)
+        return None if best is None else best[1]
+
+    def __len__(self):
+        return len(self._hashes)
+
+
+def dedup_chunks(chunks, max_distance=MAX_DISTANCE):
+    """
+    Collapse near-duplicate chunks, keeping the first of each cluster.
+
+    Returns (kept indices, clusters, hashes) where clusters maps a kept
+    chunk index to the indices of the chunks folded into it and hashes holds
+    the SimHash of every chunk.
+    """
+    index = SimHashIndex(max_distance)
+    kept, clusters, hashes = [], {}, []
+    for i, chunk in enumerate(chunks):
+        value = simhash(chunk)
+        hashes.append(value)
+        rep = index.find(value)
+        if rep is None:
+            index.add(i, value)
+            kept.append(i)
+        else:
+            clusters.setdefault(rep, []).append(i)
+    return kept, clusters, hashes
+
+
+if __name__ == '__main__':
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print(__doc__)
+        sys.exit(0)
+    kept, clusters, _ = dedup_chunks(json.load(sys.stdin))
+    json.dump({'kept': kept, 'clusters': {str(k): v for k, v in clusters.items()}}, sys.stdout)
+    print()
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Pre-QA scan of a report and its evidence ledger for known failure patterns.
+Zero external dependencies — uses only Python stdlib.
+
+Phase 6 checks the patterns in reflection_memory.json by having the LLM
+re-read the whole draft. Most of them leave surface signals. Every signal is
+compiled into one regular expression (an alternation of named groups), and
+the report files, evidence ledger and source catalog are scanned in a single
+pass over one buffer. Each match is dispatched on its group name and located
+back to file, line and column, so QA can follow up on specific sentences
+instead of re-reading everything.
+
+Signals:
+    FP-001 (CD)  a statistic stated without the qualifier ("up to", "approximately",
+                 "~", ...) it carries in the ledger or elsewhere in the report
+    FP-002 (IV)  a ledger claim marked INDEPENDENT whose sources share a domain or
+                 are press-release copies (wire services, "press release" in the catalog)
+    FP-003 (NE)  fiscal-year tokens (FY2024, fiscal 2023) in a paragraph that also
+                 uses bare calendar years, with no CY / calendar-year note
+    FP-004 (SD)  "currently", "latest", "to date", ... in a sentence citing sources
+                 dated more than STALE_MONTHS before --as-of (catalog "date" column),
+                 or naming only years that old
+    FP-005 (CM)  definitive language (clearly, proves, definitely, ...)
+A pattern in the memory file may list its own literal phrases under "signals";
+they are compiled into the same expression and reported under its pattern_id.
+
+Usage:
+    python scripts/qa_scan.py --project RESEARCH/my-project [--memory FILE] [--as-of YYYY-MM-DD] [--record]
+    python scripts/qa_scan.py --report draft.md [--report more.md] [--ledger 04_evidence_ledger.csv]
+                              [--catalog 03_source_catalog.csv] [--memory FILE] [--as-of YYYY-MM-DD]
+
+--project scans 08_report/*.md (or report.md), 04_evidence_ledger.csv and
+03_source_catalog.csv from the project directory.
+--memory defaults to ~/.claude/reflection_memory.json, else the repo bootstrap.
+--record adds this scan's hits to each pattern's frequency, sets
+first_seen/last_seen and the stats block in the memory file. A sentence counts
+once per pattern however many of its words match. With --project,
+hits already recorded for the project (09_qa/qa_scan_recorded.json) are not
+counted again, so rescanning after fixes only counts new hits.
+
+Output: {"findings": [{"pattern_id", "category", "file", "line", "col", "match", "text", "detail"}],
+         "counts": {pattern_id: n}, "scanned": {"files", "bytes", "ms"}[, "recorded": {...}]}
+"""
+
+import argparse
+import bisect
+import csv
+import datetime
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+from ledger import normalize_domain
+
+# --- Configuration ---
+STALE_MONTHS = 12
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+USER_MEMORY = os.path.join(os.path.expanduser('~'), '.claude', 'reflection_memory.json')
+BOOTSTRAP_MEMORY = os.path.join(REPO_ROOT, 'reflection_memory.json')
+RECORDED_FILE = os.path.join('09_qa', 'qa_scan_recorded.json')
+MAX_TEXT = 240  # characters of sentence context per finding
+
+QUALIFIERS = (r'up to|as (?:much|many|high) as|approximately|approx\.|about|around|roughly|nearly|almost'
+              r'|close to|at least|at most|more than|less than|fewer than|over|under|as little as|an estimated')
+DEFINITIVE = (r'clearly|proves?|proven|definitely|undoubtedly|undeniabl[ey]|conclusively|certainly'
+              r'|without (?:a )?doubt|indisputabl[ey]|unquestionabl[ey]|irrefutabl[ey]')
+CURRENT = (r'currently|current|as of (?:today|now)|today|nowadays|at present|presently|latest|to date'
+           r'|state[- ]of[- ]the[- ]art|this year')
+PRESS = r'press release|pr ?newswire|business ?wire|globe ?newswire|accesswire|announced today'
+
+SIGNALS = [
+    ('stat', r'(?<![\w.])(?P<num>\d[\d,]*(?:\.\d+)?)\s?(?P<unit>%|percent\b|x\b|×|times\b|-?fold\b)'),
+    ('fy', r"\b(?:FY\s?'?\d{2,4}|fiscal(?:\s+year)?\s+'?\d{2,4}|fiscal\s+year)\b"),
+    ('cy', r"\b(?:CY\s?'?\d{2,4}|calendar\s+year)\b"),
+    ('year', r'\b(?:19|20)\d{2}\b'),
+    ('cite', r'\[(?P<ids>S\d+(?:\s*[,;]\s*S\d+)*)\]'),
+    ('current', rf'\b(?:{CURRENT})\b'),
+    ('definitive', rf'\b(?:{DEFINITIVE})\b'),
+    ('press', rf'\b(?:{PRESS})\b'),
+]
+
+BUILTIN_PATTERNS = {
+    'FP-001': ('CD', 'Dropping qualifiers when citing statistics (up to, approximately, under conditions)',
+               "Always preserve qualifiers: 'up to', 'approximately', 'under X conditions', 'in Y contexts'"),
+    'FP-002': ('IV', 'News articles citing same press release counted as independent sources',
+               'For breaking news, trace all articles to original source before counting independence'),
+    'FP-003': ('NE', 'Mixing fiscal year and calendar year data without noting discrepancy',
+               'Always note FY vs CY; normalize to consistent timeframe or flag explicitly'),
+    'FP-004': ('SD', "Using outdated data for 'current state' claims",
+               'Verify publication date; flag if >12 months old for fast-moving topics'),
+    'FP-005': ('CM', 'Using definitive language without strong evidence (clearly, proves, definitely)',
+               "Flag definitive language for evidence strength check; prefer 'suggests', 'indicates'"),
+}
+
+_QUALIFIED = re.compile(rf'(?:\b(?:{QUALIFIERS})\s+|[~≈]\s?)$', re.IGNORECASE)
+_CONDITIONAL = re.compile(r'\b(?:if|whether|unless|until|once)\b', re.IGNORECASE)
+_DATE = re.compile(r'\b((?:19|20)\d{2})(?:[-/](\d{1,2})(?:[-/](\d{1,2}))?)?\b')
+_SENTENCE_END = re.compile(r'[.!?](?=\s)|\n')
+
+
+# --- Compilation ---
+def compile_signals(patterns=()):
+    """One expression over the built-in signals plus each memory pattern's literal "signals"."""
+    parts = [f'(?P<{name}>{regex})' for name, regex in SIGNALS]
+    custom = {}
+    for n, pattern in enumerate(patterns):
+        phrases = [p for p in pattern.get('signals') or [] if p.strip()]
+        if phrases:
+            group = f'sig{n}'
+            custom[group] = pattern['pattern_id']
+            alternatives = '|'.join(re.escape(p.strip()) for p in sorted(phrases, key=len, reverse=True))
+            parts.append(rf'(?P<{group}>\b(?:{alternatives})\b)')
+    # every signal starts on a word character, '[' or '~'; the lookahead lets the scan skip the rest cheaply
+    return re.compile(r'(?=[\w\[~≈])(?:' + '|'.join(parts) + ')', re.IGNORECASE), custom
+
+
+# --- Documents ---
+class Corpus:
+    """Documents concatenated into one buffer, with offsets mapped back to file/line/column."""
+
+    def __init__(self):
+        self.parts = []   # (kind, name, text)
+        self.starts = []
+        self.buffer = ''
+
+    def add(self, kind, name, text):
+        self.starts.append(len(self.buffer))
+        self.parts.append((kind, name, text))
+        self.buffer += text + '\n\0\n'  # separator no signal can match across
+
+    def locate(self, pos):
+        """(document index, offset within it)."""
+        d = bisect.bisect_right(self.starts, pos) - 1
+        return d, pos - self.starts[d]
+
+
+def _line_col(text, offset):
+    line = text.count('\n', 0, offset) + 1
+    return line, offset - (text.rfind('\n', 0, offset) + 1) + 1
+
+
+def _sentence(text, offset):
+    """(start, end) of the sentence or list item around offset."""
+    start = 0
+    for m in _SENTENCE_END.finditer(text, max(0, offset - 2000), offset):
+        start = m.end()
+    m = _SENTENCE_END.search(text, offset)
+    end = m.end() if m else len(text)
+    return start, end
+
+
+def _paragraph(text, offset):
+    start = text.rfind('\n\n', 0, offset)
+    end = text.find('\n\n', offset)
+    return (0 if start < 0 else start + 2), (len(text) if end < 0 else end)
+
+
+def _csv_rows(text):
+    """[(first line, last line, row dict)] for a CSV text."""
+    reader = csv.DictReader(io.StringIO(text))
+    rows, line = [], 2
+    for row in reader:
+        rows.append((line, reader.line_num, row))
+        line = reader.line_num + 1
+    return rows
+
+
+def _row_at(rows, line):
+    for first, last, row in rows:
+        if first <= line <= last:
+            return row
+    return None
+
+
+def _period_end(value):
+    """Last day of a catalog date (2024 -> 2024-12-31, 2024-05 -> 2024-05-31), or None."""
+    m = _DATE.search(value or '')
+    if not m:
+        return None
+    year, month, day = int(m.group(1)), m.group(2), m.group(3)
+    if month is None:
+        return datetime.date(year, 12, 31)
+    month = min(12, max(1, int(month)))
+    if day is None:
+        following = datetime.date(year + month // 12, month % 12 + 1, 1)
+        return following - datetime.timedelta(days=1)
+    try:
+        return datetime.date(year, month, int(day))
+    except ValueError:
+        return datetime.date(year, month, 28)
+
+
+def _qualifier(text, offset):
+    """Qualifier ("up to", "~", ...) directly before a statistic at offset, or None."""
+    m = _QUALIFIED.search(text, max(0, offset - 30), offset)
+    return m.group(0).strip() if m else None
+
+
+def _stat_key(m):
+    unit = m.group('unit').lower().lstrip('-')
+    unit = {'percent': '%', '×': 'x', 'times': 'x', 'fold': 'x'}.get(unit, unit)
+    return m.group('num').replace(',', ''), unit
+
+
+# --- Scan ---
+def scan(reports, ledger_text=None, catalog_text=None, patterns=(), as_of=None):
+    """
+    Findings for report texts ({name: text}) plus the ledger and catalog CSV texts.
+    Returns (findings, bytes scanned).
+    """
+    as_of = as_of or datetime.date.today()
+    stale_before = as_of - datetime.timedelta(days=round(STALE_MONTHS * 30.44))
+    regex, custom = compile_signals(patterns)
+
+    corpus = Corpus()
+    for name, text in reports.items():
+        corpus.add('report', name, text)
+    if ledger_text is not None:
+        corpus.add('ledger', ledger_text[0], ledger_text[1])
+    if catalog_text is not None:
+        corpus.add('catalog', catalog_text[0], catalog_text[1])
+
+    hits = [[] for _ in corpus.parts]  # per document: (group, offset, match)
+    for m in regex.finditer(corpus.buffer):
+        d, offset = corpus.locate(m.start())
+        hits[d].append((m.lastgroup, offset, m))
+
+    catalog = {}
+    press_sources = set()
+    ledger_rows = []
+    for d, (kind, name, text) in enumerate(corpus.parts):
+        if kind == 'catalog':
+            rows = _csv_rows(text)
+            catalog = {row.get('id'): row for _, _, row in rows if row.get('id')}
+            for group, offset, _ in hits[d]:
+                if group == 'press':
+                    row = _row_at(rows, _line_col(text, offset)[0])
+                    if row and row.get('id'):
+                        press_sources.add(row['id'])
+        elif kind == 'ledger':
+            ledger_rows = _csv_rows(text)
+
+    findings = []
+
+    def finding(pattern_id, d, offset, match, detail, span=None):
+        kind, name, text = corpus.parts[d]
+        line, col = _line_col(text, offset)
+        start, end = span or _sentence(text, offset)
+        findings.append({'pattern_id': pattern_id, 'category': BUILTIN_PATTERNS.get(pattern_id, ('',))[0],
+                         'file': name, 'line': line, 'col': col, 'match': match,
+                         'text': ' '.join(text[start:end].split())[:MAX_TEXT], 'detail': detail})
+
+    def cited(d, offset):
+        """Source IDs a hit rests on: citations in its sentence (report) or the row's source_ids (ledger)."""
+        kind, _, text = corpus.parts[d]
+        if kind == 'ledger':
+            row = _row_at(ledger_rows, _line_col(text, offset)[0])
+            return [s.strip() for s in (row or {}).get('source_ids', '').split(',') if s.strip()]
+        start, end = _sentence(text, offset)
+        return [s for group, o, m in hits[d] if group == 'cite' and start <= o < end
+                for s in re.split(r'\s*[,;]\s*', m.group('ids'))]
+
+    # FP-001: statistics qualified somewhere, stated bare in the report
+    qualified, bare = {}, []
+    for d, (kind, name, text) in enumerate(corpus.parts):
+        for group, offset, m in hits[d]:
+            if group != 'stat':
+                continue
+            qualifier = _qualifier(text, offset)
+            if qualifier:
+                qualified.setdefault(_stat_key(m), (qualifier, f'{name}:{_line_col(text, offset)[0]}'))
+            elif kind == 'report':
+                bare.append((d, offset, m))
+    for d, offset, m in bare:
+        if _stat_key(m) in qualified:
+            qualifier, where = qualified[_stat_key(m)]
+            finding('FP-001', d, offset, m.group(0), f'stated as "{qualifier} {m.group(0).strip()}" at {where}')
+
+    # FP-002: ledger claims called independent whose sources share a domain or a press release
+    if ledger_rows:
+        d = next(i for i, part in enumerate(corpus.parts) if part[0] == 'ledger')
+        text = corpus.parts[d][2]
+        for first, _, row in ledger_rows:
+            independence = (row.get('independence') or '').strip().upper()
+            ids = [s.strip() for s in (row.get('source_ids') or '').split(',') if s.strip()]
+            if not independence.startswith('INDEPENDENT') or len(ids) < 2:
+                continue
+            domains = {}
+            for sid in ids:
+                url = (catalog.get(sid) or {}).get('url')
+                if url:
+                    domains.setdefault(normalize_domain(url), []).append(sid)
+            shared = [f"{', '.join(sids)} ({domain})" for domain, sids in domains.items() if len(sids) > 1]
+            wire = [sid for sid in ids if sid in press_sources]
+            problems = []
+            if shared:
+                problems.append('same domain: ' + '; '.join(shared))
+            if len(wire) > 1:
+                problems.append('press-release sources: ' + ', '.join(wire))
+            if problems:
+                offset = sum(len(l) + 1 for l in text.split('\n')[:first - 1])
+                finding('FP-002', d, offset, row.get('claim_id') or '', '; '.join(problems),
+                        span=(offset, text.find('\n', offset) if text.find('\n', offset) >= 0 else len(text)))
+
+    for d, (kind, name, text) in enumerate(corpus.parts):
+        if kind == 'catalog':
+            continue
+        # FP-003: fiscal-year figures next to bare calendar years, with no CY note
+        paragraphs = {}
+        for group, offset, m in hits[d]:
+            if group in ('fy', 'cy', 'year'):
+                paragraphs.setdefault(_paragraph(text, offset), []).append((group, offset, m))
+        for span, tokens in paragraphs.items():
+            groups = {g for g, _, _ in tokens}
+            if 'fy' in groups and 'year' in groups and 'cy' not in groups:
+                _, offset, m = next(t for t in tokens if t[0] == 'fy')
+                years = sorted({t[2].group(0) for t in tokens if t[0] == 'year'})
+                finding('FP-003', d, offset, m.group(0), f"fiscal-year figure alongside calendar years "
+                                                         f"{', '.join(years)} with no FY/CY note")
+
+        for group, offset, m in hits[d]:
+            # FP-004: "current" statements resting on stale sources or years
+            if group == 'current':
+                start, end = _sentence(text, offset)
+                stale = []
+                for sid in dict.fromkeys(cited(d, offset)):
+                    dated = _period_end((catalog.get(sid) or {}).get('date'))
+                    if dated and dated < stale_before:
+                        stale.append(f"{sid} ({catalog[sid]['date']})")
+                years = [int(o.group(0)) for g, p, o in hits[d] if g == 'year' and start <= p < end]
+                if stale:
+                    finding('FP-004', d, offset, m.group(0), f'cites sources older than {STALE_MONTHS} months: '
+                                                             + ', '.join(stale))
+                elif years and datetime.date(max(years), 12, 31) < stale_before:
+                    finding('FP-004', d, offset, m.group(0), f'only names years up to {max(years)}')
+            # FP-005: definitive language; say what the sentence rests on
+            elif group == 'definitive':
+                start, _ = _sentence(text, offset)
+                if _CONDITIONAL.search(text, start, offset):
+                    continue  # "if X proves insufficient" hedges rather than asserts
+                sources = list(dict.fromkeys(cited(d, offset)))
+                grades = [f"{sid} ({(catalog.get(sid) or {}).get('grade') or '?'})" for sid in sources]
+                finding('FP-005', d, offset, m.group(0),
+                        'rests on ' + ', '.join(grades) if grades else 'no citation in the sentence')
+            elif group in custom:
+                finding(custom[group], d, offset, m.group(0), 'memory signal')
+
+    findings.sort(key=lambda f: (f['file'], f['line'], f['col'], f['pattern_id']))
+    return findings, len(corpus.buffer)
+
+
+# --- Reflection memory ---
+def default_memory_path():
+    return USER_MEMORY if os.path.exists(USER_MEMORY) else BOOTSTRAP_MEMORY
+
+
+def fingerprint(f):
+    """Identity of a failure that survives rescans: pattern, file and its sentence (not the match)."""
+    key = '\0'.join([f['pattern_id'], os.path.basename(f['file']), f['text']])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def record_hits(memory, findings, today, seen=()):
+    """Add new hits to pattern frequency/first_seen/last_seen and the stats block, in place.
+
+    Several matches of one pattern in one sentence are one failure.
+    Returns ({pattern_id: hits counted}, fingerprints counted).
+    """
+    seen = set(seen)
+    counted, new = {}, []
+    for f in findings:
+        fp = fingerprint(f)
+        if fp in seen:
+            continue
+        seen.add(fp)
+        new.append(fp)
+        counted[f['pattern_id']] = counted.get(f['pattern_id'], 0) + 1
+    if not counted:
+        return counted, new
+
+    patterns = memory.setdefault('failure_patterns', [])
+    by_id = {p.get('pattern_id'): p for p in patterns}
+    stamp = today.isoformat()
+    for pattern_id, n in counted.items():
+        pattern = by_id.get(pattern_id)
+        if pattern is None:
+            category, description, rule = BUILTIN_PATTERNS[pattern_id]
+            pattern = {'pattern_id': pattern_id, 'category': category, 'description': description,
+                       'frequency': 0, 'first_seen': None, 'last_seen': None, 'prevention_rule': rule,
+                       'example_failures': []}
+            patterns.append(pattern)
+            by_id[pattern_id] = pattern
+        pattern['frequency'] = (pattern.get('frequency') or 0) + n
+        pattern['first_seen'] = pattern.get('first_seen') or stamp
+        pattern['last_seen'] = stamp
+
+    stats = memory.setdefault('stats', {})
+    stats['total_failures_logged'] = (stats.get('total_failures_logged') or 0) + sum(counted.values())
+    by_category = {}
+    for pattern in patterns:
+        if pattern.get('frequency'):
+            by_category[pattern.get('category')] = by_category.get(pattern.get('category'), 0) + pattern['frequency']
+    if by_category:
+        stats['most_common_category'] = max(sorted(by_category), key=by_category.get)
+    memory['last_updated'] = stamp
+    return counted, new
+
+
+def _write_json(path, value):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f'{path}.tmp{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(value, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+# --- CLI Interface ---
+def _project_inputs(project):
+    reports = sorted(glob.glob(os.path.join(project, '08_report', '*.md')))
+    if not reports and os.path.exists(os.path.join(project, 'report.md')):
+        reports = [os.path.join(project, 'report.md')]
+    ledger = os.path.join(project, '04_evidence_ledger.csv')
+    catalog = os.path.join(project, '03_source_catalog.csv')
+    return reports, ledger if os.path.exists(ledger) else None, catalog if os.path.exists(catalog) else None
+
+
+def _read(path):
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-QA failure-pattern scan')
+    parser.add_argument('--project', help='Project directory, e.g. RESEARCH/my-project')
+    parser.add_argument('--report', action='append', default=[], help='Report file (repeatable)')
+    parser.add_argument('--ledger', help='04_evidence_ledger.csv')
+    parser.add_argument('--catalog', help='03_source_catalog.csv')
+    parser.add_argument('--memory', help='reflection_memory.json (default: ~/.claude, else repo bootstrap)')
+    parser.add_argument('--as-of', help='Date staleness is measured from (default: today)')
+    parser.add_argument('--record', action='store_true', help='Add hits to the memory file')
+    args = parser.parse_args()
+
+    reports, ledger, catalog = list(args.report), args.ledger, args.catalog
+    if args.project:
+        project_reports, project_ledger, project_catalog = _project_inputs(args.project)
+        reports = reports or project_reports
+        ledger = ledger or project_ledger
+        catalog = catalog or project_catalog
+    if not reports and not ledger:
+        parser.error('nothing to scan: give --project or --report/--ledger')
+    try:
+        as_of = datetime.date.fromisoformat(args.as_of) if args.as_of else datetime.date.today()
+    except ValueError:
+        parser.error(f'--as-of must be YYYY-MM-DD, got {args.as_of!r}')
+
+    memory_path = args.memory or default_memory_path()
+    try:
+        memory = json.loads(_read(memory_path))
+    except FileNotFoundError:
+        memory = {}
+    except json.JSONDecodeError as e:
+        print(f"qa_scan: invalid memory file {memory_path}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    texts = {path: _read(path) for path in reports}
+    start = time.perf_counter()
+    findings, scanned = scan(texts, (ledger, _read(ledger)) if ledger else None,
+                             (catalog, _read(catalog)) if catalog else None,
+                             memory.get('failure_patterns', []), as_of)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    counts = {}
+    for f in findings:
+        counts[f['pattern_id']] = counts.get(f['pattern_id'], 0) + 1
+    result = {'findings': findings, 'counts': dict(sorted(counts.items())),
+              'scanned': {'files': len(texts) + bool(ledger) + bool(catalog), 'bytes': scanned,
+                          'ms': round(elapsed, 2)}}
+
+    if args.record:
+        recorded_path = os.path.join(args.project, RECORDED_FILE) if args.project else None
+        seen = []
+        if recorded_path and os.path.exists(recorded_path):
+            seen = json.loads(_read(recorded_path)).get('fingerprints', [])
+        counted, new = record_hits(memory, findings, as_of, seen)
+        if counted:
+            _write_json(memory_path, memory)
+            if recorded_path:
+                _write_json(recorded_path, {'fingerprints': seen + new})
+        result['recorded'] = {'memory': memory_path, 'new_hits': dict(sorted(counted.items()))}
+
+    json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -17,15 +17,48 @@ Config via env vars:
     RERANKER_API_KEY   = <key>                       (required)
     RERANKER_MODEL     = <model>                     (optional, per-provider defaults)
     RERANKER_TIMEOUT   = <seconds>                   (default: 5)
+    RERANKER_ENDPOINT_<NAME> = <url>                 (optional — e.g. a local mock or fixture server)
+    DR_HTTP_CACHE      = <path>|off                  (default: shared on-disk cache, see http_cache.py)
+    DR_TRACE           = <dir>|off                   (request spans, cache hits, fallbacks by reason; see instrument.py)
+
+Hedged multi-provider mode (asyncio) — enabled when RERANKER_PROVIDERS lists 2+ providers:
+    RERANKER_PROVIDERS        = cohere,voyage,...   (providers to race, each needs a key)
+    RERANKER_API_KEY_<NAME>   = <key>               (per provider; RERANKER_API_KEY covers RERANKER_PROVIDER)
+    RERANKER_MODEL_<NAME>     = <model>             (optional)
+    RERANKER_STATS            = <path>              (default: ~/.cache/dr/rerank_stats.json)
+The provider with the best latency/error EWMA goes first; if it has not
+answered after its p95 latency, a hedged request goes to the next provider
+and whichever answers first wins. The winner is reported on stderr.
+These settings are read from the per-call env; filter_client.py forwards all
+RERANKER_* variables, so the filter daemon hedges exactly like a one-shot run.
+
+Large passage sets:
+    RERANKER_MAX_WORDS        = <n>                 (default: 400 — documents are truncated before sending)
+    RERANKER_BATCH_SIZE       = <n>                 (default: per provider — documents per request)
+    RERANKER_CONCURRENCY      = <n>                 (default: 4 — batches in flight)
+Duplicate passages (same normalized text) are dropped before sending. When a
+single-provider request exceeds the batch size it is split into concurrent
+batches; the top BM25 passages ride along in every batch as anchors, and each
+batch's scores are shifted so the anchors agree before merging into one top-N.
 
 On any error, passes BM25 input unchanged to stdout + warning to stderr.
 """
 
+import asyncio
+import io
 import json
+import math
 import os
+import ssl
 import sys
-import urllib.request
+import time
+from concurrent.futures import ThreadPoolExecutor
 import urllib.error
+import urllib.parse
+import urllib.request
+
+import http_cache
+import instrument
 
 # --- Provider Configuration ---
 PROVIDERS = {
@@ -34,56 +67,110 @@ PROVIDERS = {
         "model": "zerank-2",
         "top_n_field": "top_n",
         "results_field": "results",
+        "batch_size": 100,
     },
     "cohere": {
         "endpoint": "https://api.cohere.com/v2/rerank",
         "model": "rerank-v4.0-pro",
         "top_n_field": "top_n",
         "results_field": "results",
+        "batch_size": 100,
     },
     "voyage": {
         "endpoint": "https://api.voyageai.com/v1/rerank",
         "model": "rerank-2.5",
         "top_n_field": "top_k",
         "results_field": "data",
+        "batch_size": 100,
     },
     "jina": {
         "endpoint": "https://api.jina.ai/v1/rerank",
         "model": "jina-reranker-v2-base-multilingual",
         "top_n_field": "top_n",
         "results_field": "results",
+        "batch_size": 100,
     },
 }
 
 DEFAULT_TOP_N = 20
 DEFAULT_TIMEOUT = 5
+DEFAULT_MAX_WORDS = 400  # BM25 chunks are <=300 words; only full pages get cut
+DEFAULT_CONCURRENCY = 4
+ANCHOR_COUNT = 2  # top BM25 passages repeated in every batch for score calibration
+
+# Hedged mode
+DEFAULT_STATS_PATH = os.path.join(os.path.expanduser("~"), ".cache", "dr", "rerank_stats.json")
+EWMA_ALPHA = 0.2
+HEDGE_DEFAULT_DELAY = 1.0  # seconds, before a provider has latency history
+HEDGE_MIN_DELAY = 0.05
+P95_Z = 1.645  # p95 ~ mean + 1.645 * stddev
+
+
+def rerank(query, passages, top_n, provider, api_key, model, timeout, pool=None, cache=None,
+           documents=None, endpoint=None):
+    """Call reranker API and return reranked passages.
+
+    pool: optional http_pool.ConnectionPool for keep-alive reuse across calls.
+    cache: optional http_cache.HttpCache; identical query/passage sets skip the API.
+    documents: texts to send in place of the passage texts (e.g. truncated).
+    endpoint: URL overriding the provider's default.
+    """
+    documents = [p["text"] for p in passages] if documents is None else documents
+    results = _fetch_results(query, documents, top_n, provider, api_key, model, timeout, pool, cache,
+                             endpoint)
+    return _apply_results(results, passages)
+
+
+def _cache_endpoint(provider, url):
+    """Cache namespace for one provider URL, so endpoint overrides never share results."""
+    return f"rerank:{provider}:{url}"
 
 
-def rerank(query, passages, top_n, provider, api_key, model, timeout):
-    """Call reranker API and return reranked passages."""
+def _fetch_results(query, documents, top_n, provider, api_key, model, timeout, pool, cache,
+                   endpoint=None):
+    """One provider request; returns the raw [{index, relevance_score}] results."""
     config = PROVIDERS[provider]
-    used_model = model or config["model"]
+    url = endpoint or config["endpoint"]
+    body = _request_body(config, model, query, documents, top_n)
 
-    body = {
-        "model": used_model,
+    cache_endpoint = _cache_endpoint(provider, url)
+    results = cache.get(body, cache_endpoint) if cache is not None else None
+    if cache is not None:
+        instrument.count("rerank.cache_misses" if results is None else "rerank.cache_hits")
+    if results is None:
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+        start = time.perf_counter()
+        with instrument.span("rerank.request", provider=provider, documents=len(documents)):
+            if pool is not None:
+                data = pool.post_json(url, body, headers=headers, timeout=timeout)
+            else:
+                req = urllib.request.Request(
+                    url,
+                    data=json.dumps(body).encode(),
+                    headers=headers,
+                )
+                resp = urllib.request.urlopen(req, timeout=timeout)
+                data = json.loads(resp.read())
+        results = data[config["results_field"]]
+        if cache is not None:
+            cache.put(body, results, cache_endpoint, cost_ms=(time.perf_counter() - start) * 1000)
+    return results
+
+
+def _request_body(config, model, query, documents, top_n):
+    return {
+        "model": model or config["model"],
         "query": query,
-        "documents": [p["text"] for p in passages],
-        config["top_n_field"]: min(top_n, len(passages)),
+        "documents": documents,
+        config["top_n_field"]: min(top_n, len(documents)),
     }
 
-    req = urllib.request.Request(
-        config["endpoint"],
-        data=json.dumps(body).encode(),
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-    )
-    resp = urllib.request.urlopen(req, timeout=timeout)
-    data = json.loads(resp.read())
-    results = data[config["results_field"]]
 
-    # Map back to passage objects, sorted by rerank score descending
+def _apply_results(results, passages):
+    """Map provider results back to passage objects, sorted by rerank score descending."""
     ranked = sorted(results, key=lambda r: r["relevance_score"], reverse=True)
     return [
         {**passages[r["index"]], "rerank_score": round(r["relevance_score"], 4)}
@@ -91,55 +178,337 @@ def rerank(query, passages, top_n, provider, api_key, model, timeout):
     ]
 
 
-def main():
-    if "--help" in sys.argv or "-h" in sys.argv:
-        print(__doc__)
-        sys.exit(0)
+# --- Large Passage Sets ---
+def prepare_passages(passages, max_words=DEFAULT_MAX_WORDS):
+    """
+    Drop passages whose normalized text repeats an earlier one and truncate
+    what is sent to max_words. Returns (kept passages, documents to send,
+    number of duplicates dropped). Kept passages keep their full text.
+    """
+    seen = set()
+    kept, documents = [], []
+    for p in passages:
+        words = p["text"].split()
+        key = " ".join(words).lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append(p)
+        documents.append(" ".join(words[:max_words]) if len(words) > max_words else p["text"])
+    return kept, documents, len(passages) - len(kept)
 
-    # Read input from stdin
-    raw = sys.stdin.read()
+
+def rerank_batched(query, passages, documents, top_n, provider, api_key, model, timeout,
+                   batch_size, concurrency=DEFAULT_CONCURRENCY, pool=None, cache=None, endpoint=None):
+    """
+    Rerank more documents than one request allows.
+
+    Passages arrive in BM25 order; the first ANCHOR_COUNT go into every batch.
+    Each batch's scores are shifted by the mean gap between its anchor scores
+    and the first batch's, putting all batches on one scale before the merge.
+    """
+    n = len(documents)
+    if n <= batch_size:
+        return rerank(query, passages, top_n, provider, api_key, model, timeout,
+                      pool=pool, cache=cache, documents=documents, endpoint=endpoint)
+
+    anchors = list(range(min(ANCHOR_COUNT, batch_size - 1)))
+    rest = list(range(len(anchors), n))
+    step = batch_size - len(anchors)
+    batches = [anchors + rest[i:i + step] for i in range(0, len(rest), step)]
+
+    def score_batch(indices):
+        results = _fetch_results(query, [documents[i] for i in indices], len(indices),
+                                 provider, api_key, model, timeout, pool, cache, endpoint)
+        return {indices[r["index"]]: r["relevance_score"] for r in results}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as ex:
+        batch_scores = list(ex.map(score_batch, batches))
+
+    reference = batch_scores[0]
+    merged = {}
+    for scores in batch_scores:
+        gaps = [reference[a] - scores[a] for a in anchors if a in reference and a in scores]
+        shift = sum(gaps) / len(gaps) if gaps else 0.0
+        for idx, score in scores.items():
+            merged.setdefault(idx, score + shift)
+
+    ranked = sorted(merged.items(), key=lambda item: item[1], reverse=True)[:top_n]
+    return [{**passages[idx], "rerank_score": round(score, 4)} for idx, score in ranked]
+
+
+# --- Hedged Multi-Provider Mode ---
+class ProviderStats:
+    """Per-provider latency (mean/variance) and error-rate EWMAs, persisted as JSON."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.data = {}
+        if path:
+            try:
+                with open(path) as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                self.data = {}
+
+    def update(self, provider, latency, ok):
+        entry = self.data.setdefault(provider, {"latency": latency, "var": 0.0, "errors": 0.0, "calls": 0})
+        entry["calls"] += 1
+        entry["errors"] += EWMA_ALPHA * ((0.0 if ok else 1.0) - entry["errors"])
+        if ok:
+            diff = latency - entry["latency"]
+            incr = EWMA_ALPHA * diff
+            entry["latency"] += incr
+            entry["var"] = (1 - EWMA_ALPHA) * (entry["var"] + diff * incr)
+
+    def cost(self, provider):
+        """Expected seconds per successful answer; unseen providers look average."""
+        entry = self.data.get(provider)
+        if entry is None:
+            return HEDGE_DEFAULT_DELAY
+        return entry["latency"] / max(0.05, 1 - entry["errors"])
+
+    def rank(self, providers):
+        return sorted(providers, key=lambda p: (self.cost(p), providers.index(p)))
+
+    def hedge_delay(self, provider, timeout):
+        entry = self.data.get(provider)
+        if entry is None:
+            return min(HEDGE_DEFAULT_DELAY, timeout)
+        p95 = entry["latency"] + P95_Z * math.sqrt(entry["var"])
+        return min(max(p95, HEDGE_MIN_DELAY), timeout)
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.tmp{os.getpid()}"
+            with open(tmp, "w") as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"reranker: could not save provider stats: {e}", file=sys.stderr)
+
+
+async def _read_chunked(reader):
+    data = bytearray()
+    while True:
+        size = int((await reader.readline()).split(b";")[0].strip(), 16)
+        if size == 0:
+            await reader.readline()
+            return bytes(data)
+        data += await reader.readexactly(size)
+        await reader.readline()
+
+
+async def _post_json_async(url, payload, headers):
+    """Minimal asyncio HTTP/1.1 POST; cancelling the task drops the connection."""
+    parts = urllib.parse.urlsplit(url)
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, port, ssl=ssl.create_default_context() if https else None)
     try:
-        data = json.loads(raw)
-    except json.JSONDecodeError as e:
-        print(f"reranker: invalid JSON input: {e}", file=sys.stderr)
-        sys.stdout.write(raw)
-        sys.exit(0)
+        body = json.dumps(payload).encode()
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        lines = [f"POST {path} HTTP/1.1", f"Host: {parts.netloc}", "Connection: close",
+                 f"Content-Length: {len(body)}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+        status = int((await reader.readline()).split()[1])
+        resp_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            resp_headers[key.strip().lower()] = value.strip()
+        if resp_headers.get("transfer-encoding", "").lower() == "chunked":
+            data = await _read_chunked(reader)
+        elif "content-length" in resp_headers:
+            data = await reader.readexactly(int(resp_headers["content-length"]))
+        else:
+            data = await reader.read()
+    finally:
+        writer.close()
+    if status >= 400:
+        raise urllib.error.HTTPError(url, status, "provider error", None, io.BytesIO(data))
+    return json.loads(data)
+
+
+def hedged_providers(env):
+    """Configured providers for hedged mode: [{"name", "api_key", "model", "endpoint"}]."""
+    names = [n.strip().lower() for n in env.get("RERANKER_PROVIDERS", "").split(",") if n.strip()]
+    main = env.get("RERANKER_PROVIDER", "zerank").lower()
+    configured = []
+    for name in names:
+        if name not in PROVIDERS:
+            print(f"reranker: unknown provider '{name}' in RERANKER_PROVIDERS, skipping", file=sys.stderr)
+            continue
+        key = env.get(f"RERANKER_API_KEY_{name.upper()}") or (env.get("RERANKER_API_KEY") if name == main else "")
+        if not key:
+            continue
+        configured.append({
+            "name": name,
+            "api_key": key,
+            "model": env.get(f"RERANKER_MODEL_{name.upper()}") or (env.get("RERANKER_MODEL") if name == main else ""),
+            "endpoint": env.get(f"RERANKER_ENDPOINT_{name.upper()}") or PROVIDERS[name]["endpoint"],
+        })
+    return configured
+
 
+async def rerank_hedged(query, passages, top_n, providers, timeout, stats, cache=None,
+                        documents=None):
+    """
+    Race providers: start the best-ranked one, hedge to the next after its p95
+    latency (or at once if it fails), and return (passages, winner, hedged).
+    """
+    documents = [p["text"] for p in passages] if documents is None else documents
+    by_name = {p["name"]: p for p in providers}
+    order = stats.rank(list(by_name))
+    bodies = {name: _request_body(PROVIDERS[name], by_name[name]["model"], query, documents, top_n)
+              for name in order}
+
+    for name in order:
+        cached = (cache.get(bodies[name], _cache_endpoint(name, by_name[name]["endpoint"]))
+                  if cache is not None else None)
+        if cached is not None:
+            instrument.count("rerank.cache_hits")
+            return _apply_results(cached, passages), name, False
+    if cache is not None:
+        instrument.count("rerank.cache_misses")
+
+    loop = asyncio.get_running_loop()
+
+    async def attempt(name):
+        config = by_name[name]
+        headers = {"Authorization": f"Bearer {config['api_key']}", "Content-Type": "application/json"}
+        start = loop.time()
+        try:
+            data = await asyncio.wait_for(_post_json_async(config["endpoint"], bodies[name], headers), timeout)
+            results = data[PROVIDERS[name]["results_field"]]
+        except asyncio.CancelledError:
+            instrument.record("rerank.request", (loop.time() - start) * 1000, provider=name, cancelled=True)
+            raise  # lost the race; its latency is censored, not an error
+        except Exception as e:
+            stats.update(name, loop.time() - start, ok=False)
+            instrument.record("rerank.request", (loop.time() - start) * 1000, provider=name,
+                              error=type(e).__name__)
+            raise
+        elapsed = loop.time() - start
+        stats.update(name, elapsed, ok=True)
+        instrument.record("rerank.request", elapsed * 1000, provider=name, documents=len(documents))
+        if cache is not None:
+            cache.put(bodies[name], results, _cache_endpoint(name, config["endpoint"]), cost_ms=elapsed * 1000)
+        return name, results
+
+    queue = list(order)
+    tasks = {asyncio.create_task(attempt(queue.pop(0)))}
+    hedge_at = loop.time() + stats.hedge_delay(order[0], timeout)
+    hedged = False
+    errors = []
+    try:
+        while tasks:
+            wait = max(0.0, hedge_at - loop.time()) if queue and not hedged else None
+            done, tasks = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Primary is slower than its p95: hedge to the next provider
+                hedged = True
+                instrument.count("rerank.hedges")
+                tasks.add(asyncio.create_task(attempt(queue.pop(0))))
+                continue
+            for task in done:
+                if task.exception() is None:
+                    name, results = task.result()
+                    return _apply_results(results, passages), name, hedged
+                errors.append(task.exception())
+            if not tasks and queue:
+                tasks.add(asyncio.create_task(attempt(queue.pop(0))))
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    raise RuntimeError("all providers failed: " + "; ".join(repr(e) for e in errors))
+
+
+def run(data, env=None, pool=None, cache=None):
+    """Rerank a parsed stdin request, falling back to the BM25 order on any error.
+
+    cache defaults to the shared on-disk cache (http_cache.from_env()).
+    """
+    env = os.environ if env is None else env
+    cache = http_cache.from_env() if cache is None else cache
     query = data.get("query", "")
     passages = data.get("passages", [])
     top_n = data.get("top_n", DEFAULT_TOP_N)
 
     # If no passages, pass through
     if not passages:
-        json.dump(passages, sys.stdout, indent=2)
-        print()
-        return
+        return passages
 
     # Read config from env
-    api_key = os.environ.get("RERANKER_API_KEY", "")
-    provider = os.environ.get("RERANKER_PROVIDER", "zerank").lower()
-    model = os.environ.get("RERANKER_MODEL", "")
-    timeout = int(os.environ.get("RERANKER_TIMEOUT", str(DEFAULT_TIMEOUT)))
+    api_key = env.get("RERANKER_API_KEY", "")
+    provider = env.get("RERANKER_PROVIDER", "zerank").lower()
+    model = env.get("RERANKER_MODEL", "")
+    timeout = int(env.get("RERANKER_TIMEOUT", str(DEFAULT_TIMEOUT)))
+    max_words = int(env.get("RERANKER_MAX_WORDS", str(DEFAULT_MAX_WORDS)))
+    concurrency = int(env.get("RERANKER_CONCURRENCY", str(DEFAULT_CONCURRENCY)))
+
+    instrument.count("rerank.calls")
+
+    def to_send():
+        # Dedup/truncation applies only to what goes to a provider; fallbacks return the input as is
+        kept, documents, dropped = prepare_passages(passages, max_words)
+        if dropped:
+            instrument.count("rerank.duplicates_dropped", dropped)
+            print(f"reranker: dropped {dropped} duplicate passage(s)", file=sys.stderr)
+        return kept, documents
+
+    # Hedged mode when two or more providers are configured
+    hedge_pool = hedged_providers(env)
+    if len(hedge_pool) >= 2:
+        stats = ProviderStats(env.get("RERANKER_STATS", DEFAULT_STATS_PATH))
+        try:
+            kept, documents = to_send()
+            result, winner, hedged = asyncio.run(
+                rerank_hedged(query, kept, top_n, hedge_pool, timeout, stats, cache=cache,
+                              documents=documents))
+            print(f"reranker: provider={winner} hedged={str(hedged).lower()}", file=sys.stderr)
+            instrument.count(f"rerank.winner.{winner}")
+            return result
+        except Exception as e:
+            print(f"reranker: hedged rerank failed ({e}). Falling back to BM25.", file=sys.stderr)
+            instrument.count("rerank.fallback.hedged_failed")
+            return passages
+        finally:
+            stats.save()
 
     # No API key → pass through BM25 output unchanged
     if not api_key:
         print("reranker: RERANKER_API_KEY not set, passing through BM25 output", file=sys.stderr)
-        json.dump(passages, sys.stdout, indent=2)
-        print()
-        return
+        instrument.count("rerank.fallback.no_api_key")
+        return passages
 
     # Validate provider
     if provider not in PROVIDERS:
         print(f"reranker: unknown provider '{provider}', expected one of: {', '.join(PROVIDERS)}. Falling back.", file=sys.stderr)
-        json.dump(passages, sys.stdout, indent=2)
-        print()
-        return
+        instrument.count("rerank.fallback.unknown_provider")
+        return passages
+
+    batch_size = int(env.get("RERANKER_BATCH_SIZE", PROVIDERS[provider]["batch_size"]))
 
     # Attempt reranking with full fallback
     try:
-        result = rerank(query, passages, top_n, provider, api_key, model, timeout)
-        json.dump(result, sys.stdout, indent=2)
-        print()
+        kept, documents = to_send()
+        return rerank_batched(query, kept, documents, top_n, provider, api_key, model, timeout,
+                              batch_size, concurrency=concurrency, pool=pool, cache=cache,
+                              endpoint=env.get(f"RERANKER_ENDPOINT_{provider.upper()}"))
     except urllib.error.HTTPError as e:
         body = ""
         try:
@@ -147,16 +516,32 @@ def main():
         except Exception:
             pass
         print(f"reranker: HTTP {e.code} from {provider}: {body}. Falling back to BM25.", file=sys.stderr)
-        json.dump(passages, sys.stdout, indent=2)
-        print()
+        instrument.count(f"rerank.fallback.http_{e.code}")
     except urllib.error.URLError as e:
         print(f"reranker: connection error ({provider}): {e.reason}. Falling back to BM25.", file=sys.stderr)
-        json.dump(passages, sys.stdout, indent=2)
-        print()
+        instrument.count("rerank.fallback.connection")
     except Exception as e:
         print(f"reranker: unexpected error: {e}. Falling back to BM25.", file=sys.stderr)
-        json.dump(passages, sys.stdout, indent=2)
-        print()
+        instrument.count("rerank.fallback.error")
+    return passages
+
+
+def main():
+    if "--help" in sys.argv or "-h" in sys.argv:
+        print(__doc__)
+        sys.exit(0)
+
+    # Read input from stdin
+    raw = sys.stdin.read()
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"reranker: invalid JSON input: {e}", file=sys.stderr)
+        sys.stdout.write(raw)
+        sys.exit(0)
+
+    json.dump(run(data), sys.stdout, indent=2)
+    print()
 
 
 if __name__ == "__main__":
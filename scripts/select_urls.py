@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+MMR URL selection over search results: which pages to fetch for a subquestion.
+Zero external dependencies — uses only Python stdlib.
+
+Runs the Phase 3 selection procedure in code, so every subagent and
+refinement round picks the same URLs from the same results:
+    a. hard filters: malformed or repeated URLs, domains already fetched for
+       the subquestion, blocked low-quality domains, paywalled domains
+    b. heuristic score 0-10 from the title, snippet, URL and date:
+         authority     .gov/.edu/.int, journals and publishers, overlay sources   +3
+         freshness     <1 year +2, 1-3 years +1 (0 with --timeless)
+         overlap       share of subquestion terms in title/snippet/URL: >=50% +2, >=25% +1
+         content_type  primary source +2, analysis +1, listicle +0
+         specificity   figures in the snippet: data point or 2+ numbers +2, one number +1
+    c. MMR with lambda=0.5: lambda * score/10 + (1 - lambda) * diversity, where
+       diversity = 1 - max similarity to the URLs already selected
+       (same domain, same source class, shared snippet terms)
+    d. budget: MIN_SELECT..MAX_SELECT URLs (past MIN_SELECT only while scores
+       reach EXTEND_MIN_SCORE), never more than budget - RESERVE_FETCHES
+
+Usage:
+    echo '{"query": "<subquestion>", "results": [{"url": "...", "title": "...", "snippet": "...", "date": "..."}]}' \\
+        | python scripts/select_urls.py [--overlay healthcare] [--budget 10]
+    python scripts/select_urls.py --query "<subquestion>" --file results.json \\
+        [--project RESEARCH/my-project --subquestion SQ2] [--fetched URL|DOMAIN ...] [--timeless]
+
+Input: {"query", "results": [...]} or a bare results array (with --query).
+Results take "snippet" or "description", and "date", "page_age" or "age"
+(ISO dates, "Mar 5, 2024", "3 days ago"; a date in the snippet or URL path
+is used when missing). Optional keys mirror the flags: "fetched",
+"blocked_domains", "allowed_domains", "budget", "overlay", "timeless",
+"as_of", "lambda". --project/--subquestion add the domains already in the
+project ledger for that subquestion (see ledger.py) to "fetched".
+
+Output: {"selected": [{"rank", "url", "title", "domain", "source_class",
+          "content_type", "score", "signals": {...}, "age_days", "diversity", "mmr"}],
+         "candidates": [unselected, best score first], "skipped": [{"url", "reason"}],
+         "budget": {"limit", "selected", "stop"}}
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+import urllib.parse
+
+from ledger import DB_NAME, Ledger, normalize_domain, normalize_url
+from tokenizer import tokenize
+
+# --- Configuration ---
+LAMBDA = 0.5
+MIN_SELECT = 5
+MAX_SELECT = 7
+EXTEND_MIN_SCORE = 5     # selecting past MIN_SELECT needs at least this score
+RESERVE_FETCHES = 2      # kept back for refinement rounds
+MAX_SCORE = 10
+SIMILARITY = {'domain': 0.4, 'source_class': 0.3, 'terms': 0.3}
+
+# Authority: hosts under these suffixes (also as second-level labels, e.g. gov.uk, ac.jp)
+GOVERNMENT_SUFFIXES = ('gov', 'mil', 'int')
+ACADEMIC_SUFFIXES = ('edu', 'ac')
+JOURNAL_DOMAINS = frozenset([
+    'arxiv.org', 'biorxiv.org', 'medrxiv.org', 'doi.org', 'nature.com', 'science.org', 'sciencedirect.com',
+    'springer.com', 'wiley.com', 'tandfonline.com', 'sagepub.com', 'plos.org', 'pnas.org', 'cell.com',
+    'ieee.org', 'acm.org', 'jstor.org', 'ssrn.com', 'nber.org', 'aclanthology.org', 'openreview.net',
+    'semanticscholar.org', 'academic.oup.com', 'cambridge.org', 'frontiersin.org', 'annualreviews.org',
+])
+# Source-priority lists of the domain overlays (skills/deep-research/*.md) and the
+# site-targeted supplements of the agent spec, as domains
+OVERLAY_DOMAINS = {
+    'healthcare': ['pubmed.ncbi.nlm.nih.gov', 'cochrane.org', 'cochranelibrary.com', 'who.int', 'nice.org.uk',
+                   'uspreventiveservicestaskforce.org', 'nejm.org', 'thelancet.com', 'jamanetwork.com',
+                   'bmj.com', 'clinicaltrials.gov'],
+    'financial': ['sec.gov', 'federalreserve.gov', 'bls.gov', 'ecb.europa.eu', 'bankofengland.co.uk',
+                  'reuters.com', 'bloomberg.com', 'dowjones.com', 'wsj.com', 'ft.com', 'economist.com'],
+    'legal': ['law.cornell.edu', 'supremecourt.gov', 'justice.gov', 'irs.gov', 'uscode.house.gov', 'ecfr.gov',
+              'federalregister.gov', 'courtlistener.com', 'oyez.org', 'americanbar.org', 'law360.com',
+              'news.bloomberglaw.com'],
+    'market': ['census.gov', 'bls.gov', 'ec.europa.eu', 'gartner.com', 'idc.com', 'forrester.com',
+               'mckinsey.com', 'bcg.com', 'marketsandmarkets.com', 'grandviewresearch.com',
+               'alliedmarketresearch.com'],
+    'technology': ['arxiv.org', 'dl.acm.org', 'ieee.org'],
+}
+NEWS_DOMAINS = frozenset([
+    'reuters.com', 'bloomberg.com', 'apnews.com', 'wsj.com', 'ft.com', 'economist.com', 'nytimes.com',
+    'washingtonpost.com', 'theguardian.com', 'bbc.co.uk', 'bbc.com', 'cnbc.com', 'cnn.com', 'forbes.com',
+    'techcrunch.com', 'theverge.com', 'wired.com', 'arstechnica.com', 'axios.com', 'law360.com', 'statnews.com',
+])
+# Hard filters: the agent's default blocked_domains plus content mills and scrapers
+BLOCKED_DOMAINS = frozenset([
+    'pinterest.com', 'quora.com', 'ehow.com', 'answers.com', 'reference.com', 'wikihow.com', 'brainly.com',
+    'coursehero.com', 'studocu.com', 'chegg.com', 'scribd.com', 'slideshare.net',
+])
+PAYWALLED_DOMAINS = frozenset([
+    'wsj.com', 'ft.com', 'economist.com', 'bloomberg.com', 'nytimes.com', 'washingtonpost.com', 'barrons.com',
+    'hbr.org', 'statista.com', 'law360.com',
+])
+
+_PRIMARY = re.compile(r'\b(?:study|trial|paper|preprint|report|filing|10-[kq]|8-k|dataset|data|statistics|survey'
+                      r'|documentation|docs|specification|rfc|standard|white ?paper|proceedings|official|guideline)s?\b'
+                      r'|\.pdf\b', re.IGNORECASE)
+_LISTICLE = re.compile(r'^\s*\d+\s+\w|\btop\s+\d+\b|\b\d+\s+(?:best|ways|tips|reasons|things|tools|tricks)\b'
+                       r'|\bbest\b.*\b(?:19|20)\d{2}\b|\bultimate guide\b|\byou need to know\b', re.IGNORECASE)
+_DATA_POINT = re.compile(r'[$€£]\s?\d[\d,.]*|\d[\d,.]*\s?(?:%|percent\b|x\b|×|million\b|billion\b|trillion\b'
+                         r'|thousand\b|[kmb]n?\b)', re.IGNORECASE)
+_NUMBER = re.compile(r'(?<![\w.])\d[\d,.]*\b')
+_MONTHS = {m: n for n, m in enumerate(['jan', 'feb', 'mar', 'apr', 'may', 'jun',
+                                        'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+_RELATIVE_DATE = re.compile(r'\b(\d+)\s+(minute|hour|day|week|month|year)s?\s+ago\b', re.IGNORECASE)
+_ISO_DATE = re.compile(r'\b((?:19|20)\d{2})[-/](\d{1,2})(?:[-/](\d{1,2}))?\b')
+_NAMED_DATE = re.compile(r'\b(?:(\d{1,2})\s+)?(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?'
+                         r'|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b\.?\s+'
+                         r'(?:(\d{1,2}),?\s+)?((?:19|20)\d{2})\b', re.IGNORECASE)
+_YEAR = re.compile(r'\b((?:19|20)\d{2})\b')
+
+
+# --- Signals ---
+def _host(url):
+    host = (urllib.parse.urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def _under(host, domains):
+    return any(host == d or host.endswith('.' + d) for d in domains)
+
+
+def _suffix_class(host):
+    """'government' / 'academic' from the host's TLD or second-level label (gov.uk, ac.jp), else None."""
+    labels = host.split('.')
+    tail = labels[-2:] if len(labels) > 2 and len(labels[-1]) == 2 else labels[-1:]
+    if any(label in GOVERNMENT_SUFFIXES for label in tail):
+        return 'government'
+    if any(label in ACADEMIC_SUFFIXES for label in tail):
+        return 'academic'
+    return None
+
+
+def source_class(host, overlay_domains):
+    """government / academic / news / industry / web, for authority and diversity."""
+    cls = _suffix_class(host)
+    if cls:
+        return cls
+    if _under(host, JOURNAL_DOMAINS):
+        return 'academic'
+    if _under(host, NEWS_DOMAINS):
+        return 'news'
+    if _under(host, overlay_domains):
+        return 'industry'
+    return 'web'
+
+
+def parse_date(value, as_of, bare_year=True):
+    """Publication date from ISO, named-month, bare-year or "3 days ago" text, or None."""
+    if not value:
+        return None
+    m = _RELATIVE_DATE.search(value)
+    if m:
+        n, unit = int(m.group(1)), m.group(2).lower()
+        days = {'minute': 0, 'hour': 0, 'day': 1, 'week': 7, 'month': 30, 'year': 365}[unit] * n
+        return as_of - datetime.timedelta(days=days)
+    m = _ISO_DATE.search(value)
+    if m:
+        year, month, day = int(m.group(1)), int(m.group(2)), int(m.group(3) or 1)
+        try:
+            return datetime.date(year, month, day)
+        except ValueError:
+            return None
+    for m in _NAMED_DATE.finditer(value):
+        month = _MONTHS[m.group(2)[:3].lower()]
+        day = int(m.group(1) or m.group(3) or 1)
+        try:
+            return datetime.date(int(m.group(4)), month, day)
+        except ValueError:
+            continue
+    m = _YEAR.search(value) if bare_year else None
+    return datetime.date(int(m.group(1)), 7, 1) if m else None  # mid-year when only the year is known
+
+
+def _url_date(url):
+    """Date from a /2024/05/ style URL path."""
+    m = re.search(r'/((?:19|20)\d{2})/(\d{1,2})/', urllib.parse.urlsplit(url).path)
+    if m and 1 <= int(m.group(2)) <= 12:
+        return datetime.date(int(m.group(1)), int(m.group(2)), 1)
+    return None
+
+
+def score_result(result, query_terms, overlay_domains, as_of, timeless=False):
+    """Per-signal scores of one search result (see module docstring)."""
+    url, title, snippet = result['url'], result['title'], result['snippet']
+    host = _host(url)
+    cls = source_class(host, overlay_domains)
+    authority = 3 if cls in ('government', 'academic') or _under(host, overlay_domains) else 0
+
+    published = None if timeless else (parse_date(result['date'], as_of) or _url_date(url)
+                                       or parse_date(snippet[:40], as_of, bare_year=False))
+    age_days = (as_of - published).days if published else None
+    freshness = 0
+    if age_days is not None and not timeless:
+        freshness = 2 if age_days < 365 else 1 if age_days < 3 * 365 else 0
+
+    path = urllib.parse.unquote(urllib.parse.urlsplit(url).path)
+    terms = set(tokenize(f'{title} {snippet} {path}', stem_terms=True))
+    share = len(query_terms & terms) / len(query_terms) if query_terms else 0.0
+    overlap = 2 if share >= 0.5 else 1 if share >= 0.25 else 0
+
+    if cls in ('government', 'academic'):
+        content_type = 'primary'
+    elif _LISTICLE.search(title):
+        content_type = 'listicle'
+    elif _PRIMARY.search(f'{title} {path}'):
+        content_type = 'primary'
+    else:
+        content_type = 'analysis'
+
+    numbers = len(_NUMBER.findall(snippet))
+    specificity = 2 if _DATA_POINT.search(snippet) or numbers >= 2 else 1 if numbers == 1 else 0
+
+    signals = {'authority': authority, 'freshness': freshness, 'overlap': overlap,
+               'content_type': {'primary': 2, 'analysis': 1, 'listicle': 0}[content_type],
+               'specificity': specificity}
+    return {'source_class': cls, 'content_type': content_type, 'signals': signals,
+            'score': min(MAX_SCORE, sum(signals.values())), 'age_days': age_days,
+            'terms': set(tokenize(f'{title} {snippet}', stem_terms=True))}
+
+
+def similarity(a, b):
+    """0..1: same domain, same source class, Jaccard overlap of title/snippet terms."""
+    union = a['terms'] | b['terms']
+    jaccard = len(a['terms'] & b['terms']) / len(union) if union else 0.0
+    return (SIMILARITY['domain'] * (a['domain'] == b['domain'])
+            + SIMILARITY['source_class'] * (a['source_class'] == b['source_class'])
+            + SIMILARITY['terms'] * jaccard)
+
+
+# --- Selection ---
+def _normalize_result(raw):
+    return {'url': (raw.get('url') or raw.get('link') or '').strip(),
+            'title': raw.get('title') or '',
+            'snippet': raw.get('snippet') or raw.get('description') or raw.get('content') or '',
+            'date': str(raw.get('date') or raw.get('page_age') or raw.get('age') or raw.get('published') or '')}
+
+
+def select(query, results, fetched=(), blocked=(), allowed=(), budget=None, overlay=None,
+           timeless=False, as_of=None, lam=LAMBDA):
+    """
+    Hard-filter, score and MMR-select search results for one subquestion.
+
+    fetched: URLs or domains already fetched for the subquestion.
+    blocked/allowed: domains added to / exempted from the blocked and paywalled lists.
+    overlay: one of OVERLAY_DOMAINS, or None to credit every overlay's sources.
+    """
+    as_of = as_of or datetime.date.today()
+    overlay_domains = OVERLAY_DOMAINS[overlay] if overlay else sorted({d for ds in OVERLAY_DOMAINS.values()
+                                                                       for d in ds})
+    fetched_domains = {normalize_domain(f if '://' in f else f'https://{f}') for f in fetched}
+    blocked = BLOCKED_DOMAINS | set(blocked)
+    allowed = set(allowed)
+    query_terms = set(tokenize(query, stem_terms=True))
+
+    candidates, skipped, seen = [], [], set()
+    for position, raw in enumerate(results):
+        if not isinstance(raw, dict):
+            skipped.append({'url': raw if isinstance(raw, str) else None, 'reason': 'invalid_result'})
+            continue
+        result = _normalize_result(raw)
+        url = result['url']
+        host = _host(url)
+        reason = None
+        if not url.startswith(('http://', 'https://')) or not host:
+            reason = 'invalid_url'
+        elif normalize_url(url) in seen:
+            reason = 'duplicate_url'
+        elif normalize_domain(url) in fetched_domains:
+            reason = 'domain_fetched'
+        elif not _under(host, allowed):
+            if _under(host, blocked):
+                reason = 'blocked_domain'
+            elif _under(host, PAYWALLED_DOMAINS):
+                reason = 'paywalled'
+        if reason:
+            skipped.append({'url': url, 'reason': reason})
+            continue
+        seen.add(normalize_url(url))
+        candidate = {'position': position, 'url': url, 'title': result['title'], 'domain': normalize_domain(url)}
+        candidate.update(score_result(result, query_terms, overlay_domains, as_of, timeless))
+        candidates.append(candidate)
+
+    limit = MAX_SELECT if budget is None else max(0, min(MAX_SELECT, budget - RESERVE_FETCHES))
+    selected, stop = [], 'max_select'
+    while True:
+        if not candidates:
+            stop = 'exhausted'
+            break
+        if len(selected) >= limit:
+            stop = 'max_select' if limit == MAX_SELECT else 'budget'
+            break
+        for c in candidates:
+            c['diversity'] = 1.0 - max((similarity(c, s) for s in selected), default=0.0)
+            c['mmr'] = lam * c['score'] / MAX_SCORE + (1 - lam) * c['diversity']
+        best = max(candidates, key=lambda c: (c['mmr'], c['score'], -c['position']))
+        if len(selected) >= MIN_SELECT and best['score'] < EXTEND_MIN_SCORE:
+            stop = 'low_score'
+            break
+        candidates.remove(best)
+        selected.append(best)
+
+    def public(c, rank=None):
+        out = {k: v for k, v in c.items() if k not in ('terms', 'position', 'diversity', 'mmr')}
+        if rank is not None:
+            out = dict(rank=rank, **out, diversity=round(c['diversity'], 3), mmr=round(c['mmr'], 3))
+        return out
+
+    return {
+        'selected': [public(c, rank) for rank, c in enumerate(selected, 1)],
+        'candidates': [public(c) for c in sorted(candidates, key=lambda c: (-c['score'], c['position']))],
+        'skipped': skipped,
+        'budget': {'limit': limit, 'selected': len(selected), 'stop': stop},
+    }
+
+
+# --- CLI Interface ---
+def main():
+    parser = argparse.ArgumentParser(description='MMR URL selection over search results')
+    parser.add_argument('--query', help='Subquestion (overrides "query" in the input)')
+    parser.add_argument('--file', help='Search results JSON (default: stdin)')
+    parser.add_argument('--project', help='Project directory; its ledger supplies fetched domains')
+    parser.add_argument('--subquestion', help='Only ledger sources used for this subquestion, e.g. SQ2')
+    parser.add_argument('--fetched', action='append', default=[], help='URL or domain already fetched (repeatable)')
+    parser.add_argument('--block', action='append', default=[], help='Extra blocked domain (repeatable)')
+    parser.add_argument('--allow', action='append', default=[], help='Exempt a blocked/paywalled domain')
+    parser.add_argument('--budget', type=int, help='Fetches left for this subquestion')
+    parser.add_argument('--overlay', choices=sorted(OVERLAY_DOMAINS), help='Domain overlay to credit')
+    parser.add_argument('--timeless', action='store_true', help='Ignore freshness')
+    parser.add_argument('--as-of', help='Date freshness is measured from (default: today)')
+    parser.add_argument('--lambda', dest='lam', type=float, help=f'MMR relevance weight (default {LAMBDA})')
+    args = parser.parse_args()
+
+    try:
+        if args.file:
+            with open(args.file) as f:
+                data = json.load(f)
+        else:
+            data = json.load(sys.stdin)
+    except json.JSONDecodeError as e:
+        print(f"select_urls: invalid JSON input: {e}", file=sys.stderr)
+        sys.exit(1)
+    if isinstance(data, list):
+        data = {'results': data}
+    query = args.query or data.get('query', '')
+    if not query:
+        parser.error('no subquestion: give --query or "query" in the input')
+
+    fetched = list(data.get('fetched', [])) + args.fetched
+    if args.project and os.path.exists(os.path.join(args.project, DB_NAME)):
+        # A project without a ledger has fetched nothing yet; don't create one here
+        ledger = Ledger(args.project)
+        try:
+            fetched += ledger.domains(used_for=args.subquestion)
+        finally:
+            ledger.close()
+    overlay = args.overlay or data.get('overlay')
+    if overlay and overlay not in OVERLAY_DOMAINS:
+        print(f"select_urls: unknown overlay '{overlay}', expected one of: {', '.join(OVERLAY_DOMAINS)}",
+              file=sys.stderr)
+        sys.exit(2)
+    as_of = args.as_of or data.get('as_of')
+    try:
+        as_of = datetime.date.fromisoformat(as_of) if as_of else None
+    except ValueError:
+        parser.error(f'as_of must be YYYY-MM-DD, got {as_of!r}')
+
+    result = select(query, data.get('results', []), fetched=fetched,
+                    blocked=list(data.get('blocked_domains', [])) + args.block,
+                    allowed=list(data.get('allowed_domains', [])) + args.allow,
+                    budget=args.budget if args.budget is not None else data.get('budget'),
+                    overlay=overlay, timeless=args.timeless or bool(data.get('timeless')), as_of=as_of,
+                    lam=args.lam if args.lam is not None else data.get('lambda', LAMBDA))
+    json.dump(result, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Shared tokenizer for the retrieval scripts.
+Zero external dependencies — uses only Python stdlib.
+
+One compiled regex pulls lowercase letter/digit runs out of the text, so
+punctuation no longer costs a token ("BM25," -> bm25, "2024." -> 2024).
+Stopwords and tokens of two characters or fewer are dropped. Optional light
+stemming (S-stemmer: plurals only) is enabled per call or with env
+DR_TOKEN_STEM=1.
+
+Terms are interned in a Vocabulary and streams are returned as compact
+array('I') term-id sequences, which the BM25 scorers consume directly.
+
+Usage:
+    python scripts/tokenizer.py "some text"                 # -> JSON list of terms
+    python scripts/tokenizer.py --bench page1.md [page2.md ...] [--repeat 5]
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+
+# --- Configuration ---
+MIN_TOKEN_CHARS = 3
+DEFAULT_STEM = os.environ.get('DR_TOKEN_STEM', '0') == '1'
+
+# Common English stopwords (top 50 — enough for pre-filtering)
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from',
+    'has', 'he', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'she',
+    'that', 'the', 'to', 'was', 'were', 'will', 'with', 'you', 'your',
+    'this', 'they', 'but', 'have', 'had', 'what', 'when', 'where',
+    'which', 'who', 'how', 'not', 'no', 'can', 'do', 'does', 'if',
+    'than', 'then', 'so', 'we', 'our'
+])
+
+# Runs of letters and digits; everything else (punctuation, underscores, whitespace) separates tokens
+_TOKEN_RE = re.compile(r'[^\W_]{%d,}' % MIN_TOKEN_CHARS)
+
+
+def stem(term):
+    """Light S-stemmer (Harman 1991): fold regular plurals, leave everything else."""
+    if len(term) > 4 and term.endswith('ies') and not term.endswith(('eies', 'aies')):
+        return term[:-3] + 'y'
+    if len(term) > 3 and term.endswith('es') and not term.endswith(('aes', 'ees', 'oes')):
+        return term[:-1]
+    if len(term) > 3 and term.endswith('s') and not term.endswith(('us', 'ss')):
+        return term[:-1]
+    return term
+
+
+def tokenize(text, stem_terms=None):
+    """Lowercase terms of text, stopwords and short tokens removed."""
+    terms = [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+    if DEFAULT_STEM if stem_terms is None else stem_terms:
+        terms = [stem(t) if t[-1] == 's' else t for t in terms]
+    return terms
+
+
+class Vocabulary:
+    """Interned term <-> integer id mapping shared by everything tokenized in a process."""
+
+    def __init__(self):
+        self.ids = {}
+        self.terms = []
+        self._lock = threading.Lock()  # the filter daemon encodes pages from several threads
+
+    def __len__(self):
+        return len(self.terms)
+
+    def id(self, term):
+        tid = self.ids.get(term)
+        if tid is None:
+            with self._lock:
+                tid = self.ids.get(term)
+                if tid is None:
+                    term = sys.intern(term)
+                    self.terms.append(term)
+                    tid = self.ids[term] = len(self.terms) - 1
+        return tid
+
+    def encode(self, text, stem_terms=None):
+        """Term ids of text as array('I'), adding unseen terms to the vocabulary."""
+        ids, add = self.ids, self.id
+        return array('I', [ids[t] if t in ids else add(t) for t in tokenize(text, stem_terms)])
+
+    def lookup(self, terms):
+        """Ids of already tokenized terms as array('I'), skipping terms never seen.
+
+        Unknown terms cannot match any encoded document, so queries use this to
+        avoid growing the vocabulary.
+        """
+        ids = self.ids
+        return array('I', [ids[t] for t in terms if t in ids])
+
+    def decode(self, ids):
+        return [self.terms[i] for i in ids]
+
+    def reset(self):
+        """Forget every term. Ids handed out earlier become meaningless, so only call
+        this once nothing that holds them (prepared pages, live requests) is in use."""
+        with self._lock:
+            self.ids.clear()
+            self.terms.clear()
+
+
+VOCAB = Vocabulary()
+
+
+# --- Benchmark ---
+def _legacy_tokenize(text):
+    """Tokenizer used before this module: whitespace split, alphabetic tokens only."""
+    return [w for w in text.lower().split() if w not in STOPWORDS and len(w) > 2 and w.isalpha()]
+
+
+def bench(texts, repeat=5):
+    """Time tokenizers over texts; best-of-repeat seconds and token counts per variant."""
+    variants = {
+        'legacy': _legacy_tokenize,
+        'tokenize': tokenize,
+        'tokenize_stem': lambda t: tokenize(t, stem_terms=True),
+        'encode': Vocabulary().encode,
+    }
+    chars = sum(len(t) for t in texts)
+    report = {'texts': len(texts), 'chars': chars}
+    for name, fn in variants.items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            tokens = sum(len(fn(t)) for t in texts)
+            best = min(best, time.perf_counter() - start)
+        report[name] = {'seconds': round(best, 4), 'tokens': tokens,
+                        'mb_per_s': round(chars / best / 1e6, 1) if best else None,
+                        'ktokens_per_s': round(tokens / best / 1e3) if best else None}
+    return report
+
+
+if __name__ == '__main__':
+    if '--help' in sys.argv or '-h' in sys.argv or len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(0)
+
+    if sys.argv[1] == '--bench':
+        args = sys.argv[2:]
+        repeat = 5
+        if '--repeat' in args:
+            i = args.index('--repeat')
+            repeat = int(args[i + 1])
+            del args[i:i + 2]
+        texts = []
+        for path in args:
+            with open(path, errors='replace') as f:
+                texts.append(f.read())
+        json.dump(bench(texts, repeat), sys.stdout, indent=2)
+        print()
+        sys.exit(0)
+
+    json.dump(tokenize(' '.join(sys.argv[1:])), sys.stdout)
+    print()